@@ -34,13 +34,26 @@
 ##                                                                            ##
 ################################################################################
 
+import os
+import copy
+import gzip
+import time
+import random
+import cPickle
+import itertools
+import threading
+import collections
+
 from PySide import QtCore, QtGui
 
 import dialogs
 import utils
+import metrics
 from tadek.core import log
+from tadek.core import settings
 from tadek.core import queue
 from tadek.core import devices
+from tadek.core import accessible
 from tadek.connection import client
 from tadek.connection import device
 from tadek.connection import protocol
@@ -84,15 +97,23 @@ class DeviceObject(QtCore.QObject):
     An interface class of devices that emit various signals.
     '''
     # Signals:
+    connecting = QtCore.Signal()
     connected =  QtCore.Signal()
+    connectFailed = QtCore.Signal(object)
     disconnected = QtCore.Signal()
     requestSent = QtCore.Signal(int)
+    requestNamed = QtCore.Signal(int, str)
     responseReceived = QtCore.Signal(int)
+    responseRead = QtCore.Signal(int, object)
     errorOccurred = QtCore.Signal()
 
     # Device methods:
     _connectDevice = None
     _disconnectDevice = None
+    _getResponse = None
+
+    # Capture of traffic of the device or None
+    capture = None
 
     def __init__(self):
         QtCore.QObject.__init__(self)
@@ -107,8 +128,21 @@ class DeviceObject(QtCore.QObject):
         Connects the device and emits the 'connected' signal.
         '''
         if self._connectDevice(*args, **kwargs):
-            self._connected = True
-            self.connected.emit()
+            self._setConnected()
+
+    def _setConnected(self):
+        '''
+        Marks the device connected and emits the 'connected' signal.
+        '''
+        self._connected = True
+        self.connected.emit()
+
+    def isReconnecting(self):
+        '''
+        Returns True if the device is disconnected due to a lost connection
+        and it is going to be reconnected automatically.
+        '''
+        return False
 
     def disconnectDevice(self, *args, **kwargs):
         '''
@@ -120,8 +154,8 @@ class DeviceObject(QtCore.QObject):
 
     def requestDevice(self, reqfunc, *args, **kwargs):
         '''
-        Sends a request using the given function and emits the 'requestSent'
-        signal.
+        Sends a request using the given function and emits the 'requestNamed'
+        signal with the name of the function and the 'requestSent' signal.
         '''
         try:
             id = getattr(self, reqfunc)(*args, **kwargs)
@@ -130,9 +164,23 @@ class DeviceObject(QtCore.QObject):
                 err = client.Error(err)
             log.exception(err)
         else:
+            if self.capture is not None:
+                self.capture.request(self, id, reqfunc, args, kwargs)
+            self.requestNamed.emit(id, reqfunc)
             self.requestSent.emit(id)
             return id
 
+    def getResponse(self, id, *args, **kwargs):
+        '''
+        Returns a response of the given ID and emits the 'responseRead'
+        signal.
+        '''
+        response = self._getResponse(id, *args, **kwargs)
+        if self.capture is not None and response is not None:
+            self.capture.response(self, id, response)
+        self.responseRead.emit(id, response)
+        return response
+
     #@QtCore.Slot(int)
     def _responseReceived(self, id):
         '''
@@ -140,6 +188,8 @@ class DeviceObject(QtCore.QObject):
         '''
         log.debug("Received message from '%s' device: %d" % (self.name, id))
         if id > protocol.DEFAULT_MSG_ID:
+            if self.capture is not None:
+                self.capture.received(self, id)
             self.responseReceived.emit(id)
         elif id == protocol.ERROR_MSG_ID:
             if self._connected:
@@ -164,10 +214,167 @@ class Device(DeviceObject, device.Device):
 
     _connectDevice = device.Device.connect
     _disconnectDevice = device.Device.disconnect
+    _getResponse = device.Device.getResponse
+
+    # Interval of keepalive probes and time of silence of the device while
+    # a probe is unanswered after which the connection is considered lost,
+    # in milliseconds
+    _KEEPALIVE_INTERVAL = 10000
+    _KEEPALIVE_TIMEOUT = 30000
+    # Initial and maximum delays of reconnecting in milliseconds
+    _RECONNECT_DELAY = 1000
+    _RECONNECT_MAX_DELAY = 300000
+    _RECONNECT_JITTER = 0.5
+
+    # Signals:
+    latencyChanged = QtCore.Signal(float)
+    pong = QtCore.Signal(int, float)
+    reconnecting = QtCore.Signal(int)
+    reconnectRequested = QtCore.Signal()
 
     def __init__(self, *args, **kwargs):
         device.Device.__init__(self, *args, **kwargs)
         DeviceObject.__init__(self)
+        # Round-trip time of the last keepalive probe in milliseconds
+        self.latency = None
+        self._probes = {}
+        # Time the last message of any kind was received from the device
+        self._lastReceived = 0
+        self._attempts = 0
+        self._reconnecting = False
+        self._keepalive = QtCore.QTimer(self)
+        self._keepalive.setInterval(self._KEEPALIVE_INTERVAL)
+        self._keepalive.timeout.connect(self._probe)
+        self._reconnectTimer = QtCore.QTimer(self)
+        self._reconnectTimer.setSingleShot(True)
+        self._reconnectTimer.timeout.connect(self.reconnectRequested.emit)
+        self.connected.connect(self._startKeepalive)
+        self.connectFailed.connect(self._connectFailed)
+        self.disconnected.connect(self._stopKeepalive)
+
+# Private methods:
+    def _scheduleReconnect(self):
+        '''
+        Schedules the next reconnect attempt after an exponentially growing
+        and randomly jittered delay.
+        '''
+        delay = min(self._RECONNECT_MAX_DELAY,
+                    self._RECONNECT_DELAY * 2 ** min(self._attempts, 20))
+        delay = int(delay * random.uniform(1 - self._RECONNECT_JITTER,
+                                           1 + self._RECONNECT_JITTER))
+        self._attempts += 1
+        log.info("Reconnecting '%s' device in %d ms (attempt %d)"
+                 % (self.name, delay, self._attempts))
+        self._reconnectTimer.start(delay)
+        self.reconnecting.emit(delay)
+
+# Slots:
+    #@QtCore.Slot()
+    def _startKeepalive(self):
+        '''
+        Stops reconnecting and starts sending keepalive probes.
+        '''
+        self._reconnecting = False
+        self._attempts = 0
+        self._reconnectTimer.stop()
+        self._probes.clear()
+        self._lastReceived = time.time()
+        self._keepalive.start()
+
+    #@QtCore.Slot()
+    def _stopKeepalive(self):
+        '''
+        Stops sending keepalive probes.
+        '''
+        self._keepalive.stop()
+        self._probes.clear()
+
+    #@QtCore.Slot(object)
+    def _connectFailed(self, error):
+        '''
+        Schedules the next reconnect attempt if the device is reconnecting.
+        '''
+        if self._reconnecting:
+            self._scheduleReconnect()
+
+    #@QtCore.Slot()
+    def _probe(self):
+        '''
+        Sends a lightweight keepalive request unless a previous one is
+        still unanswered. The connection is treated as lost only if nothing
+        at all was received from the device in time since the probe was
+        sent, so a device busy with long requests is not disconnected.
+        '''
+        if self._probes:
+            silence = time.time() - max(min(self._probes.itervalues()),
+                                        self._lastReceived)
+            if silence * 1000 > self._KEEPALIVE_TIMEOUT:
+                self.connectionLost(client.ConnectionLostError(
+                                    "Keepalive probe timed out"))
+            return
+        try:
+            self.ping()
+        except Exception, err:
+            log.warning("Sending keepalive probe to '%s' device failed: %s"
+                        % (self.name, err))
+
+    #@QtCore.Slot(int)
+    def _responseReceived(self, id):
+        '''
+        Records the time of every received message and the latency
+        of answered keepalive probes, and passes other messages on.
+        '''
+        self._lastReceived = time.time()
+        sent = self._probes.pop(id, None)
+        if sent is None:
+            DeviceObject._responseReceived(self, id)
+            return
+        self._getResponse(id)
+        self.latency = (time.time() - sent) * 1000
+        log.debug("Latency of '%s' device: %.1f ms"
+                  % (self.name, self.latency))
+        self.latencyChanged.emit(self.latency)
+        self.pong.emit(id, self.latency)
+
+# Public methods:
+    def ping(self):
+        '''
+        Sends a lightweight probe request and returns its ID. The device
+        emits the 'pong' signal with the ID and the latency in milliseconds
+        when the probe is answered.
+        '''
+        id = self.requestAccessible(accessible.Path(), 0)
+        self._probes[id] = time.time()
+        return id
+
+    def isReconnecting(self):
+        '''
+        Returns True if the device is disconnected due to a lost connection
+        and it is going to be reconnected automatically.
+        '''
+        return self._reconnecting
+
+    def connectionLost(self, error):
+        '''
+        Disconnects the device whose connection is lost and starts
+        reconnecting it. The device emits the 'reconnectRequested' signal
+        whenever the next attempt is due.
+        '''
+        log.warning("Connection to '%s' device lost: %s" % (self.name, error))
+        self._reconnecting = True
+        self._attempts = 0
+        try:
+            self.disconnectDevice()
+        except ConnectionError, err:
+            log.error("Connection Error (%s): %s" % (self, err))
+        self._scheduleReconnect()
+
+    def stopReconnecting(self):
+        '''
+        Stops reconnecting the device.
+        '''
+        self._reconnecting = False
+        self._reconnectTimer.stop()
 
 
 class XmlClient(client.XmlClient):
@@ -185,95 +392,840 @@ class OfflineDevice(DeviceObject, device.OfflineDevice):
 
     _connectDevice = device.OfflineDevice.connect
     _disconnectDevice = device.OfflineDevice.disconnect
+    _getResponse = device.OfflineDevice.getResponse
 
     def __init__(self, *args, **kwargs):
         device.OfflineDevice.__init__(self, *args, **kwargs)
         DeviceObject.__init__(self)
 
 
-class DeviceItem(QtGui.QTreeWidgetItem, QtCore.QObject):
+# Extension of files of captured traffic
+CAPTURE_EXTENSION = ".tdc"
+
+# Kinds of records of captured traffic
+CAPTURE_REQUEST = "request"
+CAPTURE_RECEIVED = "received"
+CAPTURE_RESPONSE = "response"
+
+
+def _requestKey(name, args, kwargs):
     '''
-    Class of device tree items.
+    Returns a key identifying a request of the given name and arguments.
     '''
+    def value(arg):
+        if isinstance(arg, accessible.Path):
+            return arg.tuple
+        return arg
+    return repr((name, tuple(value(arg) for arg in args),
+                 sorted((key, value(arg)) for key, arg in kwargs.iteritems())))
 
-    _ITEM_BUTTON_STYLE = "text-align: center; margin-left: 0; padding: 2 5 2 5"
-    _ITEM_CHECKED_BUTTON_NAME = "Disconnect"
-    _ITEM_UNCHECKED_BUTTON_NAME = "Connect"
-    _ITEM_CHECKED_BUTTON_ICON = ":/icons/user-online.png"
-    _ITEM_UNCHECKED_BUTTON_ICON = ":/icons/user-offline.png"
 
-    buttonToggled = QtCore.Signal(bool, Device)
+def readCapture(path):
+    '''
+    Yields records of traffic captured to a file of the given path.
+    '''
+    f = gzip.open(path, "rb")
+    try:
+        while True:
+            try:
+                yield cPickle.load(f)
+            except EOFError:
+                break
+            except IOError, err:
+                # A capture that was not closed has no gzip trailer
+                log.warning("Capture file '%s' is truncated: %s"
+                            % (path, err))
+                break
+    finally:
+        f.close()
+
+
+class TrafficCapture(object):
+    '''
+    Records requests sent to devices and their responses with timestamps
+    to a compressed file of pickled records. Records are written from both
+    the GUI and test runner threads and flushed periodically, so a capture
+    of a crashed session is readable up to the last flush.
+    '''
+    # Interval of flushing records to the file in seconds
+    _FLUSH_INTERVAL = 1.0
 
-    def __init__(self, tree, dev):
+    def __init__(self, path):
+        self.path = path
+        self._file = gzip.open(path, "wb")
+        self._lock = threading.Lock()
+        self._flushed = time.time()
+
+    def _write(self, *record):
         '''
-        Initializes a device item and binds it to device signals.
-        
-        :param tree: A parent tree
-        :type tree: QtGui.QTreeWidget
-        :param dev: A device
-        :type dev: Device
+        Writes the given record to the capture file.
+        '''
+        try:
+            data = cPickle.dumps(record, cPickle.HIGHEST_PROTOCOL)
+        except Exception, err:
+            log.warning("Cannot capture %s of '%s' device: %s"
+                        % (record[0], record[2], err))
+            return
+        self._lock.acquire()
+        try:
+            if self._file is None:
+                return
+            self._file.write(data)
+            if record[1] - self._flushed >= self._FLUSH_INTERVAL:
+                self._file.flush()
+                self._flushed = record[1]
+        finally:
+            self._lock.release()
+
+# Public methods:
+    def request(self, dev, id, name, args, kwargs):
+        '''
+        Records a request of the given ID sent to the device.
+        '''
+        self._write(CAPTURE_REQUEST, time.time(), dev.name, id, name, args,
+                    kwargs)
+
+    def received(self, dev, id):
+        '''
+        Records receiving a response of the given ID from the device.
+        '''
+        self._write(CAPTURE_RECEIVED, time.time(), dev.name, id)
+
+    def response(self, dev, id, response):
+        '''
+        Records a response of the given ID read from the device.
+        '''
+        self._write(CAPTURE_RESPONSE, time.time(), dev.name, id, response)
+
+    def close(self):
+        '''
+        Closes the capture file.
+        '''
+        self._lock.acquire()
+        try:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        finally:
+            self._lock.release()
+
+
+class FailedResponse(object):
+    '''
+    A failed response to a request that could not be served locally.
+    '''
+    def __init__(self, id, args=()):
+        self.id = id
+        self.status = False
+        if args and isinstance(args[0], accessible.Path):
+            self.accessible = accessible.Accessible(args[0])
+
+
+class LocalClient(object):
+    '''
+    A base class of clients serving requests in process instead of sending
+    them to devices over sockets. Responses are delivered asynchronously
+    through the message queue like the ones of devices.
+    '''
+    def __init__(self):
+        self.messages = Queue()
+        self._responses = {}
+        self._ids = itertools.count(protocol.DEFAULT_MSG_ID + 1)
+
+    def _serve(self, id, name, args, kwargs):
+        '''
+        Returns a pair of a delay in milliseconds and a response to
+        a request of the given ID, name and arguments.
+        '''
+        raise NotImplementedError
+
+    def _deliver(self, id):
+        '''
+        Notifies the response of the given ID is received.
+        '''
+        if id in self._responses:
+            self.messages.notEmpty.emit(id)
+
+# Public methods:
+    def request(self, name, args, kwargs):
+        '''
+        Serves a request of the given name and arguments and returns an ID
+        of its response.
+        '''
+        id = self._ids.next()
+        delay, response = self._serve(id, name, args, kwargs)
+        if hasattr(response, "id"):
+            response.id = id
+        self._responses[id] = response
+        if delay > 0:
+            QtCore.QTimer.singleShot(int(delay), lambda: self._deliver(id))
+        else:
+            self._deliver(id)
+        return id
+
+    def response(self, id):
+        '''
+        Returns and forgets a response of the given ID.
+        '''
+        return self._responses.pop(id, None)
+
+    def clear(self):
+        '''
+        Drops all responses that are not read yet.
+        '''
+        self._responses.clear()
+
+    def error(self):
+        '''
+        Returns None as local clients report no connection errors.
+        '''
+        return None
+
+
+class LoopbackClient(LocalClient):
+    '''
+    A client passing requests directly to methods of the same names
+    of a handler object, e.g. requestAccessible(path, depth, **kwargs),
+    and delivering the responses they return.
+    '''
+    def __init__(self, handler):
+        LocalClient.__init__(self)
+        self.handler = handler
+
+    def _serve(self, id, name, args, kwargs):
+        '''
+        Returns a response of the handler to the given request.
+        '''
+        try:
+            response = getattr(self.handler, name)(*args, **kwargs)
+        except Exception, err:
+            log.warning("Loopback handler failed to serve %s: %s"
+                        % (name, err))
+            response = None
+        if response is None:
+            response = FailedResponse(id, args)
+        return 0, response
+
+
+class ReplayClient(LocalClient):
+    '''
+    A client serving responses recorded by TrafficCapture after recorded
+    latencies multiplied by the given scale. Requests repeated more times
+    than they were captured get the last captured response.
+    '''
+    def __init__(self, path, name, scale=1.0):
+        LocalClient.__init__(self)
+        self.scale = scale
+        # Captured latencies in milliseconds and responses by request keys
+        self._captured = {}
+        self._served = {}
+        self._load(path, name)
+
+    def _load(self, path, device):
+        '''
+        Loads the traffic of the given device captured to a file of the
+        given path.
+        '''
+        requests = {}
+        received = {}
+        for record in readCapture(path):
+            kind, stamp, name, id = record[:4]
+            if name != device:
+                continue
+            if kind == CAPTURE_REQUEST:
+                requests[id] = (_requestKey(*record[4:]), stamp)
+            elif kind == CAPTURE_RECEIVED:
+                received[id] = stamp
+            elif kind == CAPTURE_RESPONSE and id in requests:
+                key, sent = requests.pop(id)
+                latency = (received.pop(id, record[1]) - sent) * 1000
+                self._captured.setdefault(key, []).append((latency, record[4]))
+        log.debug("Loaded %d captured requests of '%s' device"
+                  % (sum(len(v) for v in self._captured.itervalues()), device))
+
+    def _serve(self, id, name, args, kwargs):
+        '''
+        Returns the next captured response to the given request.
+        '''
+        key = _requestKey(name, args, kwargs)
+        captured = self._captured.get(key)
+        if not captured:
+            log.warning("No captured response to %s" % name)
+            return 0, FailedResponse(id, args)
+        index = min(self._served.get(key, 0), len(captured) - 1)
+        self._served[key] = index + 1
+        latency, response = captured[index]
+        return latency * self.scale, copy.copy(response)
+
+
+class LocalDevice(DeviceObject):
+    '''
+    A class of devices whose requests are served in process by a local
+    client instead of a remote device.
+    '''
+    def __init__(self, name, client, address):
+        self.name = name
+        self.address = address
+        self.client = client
+        DeviceObject.__init__(self)
+
+    def __str__(self):
+        return self.name
+
+    def __getattr__(self, name):
+        if not name.startswith("request"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.client.request(name, args,
+                                                           kwargs)
+
+    def _connectDevice(self):
+        return True
+
+    def _disconnectDevice(self):
+        self.client.clear()
+        return True
+
+    def _getResponse(self, id):
+        return self.client.response(id)
+
+    def isConnected(self):
+        '''
+        Returns True if the device is connected.
+        '''
+        return self._connected
+
+    def getError(self):
+        '''
+        Returns an error of the client.
+        '''
+        return self.client.error()
+
+
+class LoopbackDevice(LocalDevice):
+    '''
+    A device whose requests are served by a local handler object through
+    a LoopbackClient, without sockets and serialization. Used by unit
+    tests and benchmarks of the request pipeline.
+    '''
+    def __init__(self, name, handler):
+        LocalDevice.__init__(self, name, LoopbackClient(handler),
+                             ("loopback", 0))
+
+
+class ReplayDevice(LocalDevice):
+    '''
+    A stand-in device replaying traffic captured to a file of the given
+    path by TrafficCapture.
+    '''
+    def __init__(self, path, name, scale=1.0):
+        LocalDevice.__init__(self, name, ReplayClient(path, name, scale),
+                             (path, None))
+
+
+def capturedDevices(path):
+    '''
+    Returns names of devices whose traffic is captured to a file of the
+    given path.
+    '''
+    names = []
+    for record in readCapture(path):
+        if record[2] not in names:
+            names.append(record[2])
+    return names
+
+
+class HealthCheck(QtCore.QObject):
+    '''
+    Pings devices concurrently and reports latencies of their answers
+    in milliseconds, or None for devices not answering before a deadline.
+    Devices that cannot be pinged are assumed to be healthy.
+    '''
+    # Signals:
+    finished = QtCore.Signal(object)
+
+    def __init__(self, devs, deadline):
+        '''
+        Initializes the check of the given devices with a deadline
+        in milliseconds.
         '''
         QtCore.QObject.__init__(self)
-        QtGui.QTreeWidgetItem.__init__(self, tree,
-                                       (dev.name, "%s:%d" % dev.address, ''))
-        self._tree = tree
-        for icon in ("_ITEM_CHECKED_BUTTON_ICON",
-                     "_ITEM_UNCHECKED_BUTTON_ICON"):
-            setattr(self, icon, QtGui.QIcon(getattr(self, icon)))
-        widget = QtGui.QWidget(tree)
-        tree.setItemWidget(self, 2, widget)
-        button = QtGui.QPushButton(self._ITEM_UNCHECKED_BUTTON_ICON,
-                                   self._ITEM_UNCHECKED_BUTTON_NAME, widget)
-        button.setIconSize(QtCore.QSize(11, 11))
-        button.setStyleSheet(self._ITEM_BUTTON_STYLE)
-        button.setCheckable(True)
-        layout = QtGui.QHBoxLayout()
-        layout.setContentsMargins(1, 1, 1, 1)
-        layout.addWidget(button)
-        widget.setLayout(layout)
-        widget.setFixedHeight(button.height())
-        widget.setFixedWidth(button.width() + 15)
-        self._button = button
-        QtGui.qApp.processEvents()
-        self._device = dev
-        self._device.connected.connect(self._updateButton)
-        self._device.disconnected.connect(self._updateButton)
-        self._button.clicked.connect(self._buttonClicked)
-        self.updateDevice()
+        self._devs = list(devs)
+        self._latencies = {}
+        self._pending = {}
+        self._done = False
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(deadline)
+        self._timer.timeout.connect(self._finish)
+
+# Slots:
+    #@QtCore.Slot(int, float)
+    def _pong(self, id, latency):
+        '''
+        Records the latency of an answered probe.
+        '''
+        dev = self.sender()
+        if self._pending.get(dev) != id:
+            return
+        del self._pending[dev]
+        self._latencies[dev] = latency
+        if not self._pending:
+            self._finish()
+
+    #@QtCore.Slot()
+    def _finish(self):
+        '''
+        Emits the 'finished' signal with a dictionary of latencies
+        by devices.
+        '''
+        if self._done:
+            return
+        self._done = True
+        self._timer.stop()
+        for dev in self._devs:
+            if hasattr(dev, "pong"):
+                try:
+                    dev.pong.disconnect(self._pong)
+                except RuntimeError:
+                    pass
+        for dev in self._pending:
+            log.warning("Device '%s' did not answer in time" % dev.name)
+            self._latencies[dev] = None
+        self._pending.clear()
+        self.finished.emit(self._latencies)
+
+# Public methods:
+    def start(self):
+        '''
+        Pings all devices at once and starts waiting for their answers.
+        '''
+        for dev in self._devs:
+            if not hasattr(dev, "ping"):
+                self._latencies[dev] = 0.0
+                continue
+            dev.pong.connect(self._pong)
+            try:
+                self._pending[dev] = dev.ping()
+            except Exception, err:
+                log.warning("Pinging '%s' device failed: %s" % (dev.name, err))
+                self._latencies[dev] = None
+        # the result is always reported asynchronously
+        self._timer.start(self._timer.interval() if self._pending else 0)
+
+
+class DeviceConnector(QtCore.QObject):
+    '''
+    Connects devices concurrently in a bounded pool of worker threads,
+    so the GUI stays responsive while slow or unreachable devices time out.
+    '''
+    # Signals:
+    idle = QtCore.Signal()
+    _finished = QtCore.Signal(object, object)
+
+    def __init__(self, size):
+        QtCore.QObject.__init__(self)
+        self._size = size
+        self._pending = collections.deque()
+        self._connecting = set()
+        self._workers = 0
+        self._lock = threading.Lock()
+        self._finished.connect(self._finishConnecting,
+                               type=QtCore.Qt.QueuedConnection)
+
+    def _run(self):
+        '''
+        Connects pending devices in a worker thread.
+        '''
+        while True:
+            self._lock.acquire()
+            try:
+                if not self._pending:
+                    self._workers -= 1
+                    return
+                dev = self._pending.popleft()
+            finally:
+                self._lock.release()
+            log.debug("Connecting '%s' device in background" % dev)
+            try:
+                status = dev._connectDevice()
+            except Exception, err:
+                status = err
+            self._finished.emit(dev, status)
+
+    #@QtCore.Slot(object, object)
+    def _finishConnecting(self, dev, status):
+        '''
+        Marks the given device connected or emits its 'connectFailed' signal
+        with the error that occurred. A false status without an error
+        is a failure too.
+        '''
+        self._connecting.discard(dev)
+        if not status and not isinstance(status, Exception):
+            status = ConnectionError("Connection could not be established")
+        if isinstance(status, Exception):
+            dev.connectFailed.emit(status)
+        else:
+            dev._setConnected()
+        if not self._connecting:
+            self.idle.emit()
 
 # Public methods:
-    def updateDevice(self):
+    def connectDevice(self, dev):
         '''
-        Updates the displayed name and address of the device.
+        Starts connecting the given device in the background. The device
+        emits the 'connecting' signal at once and then the 'connected'
+        or the 'connectFailed' signal.
         '''
-        log.debug("Updating dev item: %s" % self._device)
-        self.setText(0, self._device.name)
-        self.setText(1, "%s:%d" % self._device.address)
-        self._updateButton()
+        if dev in self._connecting or dev.isConnected():
+            return
+        self._connecting.add(dev)
+        dev.connecting.emit()
+        self._lock.acquire()
+        try:
+            self._pending.append(dev)
+            if self._workers >= self._size:
+                return
+            self._workers += 1
+        finally:
+            self._lock.release()
+        thread = threading.Thread(target=self._run, name="DeviceConnector")
+        thread.daemon = True
+        thread.start()
+
+    def isConnecting(self, dev=None):
+        '''
+        Returns True if the given device or any device if not provided
+        is being connected.
+        '''
+        if dev is None:
+            return bool(self._connecting)
+        return dev in self._connecting
+
+
+class DeviceModel(QtCore.QAbstractTableModel):
+    '''
+    A table model of devices and their connection states.
+    '''
+    _HEADERS = ("Name", "Address:Port", "Status", "State")
+    NAME_COLUMN = 0
+    ADDRESS_COLUMN = 1
+    STATUS_COLUMN = 2
+    BUTTON_COLUMN = 3
+
+    # Roles of the device, sorting keys and states of connect buttons,
+    # which are None while the device is being connected
+    DeviceRole = QtCore.Qt.UserRole
+    SortRole = QtCore.Qt.UserRole + 1
+    ButtonRole = QtCore.Qt.UserRole + 2
+
+    def __init__(self, parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self._devices = []
+        self._rows = {}
+        # Statuses overriding the connection state: (text, tool tip, busy)
+        self._status = {}
+
+# Private methods:
+    def _signals(self, dev):
+        '''
+        Returns pairs of device signals and slots of the model.
+        '''
+        return ((dev.connecting, self._setConnecting),
+                (dev.connected, self._resetStatus),
+                (dev.connectFailed, self._setFailed),
+                (dev.disconnected, self._resetStatus),
+                (dev.reconnecting, self._setReconnecting),
+                (dev.latencyChanged, self._setLatency))
+
+    def _setStatus(self, dev, status):
+        '''
+        Sets the status of the given device and updates its row.
+        '''
+        if status is None:
+            self._status.pop(dev, None)
+        else:
+            self._status[dev] = status
+        row = self._rows.get(dev)
+        if row is not None:
+            self.dataChanged.emit(self.index(row, 0),
+                                  self.index(row, len(self._HEADERS) - 1))
+
+    def _statusText(self, dev):
+        '''
+        Returns the displayed status of the given device.
+        '''
+        status = self._status.get(dev)
+        if status is not None:
+            return status[0]
+        return "Connected" if dev.isConnected() else "Disconnected"
 
 # Slots:
     #QtCore.Slot()
-    def _buttonClicked(self):
+    def _resetStatus(self):
         '''
-        Emits the 'buttonToggled' signal.
+        Displays the connection state of the device.
         '''
-        self._button.setChecked(False)
-        self.buttonToggled.emit(self._button.text() ==
-                                self._ITEM_UNCHECKED_BUTTON_NAME,
-                                self._device)
+        self._setStatus(self.sender(), None)
 
     #QtCore.Slot()
-    def _updateButton(self):
+    def _setConnecting(self):
+        '''
+        Displays that the device is being connected.
+        '''
+        self._setStatus(self.sender(), ("Connecting...", '', True))
+
+    #QtCore.Slot(object)
+    def _setFailed(self, error):
+        '''
+        Displays that connecting the device failed with the given error.
+        '''
+        self._setStatus(self.sender(), ("Failed", str(error), False))
+
+    #QtCore.Slot(int)
+    def _setReconnecting(self, delay):
+        '''
+        Displays that the device is going to be reconnected after the given
+        delay in milliseconds.
+        '''
+        self._setStatus(self.sender(), ("Reconnecting in %d s"
+                                        % ((delay + 999) // 1000), '', False))
+
+    #QtCore.Slot(float)
+    def _setLatency(self, latency):
+        '''
+        Displays the latency of the connected device in milliseconds.
+        '''
+        self._setStatus(self.sender(),
+                        ("Connected (%d ms)" % latency, '', False))
+
+# Public methods:
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        '''
+        Returns the number of devices.
+        '''
+        if parent.isValid():
+            return 0
+        return len(self._devices)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        '''
+        Returns the number of columns.
+        '''
+        if parent.isValid():
+            return 0
+        return len(self._HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        '''
+        Returns titles of columns.
+        '''
+        if (orientation == QtCore.Qt.Horizontal
+            and role == QtCore.Qt.DisplayRole):
+            return self._HEADERS[section]
+        return None
+
+    def flags(self, index):
+        '''
+        Returns flags of the given item.
+        '''
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        '''
+        Returns data of the given role stored under the given index.
+        '''
+        if not index.isValid():
+            return None
+        dev = self._devices[index.row()]
+        column = index.column()
+        if role == self.DeviceRole:
+            return dev
+        if role == QtCore.Qt.DisplayRole:
+            if column == self.NAME_COLUMN:
+                return dev.name
+            elif column == self.ADDRESS_COLUMN:
+                return "%s:%d" % dev.address
+            elif column == self.STATUS_COLUMN:
+                return self._statusText(dev)
+        elif role == QtCore.Qt.ToolTipRole:
+            if column == self.STATUS_COLUMN and dev in self._status:
+                return self._status[dev][1] or None
+        elif role == self.SortRole:
+            if column == self.NAME_COLUMN:
+                return dev.name.lower()
+            elif column == self.ADDRESS_COLUMN:
+                return "%s:%05d" % dev.address
+            elif column == self.STATUS_COLUMN:
+                return self._statusText(dev)
+            return int(dev.isConnected())
+        elif role == self.ButtonRole and column == self.BUTTON_COLUMN:
+            if dev in self._status and self._status[dev][2]:
+                return None
+            return dev.isConnected()
+        return None
+
+    def devices(self):
+        '''
+        Returns a list of devices in the model.
+        '''
+        return self._devices[:]
+
+    def hasDevice(self, dev):
+        '''
+        Returns True if the given device is in the model.
+        '''
+        return dev in self._rows
+
+    def addDevices(self, devs):
+        '''
+        Appends the given devices to the model at once.
+        '''
+        devs = [dev for dev in devs if dev not in self._rows]
+        if not devs:
+            return
+        first = len(self._devices)
+        self.beginInsertRows(QtCore.QModelIndex(), first,
+                             first + len(devs) - 1)
+        for row, dev in enumerate(devs):
+            self._devices.append(dev)
+            self._rows[dev] = first + row
+            for signal, slot in self._signals(dev):
+                signal.connect(slot)
+        self.endInsertRows()
+
+    def removeDevice(self, dev):
+        '''
+        Removes the given device from the model.
+        '''
+        row = self._rows.get(dev)
+        if row is None:
+            return
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        for signal, slot in self._signals(dev):
+            signal.disconnect(slot)
+        del self._devices[row]
+        del self._rows[dev]
+        self._status.pop(dev, None)
+        for row in xrange(row, len(self._devices)):
+            self._rows[self._devices[row]] = row
+        self.endRemoveRows()
+
+    def updateDevice(self, dev):
+        '''
+        Updates the displayed name, address and state of the device.
+        '''
+        log.debug("Updating dev item: %s" % dev)
+        self._setStatus(dev, None)
+
+
+class DeviceFilterModel(QtGui.QSortFilterProxyModel):
+    '''
+    A proxy model sorting devices and filtering them by a text contained
+    in their names, addresses or statuses.
+    '''
+    _FILTER_COLUMNS = (DeviceModel.NAME_COLUMN, DeviceModel.ADDRESS_COLUMN,
+                       DeviceModel.STATUS_COLUMN)
+
+    def __init__(self, parent=None):
+        QtGui.QSortFilterProxyModel.__init__(self, parent)
+        self.setSortRole(DeviceModel.SortRole)
+        self.setDynamicSortFilter(True)
+        self._text = ''
+
+    def filterAcceptsRow(self, row, parent):
+        '''
+        Returns True if the device in the given row contains the filter text.
+        '''
+        if not self._text:
+            return True
+        model = self.sourceModel()
+        for column in self._FILTER_COLUMNS:
+            value = model.data(model.index(row, column, parent))
+            if value and self._text in value.lower():
+                return True
+        return False
+
+# Public methods:
+    def setFilterText(self, text):
+        '''
+        Shows only devices containing the given text.
+        '''
+        self._text = text.strip().lower()
+        self.invalidateFilter()
+
+
+class DeviceDelegate(QtGui.QStyledItemDelegate):
+    '''
+    A delegate painting connect buttons of devices.
+    '''
+    _BUTTON_NAMES = ("Connect", "Disconnect")
+    _BUTTON_ICONS = (":/icons/user-offline.png", ":/icons/user-online.png")
+    _BUTTON_ICON_SIZE = QtCore.QSize(11, 11)
+    # Icons shared by all buttons
+    _icons = None
+
+    # Signals:
+    buttonToggled = QtCore.Signal(bool, Device)
+
+    def _buttonOption(self, option, index):
         '''
-        Sets checked state, icon and text of a button corresponding to
-        connection state of the device.
+        Returns a style option of the button in the given item.
         '''
-        connected = self._device.isConnected()
-        self._button.setChecked(connected)
-        self._button.setIcon(self._ITEM_CHECKED_BUTTON_ICON if connected
-                                else self._ITEM_UNCHECKED_BUTTON_ICON)
-        self._button.setText(self._ITEM_CHECKED_BUTTON_NAME if connected
-                                else self._ITEM_UNCHECKED_BUTTON_NAME)
+        if DeviceDelegate._icons is None:
+            DeviceDelegate._icons = tuple(QtGui.QIcon(icon)
+                                          for icon in self._BUTTON_ICONS)
+        state = index.data(DeviceModel.ButtonRole)
+        button = QtGui.QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 1, -2, -1)
+        button.text = self._BUTTON_NAMES[bool(state)]
+        button.icon = self._icons[bool(state)]
+        button.iconSize = self._BUTTON_ICON_SIZE
+        button.state = QtGui.QStyle.State_Raised
+        if state is not None:
+            button.state |= QtGui.QStyle.State_Enabled
+        return button
+
+# Public methods:
+    def paint(self, painter, option, index):
+        '''
+        Paints the given item, and a connect button in the state column.
+        '''
+        QtGui.QStyledItemDelegate.paint(self, painter, option, index)
+        if index.column() != DeviceModel.BUTTON_COLUMN:
+            return
+        style = (option.widget.style() if option.widget
+                 else QtGui.qApp.style())
+        style.drawControl(QtGui.QStyle.CE_PushButton,
+                          self._buttonOption(option, index), painter,
+                          option.widget)
+
+    def sizeHint(self, option, index):
+        '''
+        Returns a size of the given item fitting a connect button.
+        '''
+        size = QtGui.QStyledItemDelegate.sizeHint(self, option, index)
+        if index.column() != DeviceModel.BUTTON_COLUMN:
+            return size
+        metrics = option.fontMetrics
+        width = max(metrics.width(name) for name in self._BUTTON_NAMES)
+        return QtCore.QSize(width + self._BUTTON_ICON_SIZE.width() + 30,
+                            max(size.height(), metrics.height() + 10))
+
+    def editorEvent(self, event, model, option, index):
+        '''
+        Emits the 'buttonToggled' signal when a connect button is clicked.
+        '''
+        if (index.column() == DeviceModel.BUTTON_COLUMN
+            and event.type() == QtCore.QEvent.MouseButtonRelease
+            and event.button() == QtCore.Qt.LeftButton
+            and option.rect.contains(event.pos())):
+            state = index.data(DeviceModel.ButtonRole)
+            if state is not None:
+                self.buttonToggled.emit(not state,
+                                        index.data(DeviceModel.DeviceRole))
+            return True
+        return QtGui.QStyledItemDelegate.editorEvent(self, event, model,
+                                                     option, index)
 
         
 class DevicesDialog(QtCore.QObject):
@@ -281,7 +1233,25 @@ class DevicesDialog(QtCore.QObject):
     A manage devices dialog class.
     '''
     _DIALOG_UI = "devices_dialog.ui"
-    _N_COLS = 3
+    # Maximum number of devices connected at once
+    _CONNECT_WORKERS = 8
+
+    section = settings.get("metrics", "requests", force=True)
+    _metricsTimeout = section.get("timeout", default=60000)
+    _metricsBytes = section.get("count_bytes", default=False)
+    section = settings.get("metrics", "dump", force=True)
+    _metricsDump = section.get("enabled", default=False)
+    _metricsDumpInterval = section.get("interval", default=60000)
+    _metricsDumpFile = section.get("file", default='')
+    section = settings.get("metrics", "capture", force=True)
+    _captureEnabled = section.get("enabled", default=False)
+    _captureFile = section.get("file", default='')
+    del section
+
+    # Default files of periodic dumps of metrics and of captured traffic
+    _METRICS_DUMP_FILE = utils.cachePath("metrics.json")
+    _CAPTURE_FILE = utils.cachePath("capture-%Y%m%d-%H%M%S"
+                                    + CAPTURE_EXTENSION)
 
 # Signals:
     connected =  QtCore.Signal(device.Device)
@@ -293,9 +1263,21 @@ class DevicesDialog(QtCore.QObject):
         QtCore.QObject.__init__(self)
         elements = utils.loadUi(self._DIALOG_UI, parent=utils.window())
         self.dialog = elements["Dialog"]
-        self._deviceList = elements["treeWidgetDevices"]
+        self._model = DeviceModel(self)
+        self._proxy = DeviceFilterModel(self)
+        self._proxy.setSourceModel(self._model)
+        self._delegate = DeviceDelegate(self)
+        self._delegate.buttonToggled.connect(self._updateConnectionState)
+        self._deviceList = elements["treeViewDevices"]
+        self._deviceList.setModel(self._proxy)
+        self._deviceList.setItemDelegate(self._delegate)
+        self._deviceList.sortByColumn(DeviceModel.NAME_COLUMN,
+                                      QtCore.Qt.AscendingOrder)
+        elements["lineEditFilter"].textChanged.connect(
+                                                    self._proxy.setFilterText)
         elements["buttonClose"].clicked.connect(self.dialog.close)
-        self._deviceList.itemSelectionChanged.connect(self._updateDialogButtons)
+        self._deviceList.selectionModel().selectionChanged.connect(
+                                                    self._updateDialogButtons)
         elements["buttonConnectAll"].clicked.connect(self._connectAll)
         elements["buttonDisconnectAll"].clicked.connect(self._disconnectAll)
         self._addButton = elements["buttonAdd"]
@@ -304,8 +1286,25 @@ class DevicesDialog(QtCore.QObject):
         self._editButton.clicked.connect(self._editDevice)
         self._removeButton = elements["buttonRemove"]
         self._removeButton.clicked.connect(self._removeDevice)
-        self._deviceItems = {}
         self._errors = {}
+        self._connector = DeviceConnector(self._CONNECT_WORKERS)
+        self._connector.idle.connect(self._connectingFinished)
+        # Devices whose connection errors are reported in message boxes
+        self._reportErrors = set()
+        self._firstRun = False
+        self.metrics = metrics.DeviceMetrics(self._metricsTimeout.getInt(),
+                                             self._metricsBytes.getBool())
+        if self._metricsDump.getBool():
+            self.metrics.startDumping(self._metricsDumpFile.get()
+                                      or self._METRICS_DUMP_FILE,
+                                      self._metricsDumpInterval.getInt())
+        self._metricsDialog = metrics.MetricsDialog(self.metrics)
+        elements["buttonStatistics"].clicked.connect(self._metricsDialog.run)
+        self._capture = None
+        if self._captureEnabled.getBool():
+            self._startCapture(time.strftime(self._captureFile.get()
+                                             or self._CAPTURE_FILE))
+        devices.load(type=Device)
         self._refresh()
 
 # Public methods:
@@ -316,6 +1315,9 @@ class DevicesDialog(QtCore.QObject):
         log.debug("Unloading device list")
         for dev in devices.all():
             self._updateConnectionState(False, dev)
+        if self._capture is not None:
+            self._capture.close()
+            self._capture = None
 
     def firstRun(self):
         '''
@@ -324,14 +1326,14 @@ class DevicesDialog(QtCore.QObject):
         '''
         log.debug("First running manage devices dialog")
         empty = True
-        connected = False
-        for dev in self._deviceItems:
+        for dev in self._model.devices():
             empty = False
             if bool(dev.params.get("autoconnect", False)):
-                self._updateConnectionState(True, dev)
-            if not connected and dev.isConnected():
-                connected = True
-        if not connected:
+                self._connector.connectDevice(dev)
+        if self._connector.isConnecting():
+            # the dialog is shown if none of the devices connects
+            self._firstRun = True
+        else:
             self.dialog.show()
         if empty:
             self._addDevice()
@@ -345,51 +1347,83 @@ class DevicesDialog(QtCore.QObject):
         self.dialog.show()
 
 # Private methods:
-    def _addDeviceItem(self, dev):
+    def _addDevices(self, devs):
         '''
-        Adds an item for given device. 
+        Adds rows for given devices.
 
-        :param dev: A device
-        :type dev: Device
+        :param devs: A list of devices
+        :type devs: list
         '''
-        item = DeviceItem(self._deviceList, dev)
-        item.buttonToggled.connect(self._updateConnectionState)
-        self._deviceItems[dev] = item
-        # Fix column sizes
-        for col in xrange(self._N_COLS):
-            self._deviceList.resizeColumnToContents(col)
-        dev.connected.connect(self._deviceConnected)
-        dev.disconnected.connect(self._deviceDisconnected)
-        dev.requestSent.connect(self._requestSent)
-        dev.responseReceived.connect(self._responseReceived)
-        dev.errorOccurred.connect(self._errorOccurred)
+        self._model.addDevices(devs)
+        for dev in devs:
+            dev.capture = self._capture
+            dev.connected.connect(self._deviceConnected)
+            dev.connectFailed.connect(self._connectFailed)
+            dev.disconnected.connect(self._deviceDisconnected)
+            dev.requestSent.connect(self._requestSent)
+            dev.requestNamed.connect(self._requestNamed)
+            dev.responseReceived.connect(self._responseReceived)
+            dev.responseRead.connect(self._responseRead)
+            dev.errorOccurred.connect(self._errorOccurred)
+            dev.reconnectRequested.connect(self._reconnectDevice)
+        self._resizeColumns()
 
-    def _removeDeviceItem(self, dev):
+    def _removeDevices(self, devs):
         '''
-        Removes an item corresponding to given device.
+        Removes rows corresponding to given devices.
 
-        :param dev: A device
-        :type dev: Device
+        :param devs: A list of devices
+        :type devs: list
+        '''
+        for dev in devs:
+            log.debug("Removing dev item: %s" % dev)
+            self._model.removeDevice(dev)
+        self._resizeColumns()
+
+    def _startCapture(self, path):
+        '''
+        Starts capturing traffic of devices to a file of the given path.
         '''
-        log.debug("Removing dev item: %s" % dev)
-        index = self._deviceList.indexOfTopLevelItem(self._deviceItems[dev])
-        self._deviceList.takeTopLevelItem(index)
-        for col in xrange(self._N_COLS):
+        try:
+            directory = os.path.dirname(path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            self._capture = TrafficCapture(path)
+        except EnvironmentError, err:
+            log.error("Cannot capture traffic to '%s': %s" % (path, err))
+            return
+        log.info("Capturing traffic of devices to '%s'" % path)
+
+    def _resizeColumns(self):
+        '''
+        Fits sizes of columns to their contents.
+        '''
+        for col in xrange(self._model.columnCount()):
             self._deviceList.resizeColumnToContents(col)
-        self._deviceItems.pop(dev)
+
+    def _selectedDevice(self):
+        '''
+        Returns the currently selected device or None.
+        '''
+        rows = self._deviceList.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return rows[0].data(DeviceModel.DeviceRole)
 
     def _refresh(self):
         '''
-        Refreshes the list of devices.
+        Updates the list of devices with devices added or removed since
+        the last refresh, without reloading their configuration.
         '''
         log.debug("Refreshing device list")
-        devices.load(type=Device)
-        for dev in self._deviceItems.keys()[:]:
-            if devices.get(dev.name) is None and not dev.isConnected():
-                self._removeDeviceItem(dev)
-        for dev in devices.all():
-            if dev not in self._deviceItems:
-                self._addDeviceItem(dev)
+        removed = [dev for dev in self._model.devices()
+                   if devices.get(dev.name) is None and not dev.isConnected()]
+        if removed:
+            self._removeDevices(removed)
+        added = [dev for dev in devices.all()
+                 if not self._model.hasDevice(dev)]
+        if added:
+            self._addDevices(added)
         self._updateDialogButtons()
 
 # Slots:
@@ -404,7 +1438,7 @@ class DevicesDialog(QtCore.QObject):
             return
         connect = dialog.params.pop("connect", False)
         dev = devices.add(type=Device, **dialog.params)
-        self._addDeviceItem(dev)
+        self._addDevices([dev])
         log.info("New device added: %s" % dev)
         if connect:
             self._updateConnectionState(True, dev)
@@ -414,10 +1448,9 @@ class DevicesDialog(QtCore.QObject):
         '''
         Runs the 'Edit device' dialog for currently selected device.
         '''
-        items = self._deviceList.selectedItems()
-        if not items:
+        dev = self._selectedDevice()
+        if dev is None:
             return
-        dev = devices.get(items[0].text(0))
         log.debug("Editing device: %s" % dev)
         dialog = DeviceConfigDialog(dev)
         if not dialog.run():
@@ -426,17 +1459,17 @@ class DevicesDialog(QtCore.QObject):
         if dev.name != dialog.params["name"]:
             self._updateConnectionState(False, dev)
             devices.remove(dev.name)
-            index = self._deviceList.indexOfTopLevelItem(items[0])
-            self._deviceList.takeTopLevelItem(index)
+            self._removeDevices([dev])
             dev = devices.add(type=Device, **dialog.params)
-            self._addDeviceItem(dev)
+            self._addDevices([dev])
         else:
             address = dialog.params["address"]
             port = dialog.params["port"]
             if dev.address != (address, port):
                 self._updateConnectionState(False, dev)
             devices.update(**dialog.params)
-            self._deviceItems[dev].updateDevice()
+            self._model.updateDevice(dev)
+            self._resizeColumns()
         log.info("Device edited: %s" % dev)
         if connect:
             self._updateConnectionState(True, dev)
@@ -446,17 +1479,16 @@ class DevicesDialog(QtCore.QObject):
         '''
         Removes the currently selected device.
         '''
-        items = self._deviceList.selectedItems()
-        if not items:
+        dev = self._selectedDevice()
+        if dev is None:
             return
-        dev = devices.get(items[0].text(0))
         if not dialogs.runQuestion("Do you want to remove "
                                    "'%s' device permanently?" % dev.name):
             return
         log.debug("Removing device: %s" % dev)
         self._updateConnectionState(False, dev)
         devices.remove(dev.name)
-        self._removeDeviceItem(dev)
+        self._removeDevices([dev])
         log.info("Device removed: %s" % dev)
 
     #@QtCore.Slot()
@@ -466,8 +1498,34 @@ class DevicesDialog(QtCore.QObject):
         '''
         dev = self.sender()
         log.info("Device connected: %s" % dev)
+        self._reportErrors.discard(dev)
         self.connected.emit(dev)
 
+    #@QtCore.Slot(object)
+    def _connectFailed(self, error):
+        '''
+        Logs an error of connecting a device and reports it in a message box
+        if the device was connected explicitly.
+        '''
+        dev = self.sender()
+        log.error("Connecting '%s' device failed: %s" % (dev, error))
+        if dev in self._reportErrors:
+            self._reportErrors.discard(dev)
+            dialogs.runError("Error occurred in connection to '%s' device:\n%s"
+                              % (dev.name, str(error)))
+
+    #@QtCore.Slot()
+    def _connectingFinished(self):
+        '''
+        Shows the dialog after connecting devices at the first run if none
+        of them is connected.
+        '''
+        if not self._firstRun:
+            return
+        self._firstRun = False
+        if not [dev for dev in self._model.devices() if dev.isConnected()]:
+            self.dialog.show()
+
     #@QtCore.Slot()
     def _deviceDisconnected(self):
         '''
@@ -475,7 +1533,18 @@ class DevicesDialog(QtCore.QObject):
         '''
         dev = self.sender()
         log.info("Device disconnected: %s" % dev)
-        self.disconnected.emit(dev, self._errors.pop(dev, None) is not None)
+        self.metrics.forget(dev)
+        error = self._errors.pop(dev, None) is not None
+        self.disconnected.emit(dev, error or dev.isReconnecting())
+
+    #@QtCore.Slot()
+    def _reconnectDevice(self):
+        '''
+        Makes an attempt to reconnect a device whose connection was lost.
+        '''
+        dev = self.sender()
+        log.debug("Reconnecting '%s' device" % dev)
+        self._connector.connectDevice(dev)
 
     #@QtCore.Slot(int)
     def _requestSent(self, id):
@@ -489,6 +1558,18 @@ class DevicesDialog(QtCore.QObject):
         log.debug("Device request sent: %s" % dev)
         self.requestSent.emit(dev, id)
 
+    #@QtCore.Slot(int, str)
+    def _requestNamed(self, id, name):
+        '''
+        Records a sent device request of the given type.
+
+        :param id: Id of sent request
+        :type id: int
+        :param name: Name of the request function
+        :type name: string
+        '''
+        self.metrics.requestSent(self.sender(), id, name)
+
     #@QtCore.Slot(int)
     def _responseReceived(self, id):
         '''
@@ -499,24 +1580,31 @@ class DevicesDialog(QtCore.QObject):
         '''
         dev = self.sender()
         log.debug("Device response received: %s" % dev)
+        self.metrics.responseReceived(dev, id)
         self.responseReceived.emit(dev, id)
 
+    #@QtCore.Slot(int, object)
+    def _responseRead(self, id, response):
+        '''
+        Records the status and the size of a read device response.
+
+        :param id: Id of read response
+        :type id: int
+        '''
+        self.metrics.responseRead(self.sender(), id, response)
+
     #@QtCore.Slot()
     def _errorOccurred(self):
         '''
-        Disconnects a device in case of a ConnectionLostError.
+        Disconnects a device and starts reconnecting it in case of
+        a ConnectionLostError.
         '''
         dev = self.sender()
         err = dev.getError()
         log.error("Error occurred in '%s' device: %s" % (dev.name, err))
         if isinstance(err, client.ConnectionLostError):
-            try:
-                dialogs.runError("'%s' device disconnected:\n%s"
-                                 % (dev.name, err))
-                self._errors[dev] = err
-                self._updateConnectionState(False, dev)
-            except ConnectionError, ex:
-                log.error("Connection Error (%s): %s" % (dev, ex))
+            self._errors[dev] = err
+            dev.connectionLost(err)
 
     #@QtCore.Slot()
     def _updateConnectionState(self, state, dev):
@@ -530,11 +1618,21 @@ class DevicesDialog(QtCore.QObject):
         '''
         log.debug("%s '%s' device"
                   % ("Connecting" if state else "Disconnecting", dev))
+        if state:
+            self._reportErrors.add(dev)
+            self._connector.connectDevice(dev)
+            return
+        if self._connector.isConnecting(dev):
+            log.warning("Cannot disconnect '%s' device being connected" % dev)
+            return
+        if dev.isReconnecting():
+            # views keep the lost device until reconnecting is given up
+            dev.stopReconnecting()
+            self._model.updateDevice(dev)
+            self.disconnected.emit(dev, False)
+            return
         try:
-            if state:
-                dev.connectDevice()
-            else:
-                dev.disconnectDevice()
+            dev.disconnectDevice()
         except ConnectionError, err:
             dialogs.runError("Error occurred in connection to '%s' device:\n%s"
                               % (dev.name, str(err)))
@@ -546,7 +1644,7 @@ class DevicesDialog(QtCore.QObject):
         '''
         log.debug("Connecting all devices")
         for dev in devices.all():
-            self._updateConnectionState(True, dev)
+            self._connector.connectDevice(dev)
 
     #@QtCore.Slot()
     def _disconnectAll(self):
@@ -562,7 +1660,7 @@ class DevicesDialog(QtCore.QObject):
         '''
         Updates state of Edit and Remove buttons.
         '''
-        state = bool(self._deviceList.selectedItems())
+        state = self._selectedDevice() is not None
         log.debug("%s devices dialog buttons"
                   % ("Enabling" if state else "Disabling"))
         self._editButton.setEnabled(state)
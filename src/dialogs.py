@@ -54,8 +54,12 @@ class ProgressDialog(QtGui.QProgressDialog):
         self.setWindowModality(QtCore.Qt.WindowModal)
         self.setRange(0, 0)
         self.setCancelButtonText(None)
+        self.canceled.connect(self._cancel)
         self._dict = {}
+        self._values = {}
         self._timeouts = {}
+        # Functions cancelling operations of messages by their IDs
+        self._cancels = {}
         self._id = -1
         self._current = -1
         self._lock = threading.RLock()
@@ -86,7 +90,12 @@ class ProgressDialog(QtGui.QProgressDialog):
             title, message = self._dict[ids[0]][:2]
             self.setWindowTitle(title)
             self.setLabelText(message)
+            self.setCancelButtonText("Cancel" if ids[0] in self._cancels
+                                     else None)
             self._current = ids[0]
+        value, maximum = self._values.get(self._current, (0, 0))
+        self.setRange(0, maximum)
+        self.setValue(value)
         if not self.isVisible():
             self.show()
 
@@ -101,10 +110,22 @@ class ProgressDialog(QtGui.QProgressDialog):
         self.remove(id)
         runWarning("Timeout reached for operation:\n%s" % message)
 
+    #@QtCore.Slot()
+    def _cancel(self):
+        '''
+        Cancels the operation of the displayed message if it can be
+        cancelled, or displays the dialog again otherwise.
+        '''
+        cancel = self._cancels.get(self._current)
+        if cancel is not None:
+            cancel()
+        self._update()
+
 # Public methods:
-    def add(self, message, title, timeout=None):
+    def add(self, message, title, timeout=None, cancel=None):
         '''
-        Adds a message and returns an ID.
+        Adds a message and returns an ID. The dialog shows a cancel button
+        calling the given function while the message is displayed.
         '''
         self._lock.acquire()
         try:
@@ -118,6 +139,8 @@ class ProgressDialog(QtGui.QProgressDialog):
                 timer.timeout.connect(self._handleTimeout)
                 timer.start()
             self._dict[id] = (title, message, timeout, timer)
+            if cancel is not None:
+                self._cancels[id] = cancel
             self._id = id
             self._update()
             return id
@@ -133,12 +156,32 @@ class ProgressDialog(QtGui.QProgressDialog):
             if id not in self._dict:
                 return
             timer = self._dict.pop(id)[3]
+            self._values.pop(id, None)
+            self._cancels.pop(id, None)
             if timer and timer.isActive:
                 timer.stop()
             self._update()
         finally:
             self._lock.release()
 
+    def change(self, id, message, value=0, maximum=0):
+        '''
+        Changes a message of given ID and its progress value. Maximum equal
+        to 0 indicates unknown progress.
+        '''
+        self._lock.acquire()
+        try:
+            if id not in self._dict:
+                return
+            title, old, timeout, timer = self._dict[id]
+            self._dict[id] = (title, message, timeout, timer)
+            self._values[id] = (value, maximum)
+            if id == self._current:
+                self.setLabelText(message)
+            self._update()
+        finally:
+            self._lock.release()
+
     def closeEvent(self, event):
         '''
         Prevents the dialog from closing unless there are no more messages. 
@@ -149,7 +192,7 @@ class ProgressDialog(QtGui.QProgressDialog):
 # instance of ProgressDialog
 _progress = None
 
-def runProgress(message, title="Wait", timeout=None):
+def runProgress(message, title="Wait", timeout=None, cancel=None):
     '''
     Enqueues a message to the progress dialog.
     
@@ -160,13 +203,16 @@ def runProgress(message, title="Wait", timeout=None):
     :param timeout: Timeout of the dialog in microseconds, the default value
         is infinity
     :type timeout: integer
+    :param cancel: Function called when the operation is cancelled, the dialog
+        has no cancel button if not provided
+    :type cancel: callable
     :return: Unique identifier of the message
     :rtype: integer
     '''
     global _progress
     if _progress is None:
         _progress = ProgressDialog(utils.window())
-    return _progress.add(message, title, timeout)
+    return _progress.add(message, title, timeout, cancel)
 
 def closeProgress(id):
     '''
@@ -177,6 +223,21 @@ def closeProgress(id):
     '''
     _progress.remove(id)
 
+def updateProgress(id, message, value=0, maximum=0):
+    '''
+    Changes a message in the progress dialog and its progress.
+    
+    :param id: Identifier of a message to change
+    :type id: integer
+    :param message: New message to be displayed inside the dialog
+    :type message: string
+    :param value: Current progress value
+    :type value: integer
+    :param maximum: Maximum progress value, 0 if unknown
+    :type maximum: integer
+    '''
+    _progress.change(id, message, value, maximum)
+
 
 def runError(message, title="Error"):
     '''
@@ -261,7 +322,7 @@ def runSaveFile(filters, name=""):
         return None
     path = dialog.selectedFiles()[0]
     ext = extensions[dialog.selectedFilter()] 
-    if ext not in ("", "*") and os.path.splitext(path)[1].strip(".") != ext:
+    if ext not in ("", "*") and not path.endswith(".%s" % ext):
         path = "%s.%s" % (path, ext)
     if os.path.exists(path):
         if not runQuestion("'%s' already exists.\nDo you want to replace it?"
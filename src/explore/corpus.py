@@ -0,0 +1,464 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import Queue
+import shutil
+import sqlite3
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+
+from PySide import QtCore
+
+from tadek.core import log
+from tadek.core import accessible
+
+from utils import cachePath
+from dump import isCompressed, DumpCancelled
+from dumpstore import pathDigest
+from index import tokens
+
+# Version of the corpus format, corpora of other versions are indexed again
+_VERSION = "3"
+# Extension of uncompressed dump files
+_DUMP_EXTENSION = ".xml"
+# Timeout in seconds of waiting for an indexed dump, after which
+# cancelling is checked
+_WAIT_TIMEOUT = 0.5
+
+_CACHE_DIR = cachePath("corpus")
+
+# Command running a worker process indexing dumps in a separate interpreter
+_WORKER = [sys.executable,
+           os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "dumpindexer.py")]
+
+# Columns of indexed node attributes matched by the search criteria,
+# each has a case-folded counterpart of the "_fold" suffix
+_COLUMNS = {
+    "role": "role",
+    "name": "name",
+    "state": "states",
+    "text": "text",
+}
+
+def _globPattern(value):
+    '''
+    Returns a GLOB pattern matching strings containing the given value.
+    '''
+    return "*%s*" % "".join("[%s]" % char if char in "[*?" else char
+                            for char in value)
+
+
+def corpusPath(directory):
+    '''
+    Returns a path to the corpus database of the given dump directory.
+    '''
+    return os.path.join(_CACHE_DIR, pathDigest(directory) + ".db")
+
+
+def isDump(path):
+    '''
+    Returns True if the given path is a path to a dump file.
+    '''
+    if isCompressed(path):
+        path = path[:-len(".gz")]
+    return path.lower().endswith(_DUMP_EXTENSION)
+
+
+class _Worker(object):
+    '''
+    A worker process indexing dumps one by one. Results are put into
+    the given queue as pairs of the worker and True on success, False
+    on failure or None when the process exits.
+    '''
+    def __init__(self, results):
+        self.source = None
+        self._results = results
+        self._process = subprocess.Popen(_WORKER, stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE)
+        thread = threading.Thread(target=self._read, name="CorpusWorker")
+        thread.daemon = True
+        thread.start()
+
+    def _read(self):
+        '''
+        Reads results of the worker process in a thread.
+        '''
+        for line in iter(self._process.stdout.readline, ''):
+            self._results.put((self, line.strip() == "1"))
+        self._results.put((self, None))
+
+    def index(self, source, path):
+        '''
+        Indexes the given dump file to a database of the given path.
+        '''
+        self.source = source
+        if not isinstance(source, unicode):
+            source = source.decode(sys.getfilesystemencoding() or "utf-8")
+        self._process.stdin.write("%s\t%s\n" % (source.encode("utf-8"),
+                                                 path))
+        self._process.stdin.flush()
+
+    def close(self):
+        '''
+        Lets the worker process exit after its last dump.
+        '''
+        self._process.stdin.close()
+
+    def kill(self):
+        '''
+        Kills the worker process.
+        '''
+        try:
+            self._process.kill()
+        except OSError:
+            pass
+        self._process.wait()
+
+
+class CorpusNode(object):
+    '''
+    An accessible of an indexed dump with attributes matched by the search.
+    '''
+    __slots__ = ("source", "path", "role", "name", "states", "text")
+
+    def __init__(self, source, path, role, name, states, text):
+        self.source = source
+        self.path = accessible.Path(*[int(idx) for idx in path.split('/')
+                                      if idx])
+        self.role = role
+        self.name = name
+        self.states = states.split('\n') if states else []
+        self.text = text
+
+
+class Corpus(object):
+    '''
+    An index of attributes of all nodes of dumps in a directory, kept
+    in an SQLite database, to find accessibles across dumps without
+    opening them.
+    '''
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.path = corpusPath(self.directory)
+
+    def _connect(self):
+        '''
+        Returns a connection to the corpus database, which is created
+        if it does not exist or is of other version.
+        '''
+        if not os.path.isdir(_CACHE_DIR):
+            os.makedirs(_CACHE_DIR)
+        db = sqlite3.connect(self.path)
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        if str(version) != _VERSION:
+            db.executescript('''
+                DROP TABLE IF EXISTS dumps;
+                DROP TABLE IF EXISTS nodes;
+                DROP TABLE IF EXISTS words;
+                DROP TABLE IF EXISTS tokens;
+                CREATE TABLE dumps (id INTEGER PRIMARY KEY,
+                                    source TEXT UNIQUE, size TEXT,
+                                    mtime TEXT);
+                CREATE TABLE nodes (dump INTEGER, path TEXT, role TEXT,
+                                    name TEXT, states TEXT, text TEXT,
+                                    role_fold TEXT, name_fold TEXT,
+                                    states_fold TEXT, text_fold TEXT);
+                CREATE TABLE words (id INTEGER PRIMARY KEY, kind TEXT,
+                                    word TEXT, UNIQUE (kind, word));
+                CREATE TABLE tokens (word INTEGER, dump INTEGER,
+                                     node INTEGER);
+                CREATE INDEX nodes_dump ON nodes (dump);
+                CREATE INDEX tokens_word ON tokens (word);
+                CREATE INDEX tokens_dump ON tokens (dump);
+                PRAGMA user_version = %s;
+            ''' % _VERSION)
+        return db
+
+    def _condition(self, check):
+        '''
+        Returns an SQL condition with its parameters preselecting nodes that
+        may match the given search check, which verifies them afterwards.
+        Candidate nodes are looked up by words of the criteria and then
+        filtered by their attributes.
+        '''
+        conditions = []
+        params = []
+        fold = not check.caseSensitive
+        for attr, column in _COLUMNS.iteritems():
+            value = getattr(check, attr)
+            if not value or attr in check.expressions:
+                continue
+            if attr in ("role", "state"):
+                words = set([value.upper()])
+            else:
+                words = set(tokens(value))
+            for word in words:
+                if check.exact:
+                    match = "word = ?"
+                else:
+                    match = "word GLOB ?"
+                    word = _globPattern(word)
+                conditions.append("nodes.rowid IN (SELECT node FROM tokens "
+                                  "WHERE word IN (SELECT id FROM words "
+                                  "WHERE kind = ? AND %s))" % match)
+                params.extend((attr, word))
+            if fold:
+                value = value.upper()
+                column += "_fold"
+            if check.exact and attr != "state":
+                conditions.append("%s = ?" % column)
+                params.append(value)
+            else:
+                conditions.append("%s GLOB ?" % column)
+                params.append(_globPattern(value))
+        return " AND ".join(conditions) or "1", params
+
+    def dumps(self):
+        '''
+        Returns a dictionary of paths to dump files in the directory and
+        pairs of their sizes and modification times.
+        '''
+        dumps = {}
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if not isDump(name):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                dumps[path] = (str(stat.st_size), repr(stat.st_mtime))
+        return dumps
+
+    def isIndexed(self):
+        '''
+        Returns True if the directory was indexed.
+        '''
+        return os.path.exists(self.path)
+
+    def update(self, progress=None, cancelled=None, processes=None):
+        '''
+        Indexes dumps of the directory that are not indexed yet or were
+        modified since, using the given number of worker processes, by
+        default as many as processors. Returns a number of indexed dumps.
+
+        The optional progress function is called with numbers of processed
+        and all dumps to index. DumpCancelled is raised as soon as
+        the optional cancelled event is set.
+        '''
+        dumps = self.dumps()
+        db = self._connect()
+        try:
+            for id, source, size, mtime in db.execute(
+                "SELECT id, source, size, mtime FROM dumps").fetchall():
+                if dumps.get(source) == (size, mtime):
+                    continue
+                db.execute("DELETE FROM nodes WHERE dump=?", (id,))
+                db.execute("DELETE FROM tokens WHERE dump=?", (id,))
+                db.execute("DELETE FROM dumps WHERE id=?", (id,))
+            db.commit()
+            indexed = set(source for source, in
+                          db.execute("SELECT source FROM dumps"))
+            sources = [source for source in sorted(dumps)
+                       if source not in indexed]
+            if sources:
+                log.info("Indexing %d dumps of '%s'"
+                         % (len(sources), self.directory))
+                self._index(db, dumps, sources, progress, cancelled,
+                            processes or multiprocessing.cpu_count())
+            return db.execute("SELECT count(*) FROM dumps").fetchone()[0]
+        finally:
+            db.close()
+
+    def _index(self, db, dumps, sources, progress, cancelled, processes):
+        '''
+        Indexes the given dump files in the given number of worker processes,
+        each to its own database, and moves their nodes into the given
+        database.
+        '''
+        directory = tempfile.mkdtemp(prefix="tadek-corpus-")
+        results = Queue.Queue()
+        pending = [(source, os.path.join(directory, "%d.db" % i))
+                   for i, source in enumerate(sources)]
+        pending.reverse()
+        paths = dict(pending)
+        workers = []
+        try:
+            for i in xrange(min(processes, len(sources))):
+                worker = _Worker(results)
+                workers.append(worker)
+                worker.index(*pending.pop())
+            done = 0
+            while done < len(sources):
+                if cancelled is not None and cancelled.is_set():
+                    raise DumpCancelled()
+                try:
+                    worker, status = results.get(timeout=_WAIT_TIMEOUT)
+                except Queue.Empty:
+                    continue
+                source = worker.source
+                worker.source = None
+                if source is None:
+                    continue
+                done += 1
+                if status:
+                    self._merge(db, source, dumps[source], paths[source])
+                else:
+                    log.warning("Could not index dump '%s'" % source)
+                if status is None:
+                    # the process exited, another one takes over its dumps
+                    workers.remove(worker)
+                    if not pending:
+                        continue
+                    worker = _Worker(results)
+                    workers.append(worker)
+                if pending:
+                    worker.index(*pending.pop())
+                else:
+                    worker.close()
+                if progress is not None:
+                    progress(done, len(sources))
+        finally:
+            for worker in workers:
+                worker.kill()
+            shutil.rmtree(directory, True)
+
+    def _merge(self, db, source, stamp, path):
+        '''
+        Moves nodes of the given dump file with the given pair of its size
+        and modification time from a database of the given path, to which
+        the dump was indexed, into the given database.
+        '''
+        db.execute("ATTACH DATABASE ? AS part", (path,))
+        try:
+            id = db.execute("INSERT INTO dumps (source, size, mtime) "
+                            "VALUES (?, ?, ?)", (source,) + stamp).lastrowid
+            offset = db.execute("SELECT ifnull(max(rowid), 0) "
+                                "FROM nodes").fetchone()[0]
+            db.execute("INSERT INTO nodes (rowid, dump, path, role, name, "
+                       "states, text, role_fold, name_fold, states_fold, "
+                       "text_fold) SELECT rowid + ?, ?, path, role, name, "
+                       "states, text, role_fold, name_fold, states_fold, "
+                       "text_fold FROM part.nodes", (offset, id))
+            db.execute("INSERT OR IGNORE INTO words (kind, word) "
+                       "SELECT DISTINCT kind, word FROM part.tokens")
+            db.execute("INSERT INTO tokens (word, dump, node) "
+                       "SELECT words.id, ?, part.tokens.node + ? "
+                       "FROM part.tokens JOIN words "
+                       "ON words.kind = part.tokens.kind "
+                       "AND words.word = part.tokens.word", (id, offset))
+            db.commit()
+        finally:
+            db.rollback()
+            db.execute("DETACH DATABASE part")
+
+    def find(self, check):
+        '''
+        Returns a list of nodes of indexed dumps matching the given search
+        check, ordered by dumps and paths.
+        '''
+        if not self.isIndexed():
+            return []
+        condition, params = self._condition(check)
+        db = sqlite3.connect(self.path)
+        try:
+            rows = db.execute("SELECT dumps.source, nodes.path, nodes.role, "
+                              "nodes.name, nodes.states, nodes.text "
+                              "FROM nodes JOIN dumps ON nodes.dump=dumps.id "
+                              "WHERE %s ORDER BY dumps.source, nodes.rowid"
+                              % condition, params).fetchall()
+        finally:
+            db.close()
+        nodes = []
+        for row in rows:
+            node = CorpusNode(*row)
+            if check(node):
+                nodes.append(node)
+        return nodes
+
+
+class CorpusIndexer(QtCore.QObject):
+    '''
+    Indexes dumps of a corpus in a worker thread.
+    '''
+    progress = QtCore.Signal(int, int)
+    indexed = QtCore.Signal(int)
+    failed = QtCore.Signal(str)
+    cancelled = QtCore.Signal()
+
+    def __init__(self, corpus):
+        QtCore.QObject.__init__(self)
+        self.corpus = corpus
+        self._cancelled = threading.Event()
+
+    def _run(self):
+        '''
+        Indexes the corpus and reports the result.
+        '''
+        try:
+            count = self.corpus.update(self.progress.emit, self._cancelled)
+        except DumpCancelled:
+            log.info("Indexing dumps of '%s' cancelled"
+                     % self.corpus.directory)
+            self.cancelled.emit()
+        except Exception, ex:
+            log.exception(ex)
+            self.failed.emit(str(ex))
+        else:
+            self.indexed.emit(count)
+
+    def start(self):
+        '''
+        Starts indexing in a worker thread.
+        '''
+        thread = threading.Thread(target=self._run,
+                                  name="CorpusIndexer-%s"
+                                       % self.corpus.directory)
+        thread.daemon = True
+        thread.start()
+
+    #@QtCore.Slot()
+    def cancel(self):
+        '''
+        Cancels indexing.
+        '''
+        self._cancelled.set()
@@ -34,17 +34,22 @@
 ##                                                                            ##
 ################################################################################
 
+import bisect
+import collections
+
 from PySide import QtCore
 from PySide import QtGui
 
 from tadek.core import log
-from tadek.core import utils
 from tadek.core import settings
 from tadek.core import accessible
 
 import dialogs
 from utils import viewName, setWait, resetWait
 from devices import OfflineDevice
+from dump import DumpWriter, ChunkedDump
+from dumpstore import DumpDevice, DumpResponse
+from index import AccessibleIndex
 
 
 class HighlightableItem(QtGui.QTreeWidgetItem):
@@ -133,23 +138,44 @@ class DeviceTab(QtCore.QObject):
     _TIMEOUT_REFRESH = 10000
     _TIMEOUT_EXPAND = 300000
     _TIMEOUT_EXPAND_ALL = 600000
-    _TIMEOUT_DUMP = 300000
-    _TIMEOUT_DUMP_ALL = 600000
     _COLUMN_COUNT = 4
+    _DUMP_FILTERS = ("XML files (*.xml);;Compressed XML files (*.xml.gz);;"
+                     "All files (*)")
+
+    section = settings.get(viewName(), "search", force=True)
+    _searchWindow = section.get("window", default=16)
+    # Number of accessibles of off-line devices searched between processing
+    # of pending events
+    _searchBatch = section.get("offline_batch", default=200)
+    section = settings.get(viewName(), "dump", force=True)
+    _dumpWindow = section.get("window", default=4)
+    _dumpSplit = section.get("split", default=2)
+    _dumpTimeout = section.get("timeout", default=60000)
+    _dumpRetries = section.get("retries", default=2)
+    del section
     
     itemFound = QtCore.Signal()
     itemNotFound = QtCore.Signal()
+    matchFound = QtCore.Signal(object, object)
     startItemChanged = QtCore.Signal()
     searchingStopped = QtCore.Signal()
+    searchingFinished = QtCore.Signal()
 
     def __init__(self, device, view):
         QtCore.QObject.__init__(self)
-        self._offline = isinstance(device, OfflineDevice)
+        self._offline = isinstance(device, (OfflineDevice, DumpDevice))
         self._manualExpand = False
         self._manualSelect = False
         self._reqMap = {}
         self._progressMap = {}
+        self._searchId = 0
+        self._indexSearch = False
+        # Paths of accessibles found in the index without states
+        self._indexUnknown = set()
+        self._searchAll = False
         self._view = view
+        # index of all accessibles loaded in the tab
+        self.index = AccessibleIndex()
         elements = view.loadUi(self._DEVICE_TAB_UI)
         self._treeWidget = elements["treeWidget"]
         self.device = device
@@ -211,6 +237,7 @@ class DeviceTab(QtCore.QObject):
         item.setText(1, accessible.name)
         item.setText(2, accessible.role)
         item.setText(3, str(accessible.count))
+        self.index.add(accessible)
         if accessible.count:
             item.setChildIndicatorPolicy(HighlightableItem.ShowIndicator)
         else:
@@ -233,6 +260,34 @@ class DeviceTab(QtCore.QObject):
             self._view.reqIds.add(id)
             self._reqMap[id] = (handler, args)
 
+    def _requestAccessible(self, path, depth, handler, *args, **options):
+        '''
+        Requests an accessible of the given path and designates a handler
+        for the response. Off-line devices are read directly and the handler
+        is called at once, None is returned then instead of a request ID.
+        '''
+        if self._offline:
+            handler(self._offlineResponse(path, depth), *args)
+            return None
+        id = self.device.requestDevice("requestAccessible", path, depth,
+                                       **options)
+        self._registerRequest(id, handler, *args)
+        return id
+
+    def _offlineResponse(self, path, depth):
+        '''
+        Returns a response with an accessible of the given path read
+        directly from the off-line device.
+        '''
+        try:
+            acc = self.device.getAccessible(path, depth)
+        except Exception, err:
+            log.exception(err)
+            acc = None
+        if acc is None:
+            return DumpResponse(None, False, accessible.Accessible(path))
+        return DumpResponse(None, True, acc)
+
     def _runProgress(self, id, message, **kwargs):
         '''
         Runs a process dialog with the specified parameters.
@@ -313,6 +368,7 @@ class DeviceTab(QtCore.QObject):
             item = self._accessibleItem(accessible, parent)
         if not response.status:
             self._disableAccessibleItem(item)
+            self.index.remove(path)
             return False
         else:
             item.setDisabled(False)
@@ -323,12 +379,12 @@ class DeviceTab(QtCore.QObject):
             self._view.display(accessible)
         if expanded and item.isExpanded():
             for idx in xrange(accessible.count, item.childCount()):
+                self.index.remove(path.child(idx))
                 item.takeChild(idx)
             for idx in xrange(accessible.count):
                 childPath = path.child(idx)
-                id = self.device.requestDevice("requestAccessible",
-                                               childPath, 0)
-                self._registerRequest(id, self._responseRefresh, True)
+                id = self._requestAccessible(childPath, 0,
+                                             self._responseRefresh, True)
                 self._runProgress(id, "Refreshing path %s" % childPath,
                                   timeout=self._TIMEOUT_REFRESH)
         elif accessible.count and not item.childCount():
@@ -345,9 +401,7 @@ class DeviceTab(QtCore.QObject):
         if not response.status:
             return False
         for idx in xrange(accessible.count):
-            id = self.device.requestDevice("requestAccessible",
-                                           path.child(idx), 0)
-            self._registerRequest(id, self._responseAdd)
+            self._requestAccessible(path.child(idx), 0, self._responseAdd)
         for i in xrange(self._COLUMN_COUNT):
             self._treeWidget.resizeColumnToContents(i)
         return True
@@ -370,9 +424,7 @@ class DeviceTab(QtCore.QObject):
         item.setDisabled(False)
         # Request for children
         for idx in xrange(accessible.count):
-            id = self.device.requestDevice("requestAccessible",
-                                           path.child(idx), 0)
-            self._registerRequest(id, self._responseAdd)
+            self._requestAccessible(path.child(idx), 0, self._responseAdd)
         for i in xrange(self._COLUMN_COUNT):
             self._treeWidget.resizeColumnToContents(i)
         return True
@@ -397,6 +449,7 @@ class DeviceTab(QtCore.QObject):
             item.setDisabled(False)
         else:
             self._treeWidget.clear()
+            self.index.clear()
         self._manualExpand = True
         if item:
             item.setExpanded(True)
@@ -422,105 +475,531 @@ class DeviceTab(QtCore.QObject):
         log.debug("Executing action on accessible tree item.")
         return response.status
 
-    def _responseFind(self, response=None):
+    def _responseFind(self, response, search, seq, parent):
         '''
         Handles responses to requests sent by the search.
         '''
-        def fillRemaining(response):
-            item = self._accessibleItem(response.accessible, self._parentItem)
-            for i in xrange(self._COLUMN_COUNT):
-                self._treeWidget.resizeColumnToContents(i)
-            self._remainingItems[str(response.accessible.path)] = item
-
+        if search != self._searchId:
+            return
+        self._searchPending.discard(seq)
         if self._stopSearching:
-            self._manualExpand = False
-            self._manualSelect = False
-            self._treeWidget.setCurrentItem(self._lastDisplayedItem)
-            self.searchingStopped.emit()
+            self._finishSearching(self.searchingStopped)
             return
-
-        # handle the response
-        if response is not None:
-            acc = response.accessible
-            if acc:
-                sort = False
-                if str(acc.path) in self._remainingItems:
-                    self._parentItem.removeChild(
-                        self._remainingItems.pop(str(acc.path)))
-                    sort = True
-                item = self._accessibleItem(acc, self._parentItem)
-                if sort:
-                    children = self._parentItem.takeChildren()
-                    children.sort(lambda a, b: cmp(int(a.text(0)),
-                                                   int(b.text(0))))
-                    for index, child in enumerate(children):
-                        self._parentItem.insertChild(index, child)
+        acc = response.accessible if response.status else None
+        self._searchReady[seq] = (parent, acc)
+        if self._searchAll:
+            self._collectSearching()
+            return
+        if self._searchPaused:
+            # Display remaining siblings of the found item
+            if acc is not None and parent is self._parentAcc:
+                self._searchItem(acc)
                 for i in xrange(self._COLUMN_COUNT):
                     self._treeWidget.resizeColumnToContents(i)
-                if acc.count:
-                    self._parentAccs.append(acc)
+            return
+        self._continueSearching()
+
+    def _requestSearchItem(self):
+        '''
+        Sends a request for the next accessible of the search traversal.
+        '''
+        parent, index = self._fetchAcc, self._fetchIndex
+        seq = self._fetchSeq
+        self._fetchIndex += 1
+        self._fetchSeq += 1
+        if self._offline:
+            # accessibles of off-line devices are ready at once
+            response = self._offlineResponse(parent.path.child(index), 0)
+            self._searchReady[seq] = (parent, response.accessible
+                                              if response.status else None)
+            return
+        id = self.device.requestDevice("requestAccessible",
+                                       parent.path.child(index), 0,
+                                       **self._options)
+        if id is None:
+            self._searchReady[seq] = (parent, None)
+            return
+        self._searchPending.add(seq)
+        self._registerRequest(id, self._responseFind, self._searchId, seq,
+                              parent)
+
+    def _fetchSearching(self):
+        '''
+        Sends requests for accessibles in the breadth-first order keeping
+        at most the configured number of requests outstanding or received
+        but not processed yet.
+        '''
+        window = max(1, self._searchWindow.getInt())
+        while len(self._searchPending) + len(self._searchReady) < window:
+            if (self._fetchAcc is None
+                or self._fetchIndex >= self._fetchAcc.count):
+                if not self._searchParents:
+                    self._fetchAcc = None
+                    return
+                self._fetchAcc = self._searchParents.popleft()
+                self._fetchIndex = 0
+                continue
+            self._requestSearchItem()
+
+    def _changeSearchParent(self, parent):
+        '''
+        Makes the given accessible the current parent of the search.
+        '''
+        item = self._pathItem(parent.path)
+        if not item:
+            log.warning("Invalid accessible tree path: %s" % parent.path)
+            return False
+        self._parentAcc = parent
+        self._parentItem = item
+        self._parentItem.takeChildren()
+        self._parentItem.setExpanded(True)
+        self._searchItems = {}
+        self._searchIndices = []
+        return True
+
+    def _searchItem(self, acc):
+        '''
+        Returns an item of the given child accessible of the current search
+        parent. A new item is inserted at the position of the accessible
+        index among already displayed siblings.
+        '''
+        item = self._searchItems.get(acc.index)
+        if item is not None:
+            return item
+        item = self._accessibleItem(acc, self._parentItem)
+        pos = bisect.bisect(self._searchIndices, acc.index)
+        if pos < len(self._searchIndices):
+            self._parentItem.takeChild(self._parentItem.childCount() - 1)
+            self._parentItem.insertChild(pos, item)
+        self._searchIndices.insert(pos, acc.index)
+        self._searchItems[acc.index] = item
+        return item
 
+    def _continueSearching(self):
+        '''
+        Processes received search responses in the breadth-first order until
+        a matching item is found, and sends requests for next accessibles.
+        '''
+        item = None
+        batch = max(1, self._searchBatch.getInt())
+        processed = 0
+        while True:
+            while self._searchSeq in self._searchReady:
+                if self._offline and processed >= batch:
+                    self._yieldSearching(self._continueSearching)
+                    return
+                processed += 1
+                parent, acc = self._searchReady.pop(self._searchSeq)
+                self._searchSeq += 1
+                if parent is not self._parentAcc:
+                    if not self._changeSearchParent(parent):
+                        continue
+                if acc is None:
+                    continue
+                item = self._searchItem(acc)
+                if self._deep and acc.count:
+                    self._searchParents.append(acc)
                 # check if an item matches the criteria
-                itemData = {}
-                itemData['name'] = acc.name
-                itemData['role'] = acc.role
-                itemData['states'] = acc.states
-                itemData['text'] = acc.text
-                if self._check(itemData):
-                    self._lastDisplayedItem = item
-                    self._manualExpand = False
-                    self._manualSelect = False
-                    self._treeWidget.setCurrentItem(item)
-                    # fill remaining child-items
-                    for i in xrange(acc.index + 1, self._parentAcc.count):
-                        childPath = self._parentAcc.path.child(i)
-                        if str(childPath) in self._remainingItems:
-                            continue
-                        id = self.device.requestDevice("requestAccessible",
-                                                       childPath, 0)
-                        self._registerRequest(id, fillRemaining)
-                    self.itemFound.emit()
+                if self._check(acc):
+                    self._foundSearching(item)
+                    return
+            self._fetchSearching()
+            # requests that could not be sent are ready immediately
+            if self._searchSeq not in self._searchReady:
+                break
+        if item is not None:
+            self._view.clear()
+            self._treeWidget.setCurrentItem(item)
+            for i in xrange(self._COLUMN_COUNT):
+                self._treeWidget.resizeColumnToContents(i)
+        if not self._searchPending:
+            # finish the search
+            self._finishSearching(self.itemNotFound)
+
+    def _collectSearching(self):
+        '''
+        Processes received search responses in the breadth-first order
+        reporting every accessible that matches any of the criteria, and
+        sends requests for next accessibles.
+        '''
+        batch = max(1, self._searchBatch.getInt())
+        processed = 0
+        while True:
+            while self._searchSeq in self._searchReady:
+                if self._offline and processed >= batch:
+                    self._yieldSearching(self._collectSearching)
                     return
-                self._view.clear()
-                self._treeWidget.setCurrentItem(item)
-
-        if ((self._nextIndex > 0 and self._nextIndex >= self._parentAcc.count)
-           or (self._nextIndex == 0 and self._parentAcc.count == 0)):
-            if not self._deep or not self._parentAccs:
-                # finish the search
-                self._manualExpand = False
-                self._manualSelect = False
-                self._treeWidget.setCurrentItem(self._lastDisplayedItem)
-                self.itemNotFound.emit()
+                processed += 1
+                parent, acc = self._searchReady.pop(self._searchSeq)
+                self._searchSeq += 1
+                if acc is None:
+                    continue
+                self.index.add(acc)
+                if self._deep and acc.count:
+                    self._searchParents.append(acc)
+                for name, check in self._checks:
+                    if check(acc):
+                        self.matchFound.emit(name, acc)
+            self._fetchSearching()
+            # requests that could not be sent are ready immediately
+            if self._searchSeq not in self._searchReady:
+                break
+        if not self._searchPending:
+            self._finishSearching(self.searchingFinished)
+
+    def _yieldSearching(self, method):
+        '''
+        Lets pending events be processed and then continues the search of
+        an off-line device with the given method, unless the search was
+        stopped or finished in the meantime.
+        '''
+        search = self._searchId
+        def resume():
+            if search != self._searchId:
+                return
+            if self._stopSearching:
+                self._finishSearching(self.searchingStopped)
                 return
+            method()
+        QtCore.QTimer.singleShot(0, resume)
 
-            # change the parent item
-            self._parentAcc = self._parentAccs.pop(0)
-            self._nextIndex = 0
-            self._parentItem = self._pathItem(self._parentAcc.path)
-            self._parentItem.takeChildren()
-            self._parentItem.setExpanded(True)
-            self._remainingItems = {}
+    def _foundSearching(self, item):
+        '''
+        Selects the given matching item, displays its remaining siblings
+        and pauses the search.
+        '''
+        self._searchPaused = True
+        self._lastDisplayedItem = item
+        self._manualExpand = False
+        self._manualSelect = False
+        self._treeWidget.setCurrentItem(item)
+        # fill remaining child-items
+        if self._fetchAcc is self._parentAcc:
+            while self._fetchIndex < self._fetchAcc.count:
+                self._requestSearchItem()
+        for parent, acc in self._searchReady.itervalues():
+            if acc is not None and parent is self._parentAcc:
+                self._searchItem(acc)
+        for i in xrange(self._COLUMN_COUNT):
+            self._treeWidget.resizeColumnToContents(i)
+        self.itemFound.emit()
 
-        # send request for next accessible
-        path = self._parentAcc.path.child(self._nextIndex)
-        self._nextIndex += 1
-        id = self.device.requestDevice("requestAccessible",
-                                       path, 0, **self._options)
-        self._registerRequest(id, self._responseFind)
+    def _finishSearching(self, signal):
+        '''
+        Finishes the search and emits the given signal. Responses to requests
+        that are still pending are ignored.
+        '''
+        self._searchId += 1
+        self._searchPaused = True
+        self._manualExpand = False
+        self._manualSelect = False
+        if self._lastDisplayedItem is not self._treeWidget:
+            self._treeWidget.setCurrentItem(self._lastDisplayedItem)
+        signal.emit()
 
-    def _responseSave(self, response, filePath):
+    def _responseVerify(self, response, search):
         '''
-        Expands an accessible tree item from the response recursively.
+        Handles responses to requests verifying accessibles found in the index.
+        '''
+        if search != self._searchId:
+            return
+        if self._stopSearching:
+            self._finishSearching(self.searchingStopped)
+            return
+        acc = response.accessible
+        if not response.status:
+            self.index.remove(acc.path)
+        else:
+            self.index.add(acc)
+            if self._check(acc):
+                item = self._revealPath(acc.path)
+                if item is not None:
+                    self._setAccessibleItem(acc, item)
+                    self._foundIndexed(item)
+                    return
+        self._nextIndexed()
+
+    def _verifyUnknown(self, checks, paths):
+        '''
+        Requests accessibles of the given paths, found in the index without
+        states, from the device and reports those matching criteria of
+        the given checks that include a state.
+        '''
+        checks = [(name, check) for name, check in checks if check.state]
+        paths = sorted(set(path.tuple for path in paths))
+        self._verifyPending = set()
+        if paths and self._offline:
+            log.warning("%d indexed items without states are not searched"
+                        % len(paths))
+        elif paths:
+            options = {
+                "text":  any(check.text for name, check in checks),
+                "states":  True,
+            }
+            for path in paths:
+                id = self.device.requestDevice("requestAccessible",
+                                               accessible.Path(*path), 0,
+                                               **options)
+                if id is not None:
+                    self._verifyPending.add(id)
+                    self._registerRequest(id, self._responseUnknown, checks,
+                                          self._searchId)
+        if not self._verifyPending:
+            self._finishSearching(self.searchingFinished)
+
+    def _responseUnknown(self, response, checks, search):
+        '''
+        Handles responses to requests of accessibles found in the index
+        without states.
+        '''
+        if search != self._searchId:
+            return
+        self._verifyPending.discard(response.id)
+        if self._stopSearching:
+            self._finishSearching(self.searchingStopped)
+            return
+        acc = response.accessible
+        if not response.status:
+            self.index.remove(acc.path)
+        else:
+            self.index.add(acc)
+            for name, check in checks:
+                if check(acc):
+                    self.matchFound.emit(name, acc)
+        if not self._verifyPending:
+            self._finishSearching(self.searchingFinished)
+
+    def _nextIndexed(self):
+        '''
+        Selects the next accessible found in the index or sends a request
+        verifying it.
+        '''
+        while self._indexResults:
+            path = self._indexResults.popleft()
+            if self._verify or path.tuple in self._indexUnknown:
+                id = self.device.requestDevice("requestAccessible", path, 0,
+                                               **self._options)
+                if id is not None:
+                    self._registerRequest(id, self._responseVerify,
+                                          self._searchId)
+                    return
+                continue
+            item = self._revealPath(path)
+            if item is not None:
+                self._foundIndexed(item)
+                return
+        self._finishSearching(self.itemNotFound)
+
+    def _foundIndexed(self, item):
+        '''
+        Selects the given item found in the index.
+        '''
+        self._lastDisplayedItem = item
+        self._manualExpand = False
+        self._manualSelect = False
+        self._treeWidget.setCurrentItem(item)
+        self.itemFound.emit()
+
+    def _fillFromIndex(self, item, path):
         '''
+        Fills the given item of the given path with child items created
+        from the index.
+        '''
+        entry = self.index.get(path)
+        if entry is None:
+            return
+        item.takeChildren()
+        for idx in xrange(entry.count):
+            child = self.index.get(path.child(idx))
+            if child is not None:
+                self._accessibleItem(child, item)
+            else:
+                child = HighlightableItem(item)
+                child.setText(0, str(idx))
+                child.setDisabled(True)
+
+    def _revealPath(self, path):
+        '''
+        Returns an item of the given path. Missing items are created from
+        the index, or read directly from off-line devices, and all their
+        ancestors are expanded.
+        '''
+        self._manualExpand = True
+        try:
+            item = self._treeWidget.topLevelItem(path.tuple[0])
+            for depth, idx in enumerate(path.tuple[1:]):
+                if item is None:
+                    break
+                parent = accessible.Path(*path.tuple[:depth+1])
+                if self._offline and not item.childCount():
+                    self._responseExpand(self._offlineResponse(parent, 0))
+                entry = self.index.get(parent)
+                if entry is not None and item.childCount() != entry.count:
+                    self._fillFromIndex(item, entry.path)
+                item.setExpanded(True)
+                item = item.child(idx)
+        finally:
+            self._manualExpand = False
+        for i in xrange(self._COLUMN_COUNT):
+            self._treeWidget.resizeColumnToContents(i)
+        return item
+
+    def _responseDump(self, response, dump, node, attempt):
+        '''
+        Handles responses to requests for chunks of a dump.
+        '''
+        if dump.aborted or attempt != node.attempt:
+            return
+        node.timer.stop()
+        node.timer = None
+        if not response.status:
+            log.warning("Request failed for dump chunk: %s" % node.path)
+            self._retryDump(dump, node, "Request failed")
+            return
+        node.retries = 0
+        try:
+            dump.received(node, response.accessible)
+        except:
+            self._abortDump(dump, "Error occurred while saving dump to file "
+                                  "'%s'" % dump.writer.path)
+            return
+        if dump.isDone():
+            self._finishDump(dump)
+            return
+        self._requestDump(dump)
+
+    def _timeoutDump(self, dump, node, attempt):
+        '''
+        Requests the chunk of a dump of the given node again after its
+        timeout is reached.
+        '''
+        if dump.aborted or attempt != node.attempt:
+            return
+        node.timer = None
+        log.warning("Timeout reached for dump chunk: %s" % node.path)
+        self._retryDump(dump, node, "Timeout reached")
+
+    def _retryDump(self, dump, node, reason):
+        '''
+        Requests the chunk of a dump of the given node again after it timed
+        out or its request failed for the given reason. Once retries run
+        out, the user is asked whether to resume the dump.
+        '''
+        if dump.stalled is not None:
+            # the user is being asked already
+            dump.stalled.append(node)
+            return
+        stalled = [node]
+        if node.retries >= self._dumpRetries.getInt():
+            dump.stalled = stalled
+            try:
+                resume = dialogs.runQuestion("%s while dumping path: %s\nDo "
+                                             "you want to resume dumping?"
+                                             % (reason, node.path))
+            finally:
+                dump.stalled = None
+            if dump.aborted:
+                return
+            if not resume:
+                self._abortDump(dump, "%s while dumping path: %s"
+                                      % (reason, node.path))
+                return
+            for node in stalled:
+                node.retries = 0
+        for node in stalled:
+            # chunks received while the question was open are not retried
+            if node in dump.pending:
+                dump.retry(node)
+        self._requestDump(dump)
+
+    def _requestDump(self, dump):
+        '''
+        Sends requests for chunks of the given dump keeping at most
+        the configured number of chunks requested or not written yet.
+        '''
+        window = max(1, self._dumpWindow.getInt())
+        while len(dump.pending) + dump.buffered < window:
+            node = dump.nextRequest()
+            if node is None:
+                break
+            if not self._requestDumpNode(dump, node):
+                self._abortDump(dump, "Error occurred while dumping path: %s"
+                                      % node.path)
+                return
+        dialogs.updateProgress(dump.progress,
+                               "Dumping path: %s\nFetched %d of about %d "
+                               "accessibles" % (dump.path, dump.fetched,
+                                                dump.estimate()),
+                               dump.fetched, dump.estimate())
+
+    def _requestDumpNode(self, dump, node):
+        '''
+        Sends a request for the chunk of a dump of the given node.
+        '''
+        # direct children of nodes above the split level tell the writer
+        # where elements of children are placed
+        depth = -1 if node.subtree else 1
+        id = self.device.requestDevice("requestAccessible", node.path, depth,
+                                       all=True)
+        if id is None:
+            return False
+        attempt = node.attempt
+        self._registerRequest(id, self._responseDump, dump, node, attempt)
+        node.timer = QtCore.QTimer(self)
+        node.timer.setSingleShot(True)
+        node.timer.timeout.connect(lambda: self._timeoutDump(dump, node,
+                                                             attempt))
+        node.timer.start(self._dumpTimeout.getInt())
+        return True
+
+    def _finishDump(self, dump):
+        '''
+        Closes the file of the completed dump.
+        '''
+        dialogs.closeProgress(dump.progress)
         try:
-            log.debug("Saving response to file '%s'" % filePath)
-            element = response.accessible.marshal()
-            utils.saveXml(element, filePath)
-            self._view.updateRecentFiles(filePath)
+            dump.writer.close()
         except:
             dialogs.runError("Error occurred while saving dump to file '%s'"
-                             % filePath)
+                             % dump.writer.path)
+            return
+        self._view.updateRecentFiles(dump.writer.path)
+
+    def _abortDump(self, dump, message=None):
+        '''
+        Aborts the dump and removes its incomplete file.
+        '''
+        if dump.aborted:
+            return
+        dump.aborted = True
+        for node in dump.pending:
+            if node.timer is not None:
+                node.timer.stop()
+                node.timer = None
+        dump.writer.abort()
+        dialogs.closeProgress(dump.progress)
+        log.warning("Dumping path %s was aborted" % dump.path)
+        if message:
+            dialogs.runError(message)
+
+    def _dump(self, path, filePath):
+        '''
+        Starts dumping the accessible of the given path with all its
+        descendants to the given file. The accessible tree is requested
+        in chunks and written incrementally.
+        '''
+        log.debug("Dumping accessible %s to file '%s'" % (path, filePath))
+        try:
+            writer = DumpWriter(filePath)
+        except EnvironmentError, err:
+            dialogs.runError("Error occurred while saving dump to file '%s':"
+                             "\n%s" % (filePath, err))
+            return
+        dump = ChunkedDump(writer, path, self._dumpSplit.getInt())
+        cancel = lambda: self._abortDump(dump)
+        dump.progress = dialogs.runProgress("Dumping path: %s" % path,
+                                            cancel=cancel)
+        self._requestDump(dump)
 
 # Slots:
     #@QtCore.Slot()
@@ -534,10 +1013,9 @@ class DeviceTab(QtCore.QObject):
         if not path:
             return
         log.debug("Selecting device accessible item: %s" % self.device)
-        id = self.device.requestDevice("requestAccessible",
-                                       path, 0, all=True)
-        self._registerRequest(id, self._responseRefresh)
-        setWait(self._view.view)
+        id = self._requestAccessible(path, 0, self._responseRefresh, all=True)
+        if id is not None:
+            setWait(self._view.view)
 
     #@QtCore.Slot(HighlightableItem)
     def expandAccessible(self, item):
@@ -549,9 +1027,9 @@ class DeviceTab(QtCore.QObject):
         log.debug("Expanding device accessible item: %s" % self.device)
         path = self._itemPath(item)
         self._disableAccessibleItem(item)
-        id = self.device.requestDevice("requestAccessible", path, 0)
-        self._registerRequest(id, self._responseExpand)
-        setWait(self._view.view)
+        id = self._requestAccessible(path, 0, self._responseExpand)
+        if id is not None:
+            setWait(self._view.view)
 
     #@QtCore.Slot(HighlightableItem)
     def collapseAccesible(self, item):
@@ -586,8 +1064,8 @@ class DeviceTab(QtCore.QObject):
         if not (self._active and path):
             return
         log.debug("Refreshing device accessible item: %s" % self.device)
-        id = self.device.requestDevice("requestAccessible", path, 0, all=True)
-        self._registerRequest(id, self._responseRefresh, True)
+        id = self._requestAccessible(path, 0, self._responseRefresh, True,
+                                     all=True)
         self._runProgress(id, "Refreshing path: %s" % path,
                           timeout=self._TIMEOUT_REFRESH)
 
@@ -601,10 +1079,10 @@ class DeviceTab(QtCore.QObject):
         log.debug("Refreshing device accessible tree: %s" % self.device)
         self._manualSelect = True
         self._treeWidget.clear()
+        self.index.clear()
         self._view.clear()
         path = accessible.Path()
-        id = self.device.requestDevice("requestAccessible", path, 0)
-        self._registerRequest(id, self._responseRefreshAll)
+        id = self._requestAccessible(path, 0, self._responseRefreshAll)
         self._runProgress(id, "Refreshing path: %s" % path,
                           timeout=self._TIMEOUT_REFRESH)
         self._manualSelect = False
@@ -622,8 +1100,7 @@ class DeviceTab(QtCore.QObject):
         log.debug("Expanding device accessible item recursively: %s"
                    % self.device)
         self._disableAccessibleItem(self._treeWidget.selectedItems()[0])
-        id = self.device.requestDevice("requestAccessible", path, -1)
-        self._registerRequest(id, self._responseExpandAll)
+        id = self._requestAccessible(path, -1, self._responseExpandAll)
         self._runProgress(id, "Expanding path: %s" % path,
                           timeout=self._TIMEOUT_EXPAND)
 
@@ -637,8 +1114,7 @@ class DeviceTab(QtCore.QObject):
         log.debug("Expanding all accessible items recursively: %s"
                    % self.device)
         path = accessible.Path()
-        id = self.device.requestDevice("requestAccessible", path, -1)
-        self._registerRequest(id, self._responseExpandAll)
+        id = self._requestAccessible(path, -1, self._responseExpandAll)
         self._runProgress(id, "Expanding path: %s" % path,
                           timeout=self._TIMEOUT_EXPAND_ALL)
 
@@ -725,7 +1201,7 @@ class DeviceTab(QtCore.QObject):
     #@QtCore.Slot()
     def save(self):
         '''
-        Sends a recursive request for accessible that will be dumped to file.
+        Dumps the selected accessible with all its descendants to file.
         '''
         if not self._active:
             return
@@ -735,33 +1211,22 @@ class DeviceTab(QtCore.QObject):
         path = self._itemPath(items[0])
         if not path:
             return
-        filePath = dialogs.runSaveFile("XML files (*.xml);;All files (*)",
-                                       items[0].text(1))
+        filePath = dialogs.runSaveFile(self._DUMP_FILTERS, items[0].text(1))
         if filePath is None:
             return
-        log.debug("Dumping accessible %s to file '%s'" % (path, filePath))
-        id = self.device.requestDevice("requestAccessible", path, -1, all=True)
-        self._registerRequest(id, self._responseSave, filePath)
-        self._runProgress(id, "Dumping path: %s" % path,
-                          timeout=self._TIMEOUT_DUMP)
+        self._dump(path, filePath)
 
     #@QtCore.Slot()
     def saveAll(self):
         '''
-        Sends a recursive request for root accessible that will be dumped
-        to file.
+        Dumps the root accessible with all its descendants to file.
         '''
         if not self._active:
             return
-        filePath = dialogs.runSaveFile("XML files (*.xml);;All files (*)")
+        filePath = dialogs.runSaveFile(self._DUMP_FILTERS)
         if filePath is None:
             return
-        path = accessible.Path()
-        log.debug("Dumping accessible %s to file '%s'" % (path, filePath))
-        id = self.device.requestDevice("requestAccessible", path, -1, all=True)
-        self._registerRequest(id, self._responseSave, filePath)
-        self._runProgress(id, "Dumping path: %s" % path,
-                          timeout=self._TIMEOUT_DUMP_ALL)
+        self._dump(accessible.Path(), filePath)
 
 # Public methods:
     def isActive(self):
@@ -824,19 +1289,29 @@ class DeviceTab(QtCore.QObject):
             "text":  len(check.text) > 0,
             "states":  len(check.state) > 0,
         }
+        self._searchId += 1
+        self._indexSearch = False
+        self._searchAll = False
         self._stopSearching = False
-        self._nextIndex = 0
-        self._parentAccs = []
+        self._searchPaused = False
+        self._searchParents = collections.deque()
+        self._searchPending = set()
+        self._searchReady = {}
+        self._searchSeq = 0
+        self._fetchSeq = 0
         self._parentAcc = self.device.getAccessible(
             self.selectedItemPath(), 0)
         self._parentItem = self._pathItem(self._parentAcc.path)
         self._lastDisplayedItem = self._parentItem
-        self._remainingItems = {}
+        self._fetchAcc = self._parentAcc
+        self._fetchIndex = 0
+        self._searchItems = {}
+        self._searchIndices = []
 
         self._parentItem.takeChildren()
         if self._parentAcc.count:
             self._parentItem.setExpanded(True)
-        self._responseFind()
+        self._continueSearching()
 
     def findNext(self):
         '''
@@ -847,9 +1322,110 @@ class DeviceTab(QtCore.QObject):
             self.searchingStopped.emit()
             return
         log.info("Searching for next match")
+        if self._indexSearch:
+            self._nextIndexed()
+            return
         self._manualExpand = True
         self._manualSelect = True
-        self._responseFind()
+        self._searchPaused = False
+        self._continueSearching()
+
+    def findIndexed(self, check, deep, verify=False):
+        '''
+        Initiates the searching process answered from the index of loaded
+        accessibles. If verify is True, found accessibles are requested from
+        the device again and selected only if they still match.
+        '''
+        if not self._active:
+            dialogs.runWarning("Device is disconnected")
+            self.searchingStopped.emit()
+            return
+        log.info("Searching %d indexed items for name: \"%s\", role: \"%s\", "
+                 "state: \"%s\", text: \"%s\", with deep option set to %s)"
+                 % (len(self.index), check.name, check.role, check.state,
+                    check.text, deep))
+        path = self.selectedItemPath()
+        self._searchId += 1
+        self._indexSearch = True
+        self._searchAll = False
+        self._stopSearching = False
+        self._check = check
+        self._verify = verify and not self._offline
+        self._options = {
+            "text":  len(check.text) > 0,
+            "states":  len(check.state) > 0,
+        }
+        self._lastDisplayedItem = self._pathItem(path)
+        unknown = []
+        results = self.index.search(check, path, deep, unknown)
+        self._indexUnknown = set()
+        if unknown and self._offline:
+            log.warning("%d indexed items without states are not searched"
+                        % len(unknown))
+        elif unknown:
+            # states of these accessibles are checked on the device
+            self._indexUnknown = set(path.tuple for path in unknown)
+            results = sorted(results + unknown, key=lambda path: path.tuple)
+        self._indexResults = collections.deque(results)
+        self._nextIndexed()
+
+    def findAll(self, checks, deep, indexed=False, path=None):
+        '''
+        Initiates the searching process of all accessibles matching any of
+        the given named criteria provided as a list of (name, check) pairs.
+        All the criteria are resolved in a single traversal and each match
+        is reported by the matchFound signal as soon as it is received.
+        If indexed is True, the index of loaded accessibles is searched
+        instead of the device. The search starts from the given path or
+        from the selected item if the path is None.
+        '''
+        if not self._active:
+            dialogs.runWarning("Device is disconnected")
+            self.searchingStopped.emit()
+            return
+        log.info("Searching all matches of %d criteria, with deep option set"
+                 " to %s" % (len(checks), deep))
+        if path is None:
+            path = self.selectedItemPath()
+        self._searchId += 1
+        self._indexSearch = False
+        self._searchAll = True
+        self._stopSearching = False
+        self._searchPaused = False
+        self._deep = deep
+        self._checks = checks
+        self._lastDisplayedItem = self._pathItem(path)
+        if indexed:
+            unknown = []
+            for name, check in checks:
+                for found in self.index.search(check, path, deep, unknown):
+                    self.matchFound.emit(name, self.index.get(found))
+            self._verifyUnknown(checks, unknown)
+            return
+        self._options = {
+            "text":  any(check.text for name, check in checks),
+            "states":  any(check.state for name, check in checks),
+        }
+        self._searchParents = collections.deque()
+        self._searchPending = set()
+        self._searchReady = {}
+        self._searchSeq = 0
+        self._fetchSeq = 0
+        self._fetchAcc = self.device.getAccessible(path, 0)
+        self._fetchIndex = 0
+        self._collectSearching()
+
+    def showPath(self, path):
+        '''
+        Selects an item of the given path. Items of accessibles that are not
+        displayed yet are created from the index of loaded accessibles.
+        Returns True on success or False otherwise.
+        '''
+        item = self._revealPath(path)
+        if item is None or item.isDisabled():
+            return False
+        self._treeWidget.setCurrentItem(item)
+        return True
 
     def stopSearching(self):
         '''
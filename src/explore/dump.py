@@ -0,0 +1,508 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import re
+import copy
+import gzip
+import heapq
+import tempfile
+from xml.etree import cElementTree as etree
+
+from tadek.core import log
+
+COMPRESSED_EXTENSION = ".gz"
+
+# A tag of the element marking the position of child nodes in a serialized
+# node element
+_PLACEHOLDER = "tadek-children"
+_PLACEHOLDER_RE = re.compile(r"<%s\s*/>" % _PLACEHOLDER)
+# Number of bytes copied at once while decompressing a dump
+_CHUNK_SIZE = 65536
+
+
+class DumpCancelled(Exception):
+    '''
+    Raised when reading of a dump is cancelled.
+    '''
+
+
+def isCompressed(path):
+    '''
+    Returns True if the given path is a path to a compressed dump.
+    '''
+    return path.lower().endswith(COMPRESSED_EXTENSION)
+
+
+def openDump(path, mode="rb"):
+    '''
+    Opens a dump file of the given path, compressed dumps are opened
+    transparently.
+    '''
+    if isCompressed(path):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def dumpPosition(f):
+    '''
+    Returns a number of bytes read from the file of the given opened dump.
+    '''
+    return getattr(f, "fileobj", f).tell()
+
+
+def decompressDump(path, progress=None, cancelled=None):
+    '''
+    Decompresses a dump file of the given path to a temporary file and
+    returns a path to it. The temporary file should be removed by a caller.
+
+    The optional progress function is called with numbers of read and all
+    bytes of the dump file. DumpCancelled is raised as soon as the optional
+    cancelled event is set.
+    '''
+    total = os.path.getsize(path)
+    fd, tempPath = tempfile.mkstemp(prefix="tadek-dump-", suffix=".xml")
+    try:
+        dst = os.fdopen(fd, "wb")
+        try:
+            src = openDump(path)
+            try:
+                while True:
+                    if cancelled is not None and cancelled.is_set():
+                        raise DumpCancelled()
+                    data = src.read(_CHUNK_SIZE)
+                    if not data:
+                        break
+                    dst.write(data)
+                    if progress is not None:
+                        progress(dumpPosition(src), total)
+            finally:
+                src.close()
+        finally:
+            dst.close()
+    except:
+        os.remove(tempPath)
+        raise
+    log.debug("Dump '%s' decompressed to '%s'" % (path, tempPath))
+    return tempPath
+
+
+def iterNodes(f, meta=None):
+    '''
+    Parses the given opened dump file incrementally and yields triples of
+    a path tuple, a number of children and an XML element without children
+    of every node, children before their parents. An element is valid only
+    until the next node is yielded.
+
+    The optional meta dictionary is filled with the tag of node elements
+    and tags of elements leading from a node element to elements of its
+    children.
+    '''
+    if meta is None:
+        meta = {}
+    tag = None
+    # all open elements and open nodes as lists of a path tuple,
+    # a number of children and a position in open elements
+    elements = []
+    nodes = []
+    for event, element in etree.iterparse(f, ("start", "end")):
+        if event == "start":
+            elements.append(element)
+            if tag is None:
+                tag = meta["tag"] = element.tag
+            elif element.tag != tag:
+                continue
+            if nodes:
+                parent = nodes[-1]
+                path = parent[0] + (parent[1],)
+                parent[1] += 1
+                if "container" not in meta:
+                    meta["container"] = [e.tag for e
+                                         in elements[parent[2]+1:-1]]
+            else:
+                path = ()
+            nodes.append([path, 0, len(elements) - 1])
+            continue
+        elements.pop()
+        if element.tag != tag:
+            continue
+        path, count, pos = nodes.pop()
+        # elements of children are already yielded
+        for parent in list(element.iter()):
+            for child in list(parent):
+                if child.tag == tag:
+                    parent.remove(child)
+        yield path, count, element
+        element.clear()
+
+
+def _children(acc):
+    '''
+    Returns a list of loaded children of the given accessible.
+    '''
+    if not acc.count:
+        return []
+    try:
+        return list(acc.children())
+    except ValueError:
+        return []
+
+
+def _size(acc):
+    '''
+    Returns a number of the given accessible and its loaded descendants.
+    '''
+    size = 0
+    pending = [acc]
+    while pending:
+        acc = pending.pop()
+        size += 1
+        pending.extend(_children(acc))
+    return size
+
+
+def _shallow(acc, children=()):
+    '''
+    Returns a shallow copy of the given accessible whose attributes holding
+    its loaded children hold the given children instead, or None if there
+    are no such attributes. The accessible itself is not modified.
+    '''
+    loaded = set(id(child) for child in _children(acc))
+    if not loaded:
+        return None
+    copied = copy.copy(acc)
+    attrs = getattr(copied, "__dict__", None)
+    if attrs is None:
+        return None
+    found = False
+    for name, value in attrs.items():
+        if (isinstance(value, (list, tuple)) and
+            any(id(item) in loaded for item in value)):
+            attrs[name] = type(value)(children)
+            found = True
+    return copied if found else None
+
+
+class DumpWriter(object):
+    '''
+    Writes a dump of an accessible tree to a file node by node. Loaded
+    accessibles are walked and each one is marshalled from a shallow copy
+    without its children, so neither an XML element nor a serialized string
+    of the whole tree is ever built. Dumps written to files of names ending
+    with .gz are compressed.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._file = openDump(path, "wb")
+        self._file.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+        # Tags of elements from a node element to elements of its
+        # children, None if not known yet
+        self._container = None
+        self._tails = []
+
+    def _learnContainer(self, element):
+        '''
+        Learns where elements of children are placed in a node element from
+        the given node element. Returns False if it contains no children.
+        '''
+        paths = [(element, [])]
+        while paths:
+            parent, tags = paths.pop(0)
+            for sub in parent:
+                if sub.tag == element.tag:
+                    self._container = tags
+                    return True
+                paths.append((sub, tags + [sub.tag]))
+        return False
+
+    def _nodeElement(self, element, tag=None):
+        '''
+        Returns a copy of the given node element without elements of
+        child nodes.
+        '''
+        if tag is None:
+            tag = element.tag
+        copied = etree.Element(element.tag, element.attrib)
+        copied.text = element.text
+        for sub in element:
+            if sub.tag != tag:
+                child = self._nodeElement(sub, tag)
+                child.tail = sub.tail
+                copied.append(child)
+        return copied
+
+    def _element(self, acc):
+        '''
+        Returns an XML element of the given accessible without elements
+        of its children.
+        '''
+        children = _children(acc)
+        if not children:
+            return self._nodeElement(acc.marshal())
+        if self._container is None:
+            first = _shallow(children[0]) or children[0]
+            parent = _shallow(acc, [first])
+            if parent is not None:
+                self._learnContainer(parent.marshal())
+        copied = _shallow(acc)
+        if copied is not None:
+            return self._nodeElement(copied.marshal())
+        # Children are not held in attributes of the accessible, so
+        # the whole subtree has to be marshalled and stripped
+        log.debug("Accessible %s is marshalled with its children" % acc.path)
+        element = acc.marshal()
+        if self._container is None:
+            self._learnContainer(element)
+        return self._nodeElement(element)
+
+    def startNode(self, acc):
+        '''
+        Writes the beginning of the given accessible node. Its children
+        should be written next and the node ended by endNode(). Elements
+        of children loaded into the accessible are not written.
+        '''
+        element = self._element(acc)
+        if self._container is None:
+            log.warning("Placement of child elements is unknown, children "
+                        "are written directly to node elements")
+            self._container = []
+        container = element
+        for tag in self._container:
+            sub = container.find(tag)
+            if sub is None:
+                sub = etree.SubElement(container, tag)
+            container = sub
+        etree.SubElement(container, _PLACEHOLDER)
+        head, tail = _PLACEHOLDER_RE.split(etree.tostring(element, "utf-8"), 1)
+        self._file.write(head)
+        self._tails.append(tail)
+
+    def endNode(self):
+        '''
+        Writes the end of the last started node.
+        '''
+        self._file.write(self._tails.pop())
+
+    def writeNode(self, acc):
+        '''
+        Writes the given accessible node without children.
+        '''
+        self._file.write(etree.tostring(self._element(acc), "utf-8"))
+
+    def writeTree(self, acc):
+        '''
+        Writes the given accessible with all its loaded descendants node
+        by node.
+        '''
+        pending = [acc]
+        while pending:
+            acc = pending.pop()
+            if acc is None:
+                self.endNode()
+                continue
+            children = _children(acc)
+            if not children:
+                self.writeNode(acc)
+                continue
+            self.startNode(acc)
+            pending.append(None)
+            pending.extend(reversed(children))
+
+    def close(self):
+        '''
+        Ends all started nodes and closes the file.
+        '''
+        while self._tails:
+            self.endNode()
+        self._file.close()
+        log.debug("Dump written to file '%s'" % self.path)
+
+    def abort(self):
+        '''
+        Closes and removes the incomplete file.
+        '''
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class DumpNode(object):
+    '''
+    A node of a dump acquired in chunks.
+    '''
+    def __init__(self, path, level, subtree):
+        self.path = path
+        self.level = level
+        # True if the node is requested with all its descendants
+        self.subtree = subtree
+        self.acc = None
+        self.done = False
+        self.children = None
+        # Number of the current request attempt and of consecutive retries
+        self.attempt = 0
+        self.retries = 0
+        self.timer = None
+
+
+class ChunkedDump(object):
+    '''
+    Keeps the state of a dump acquired in chunks. Nodes above the split
+    level are requested one by one and nodes at the split level together
+    with all their descendants. Known nodes are requested in the document
+    order and received chunks are written as soon as all preceding ones
+    are.
+    '''
+    def __init__(self, writer, path, split):
+        self.writer = writer
+        self.path = path
+        self.aborted = False
+        self._split = max(0, split)
+        # Nodes requested and nodes received but not written yet
+        self.pending = set()
+        self.buffered = 0
+        # Number of accessibles received
+        self.fetched = 0
+        # Nodes timed out while the user is asked whether to resume
+        # the dump, None if the user is not asked
+        self.stalled = None
+        self._chunks = 0
+        self._chunkSize = 0
+        # Numbers of nodes not received yet by the subtree flag
+        self._waiting = {True: 0, False: 0}
+        root = self._node(path, 0)
+        # Nodes to request ordered by their paths, which is the document order
+        self._requests = [(path.tuple, root)]
+        self._cursor = [[root, -1]]
+
+    def _node(self, path, level):
+        '''
+        Creates a node of the given path at the given level.
+        '''
+        node = DumpNode(path, level, level >= self._split)
+        self._waiting[node.subtree] += 1
+        return node
+
+    def _flush(self):
+        '''
+        Writes received nodes in the document order.
+        '''
+        while self._cursor:
+            entry = self._cursor[-1]
+            node = entry[0]
+            if not node.done:
+                return
+            if entry[1] < 0:
+                self.buffered -= 1
+                if node.subtree:
+                    self.writer.writeTree(node.acc)
+                elif node.children:
+                    self.writer.startNode(node.acc)
+                    entry[1] = 0
+                    continue
+                else:
+                    self.writer.writeNode(node.acc)
+                node.acc = None
+                self._cursor.pop()
+            elif entry[1] < len(node.children):
+                child = node.children[entry[1]]
+                node.children[entry[1]] = None
+                entry[1] += 1
+                self._cursor.append([child, -1])
+            else:
+                self.writer.endNode()
+                node.acc = None
+                self._cursor.pop()
+
+    def nextRequest(self):
+        '''
+        Returns the next node to request or None if there is no such node.
+        '''
+        if not self._requests:
+            return None
+        node = heapq.heappop(self._requests)[1]
+        self.pending.add(node)
+        return node
+
+    def retry(self, node):
+        '''
+        Makes the given requested node to be requested again.
+        '''
+        self.pending.discard(node)
+        node.attempt += 1
+        node.retries += 1
+        heapq.heappush(self._requests, (node.path.tuple, node))
+
+    def received(self, node, acc):
+        '''
+        Stores the accessible received for the given node and writes all
+        nodes that can be written.
+        '''
+        self.pending.discard(node)
+        self._waiting[node.subtree] -= 1
+        node.acc = acc
+        node.done = True
+        self.buffered += 1
+        if node.subtree:
+            size = _size(acc)
+            self._chunks += 1
+            self._chunkSize += size
+            self.fetched += size
+        else:
+            self.fetched += 1
+            node.children = [self._node(node.path.child(i), node.level + 1)
+                             for i in xrange(acc.count)]
+            for child in node.children:
+                heapq.heappush(self._requests, (child.path.tuple, child))
+        self._flush()
+
+    def estimate(self):
+        '''
+        Returns an estimated number of all accessibles of the dump.
+        '''
+        if self._chunks:
+            average = float(self._chunkSize) / self._chunks
+        else:
+            average = 1.0
+        return self.fetched + self._waiting[False] + int(self._waiting[True]
+                                                          * average)
+
+    def isDone(self):
+        '''
+        Returns True if all nodes of the dump are written.
+        '''
+        return not self._cursor
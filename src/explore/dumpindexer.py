@@ -0,0 +1,142 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import sqlite3
+
+from tadek.core import log
+from tadek.core import accessible
+
+from dump import openDump, iterNodes
+from index import tokens
+
+# Number of nodes inserted to a database at once
+_BATCH_SIZE = 1000
+
+_SCHEMA = '''
+    CREATE TABLE nodes (path TEXT, role TEXT, name TEXT, states TEXT,
+                        text TEXT, role_fold TEXT, name_fold TEXT,
+                        states_fold TEXT, text_fold TEXT);
+    CREATE TABLE tokens (kind TEXT, word TEXT, node INTEGER);
+'''
+
+
+def _words(acc):
+    '''
+    Returns a set of pairs of kinds and case folded words of attributes
+    of the given accessible, by which its node is looked up.
+    '''
+    words = set()
+    if acc.role:
+        words.add(("role", acc.role.upper()))
+    for state in acc.states or ():
+        words.add(("state", state.upper()))
+    for token in tokens(acc.name):
+        words.add(("name", token))
+    for token in tokens(acc.text):
+        words.add(("text", token))
+    return words
+
+
+def indexDump(source, path):
+    '''
+    Indexes attributes of all nodes of the given dump file to a new
+    database of the given path.
+    '''
+    db = sqlite3.connect(path)
+    try:
+        db.executescript(_SCHEMA)
+        nodes = []
+        words = []
+        f = openDump(source)
+        try:
+            for id, (nodePath, count, element) in enumerate(iterNodes(f)):
+                acc = accessible.Accessible.unmarshal(element)
+                values = (acc.role or '', acc.name or '',
+                          '\n'.join(acc.states or ()), acc.text or '')
+                nodes.append((id + 1, '/'.join(str(idx) for idx in nodePath))
+                             + values
+                             + tuple(value.upper() for value in values))
+                words.extend((kind, word, id + 1)
+                             for kind, word in _words(acc))
+                if len(nodes) >= _BATCH_SIZE:
+                    _insert(db, nodes, words)
+        finally:
+            f.close()
+        _insert(db, nodes, words)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _insert(db, nodes, words):
+    '''
+    Inserts the given rows of nodes and their words to the given database
+    and empties the lists.
+    '''
+    db.executemany("INSERT INTO nodes (rowid, path, role, name, states, "
+                   "text, role_fold, name_fold, states_fold, text_fold) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", nodes)
+    db.executemany("INSERT INTO tokens VALUES (?, ?, ?)", words)
+    del nodes[:]
+    del words[:]
+
+
+def main():
+    '''
+    Reads lines of UTF-8 encoded paths to a dump file and to a database
+    separated by a tab from the standard input, indexes every dump to its
+    database and writes a line of 1 on success or 0 on failure to
+    the standard output.
+    '''
+    # anything else printed goes to the standard error
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    for line in iter(sys.stdin.readline, ''):
+        source, path = line.rstrip('\n').decode("utf-8").split('\t')
+        try:
+            indexDump(source, path)
+            status = 1
+        except Exception, ex:
+            log.warning("Could not index dump '%s': %s" % (source, ex))
+            status = 0
+        out.write("%d\n" % status)
+        out.flush()
+
+
+if __name__ == "__main__":
+    main()
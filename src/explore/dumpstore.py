@@ -0,0 +1,441 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import hashlib
+import sqlite3
+import tempfile
+import itertools
+import threading
+from xml.etree import cElementTree as etree
+
+from PySide import QtCore
+
+from tadek.core import log
+from tadek.core import settings
+from tadek.core import accessible
+from tadek.connection import protocol
+
+from utils import viewName, cachePath
+from devices import DeviceObject, Queue
+from dump import (openDump, dumpPosition, isCompressed, decompressDump,
+                  iterNodes, DumpCancelled)
+
+# Version of the store format, stores of other versions are converted again
+_VERSION = "1"
+# Number of nodes inserted to a store at once during conversion
+_BATCH_SIZE = 1000
+
+_CACHE_DIR = cachePath("dumps")
+
+
+def _key(path):
+    '''
+    Returns a key of a node of the given path tuple.
+    '''
+    return '/'.join(str(idx) for idx in path)
+
+
+def pathDigest(path):
+    '''
+    Returns a hexadecimal digest of the given absolute path. Unicode paths
+    are encoded to UTF-8 first.
+    '''
+    path = os.path.abspath(path)
+    if isinstance(path, unicode):
+        path = path.encode("utf-8")
+    return hashlib.sha1(path).hexdigest()
+
+
+def storePath(source):
+    '''
+    Returns a path to the cached store of the given dump file.
+    '''
+    return os.path.join(_CACHE_DIR, pathDigest(source) + ".db")
+
+
+class DumpStore(object):
+    '''
+    An indexed on-disk store of a dump. Nodes are kept in an SQLite table
+    keyed by their paths, each as an XML element without its children,
+    so accessibles are read one by one when needed.
+    '''
+    section = settings.get(viewName(), "dump", force=True)
+    # Maximum total size in bytes of cached stores
+    _cacheSize = section.get("cache_size", default=268435456)
+    del section
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        self.source = meta["source"]
+        self._tag = meta["tag"]
+        self._container = filter(None, meta["container"].split('/'))
+
+    @classmethod
+    def open(cls, source):
+        '''
+        Opens the cached store of the given dump file. The dump is converted
+        first if there is no store or it is out of date.
+        '''
+        return cls(cls.update(source))
+
+    @classmethod
+    def update(cls, source, progress=None, cancelled=None):
+        '''
+        Converts the given dump file to its cached store if there is no store
+        or it is out of date, and returns a path to the store.
+        '''
+        path = storePath(source)
+        if cls._isValid(path, source):
+            # modification times of stores tell which are used recently
+            os.utime(path, None)
+        else:
+            cls.convert(source, path, progress, cancelled)
+            cls.clean(path)
+        return path
+
+    @classmethod
+    def clean(cls, keep=None):
+        '''
+        Removes cached stores of dump files that no longer exist or changed,
+        and then the least recently used stores until the total size of
+        the others fits the configured limit. The store of the given path
+        is kept.
+        '''
+        if not os.path.isdir(_CACHE_DIR):
+            return
+        stores = []
+        for name in os.listdir(_CACHE_DIR):
+            path = os.path.join(_CACHE_DIR, name)
+            if not name.endswith(".db") or path == keep:
+                continue
+            try:
+                db = sqlite3.connect(path)
+                try:
+                    source = dict(db.execute("SELECT key, value FROM meta"))
+                finally:
+                    db.close()
+                source = source.get("source")
+                if source is None or not os.path.exists(source):
+                    valid = False
+                else:
+                    valid = cls._isValid(path, source)
+                stat = os.stat(path)
+                if valid:
+                    stores.append((stat.st_mtime, stat.st_size, path))
+                    continue
+                log.debug("Removing stale store '%s'" % path)
+                os.remove(path)
+            except (sqlite3.Error, EnvironmentError), err:
+                log.warning("Cannot check store '%s': %s" % (path, err))
+        total = sum(size for mtime, size, path in stores)
+        if keep is not None and os.path.exists(keep):
+            total += os.path.getsize(keep)
+        limit = cls._cacheSize.getInt()
+        stores.sort()
+        for mtime, size, path in stores:
+            if total <= limit:
+                break
+            log.debug("Removing least recently used store '%s'" % path)
+            try:
+                os.remove(path)
+            except OSError, err:
+                log.warning("Cannot remove store '%s': %s" % (path, err))
+                continue
+            total -= size
+
+    @classmethod
+    def _isValid(cls, path, source):
+        '''
+        Checks if the store of the given path is up to date with the given
+        dump file.
+        '''
+        if not os.path.exists(path):
+            return False
+        stat = os.stat(source)
+        try:
+            db = sqlite3.connect(path)
+            try:
+                meta = dict(db.execute("SELECT key, value FROM meta"))
+            finally:
+                db.close()
+        except sqlite3.Error:
+            return False
+        return (meta.get("version") == _VERSION
+                and meta.get("size") == str(stat.st_size)
+                and meta.get("mtime") == repr(stat.st_mtime))
+
+    @classmethod
+    def convert(cls, source, path, progress=None, cancelled=None):
+        '''
+        Converts the given dump file to a store of the given path. The dump
+        is parsed incrementally, so only a branch of the tree is kept in
+        memory at once.
+
+        The optional progress function is called with numbers of read and all
+        bytes of the dump file. DumpCancelled is raised as soon as the optional
+        cancelled event is set.
+        '''
+        log.info("Converting dump '%s' to store '%s'" % (source, path))
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        stat = os.stat(source)
+        # stores may be converted by several threads at once
+        fd, tempPath = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        os.close(fd)
+        db = sqlite3.connect(tempPath)
+        try:
+            db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            db.execute("CREATE TABLE nodes (path TEXT PRIMARY KEY, "
+                       "count INTEGER, data BLOB)")
+            tag, container = cls._convertNodes(source, db, progress,
+                                               cancelled)
+            db.executemany("INSERT INTO meta VALUES (?, ?)", (
+                ("version", _VERSION),
+                ("source", os.path.abspath(source)),
+                ("size", str(stat.st_size)),
+                ("mtime", repr(stat.st_mtime)),
+                ("tag", tag),
+                ("container", '/'.join(container or ())),
+            ))
+            db.commit()
+        except:
+            db.close()
+            os.remove(tempPath)
+            raise
+        db.close()
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tempPath, path)
+
+    @classmethod
+    def _convertNodes(cls, source, db, progress, cancelled):
+        '''
+        Inserts nodes of the given dump file into the given database and
+        returns the tag of node elements and tags of elements leading from
+        a node element to elements of its children.
+        '''
+        meta = {}
+        rows = []
+        total = os.path.getsize(source)
+        f = openDump(source)
+        try:
+            for path, count, element in iterNodes(f, meta):
+                rows.append((_key(path), count, etree.tostring(element)))
+                if len(rows) >= _BATCH_SIZE:
+                    db.executemany("INSERT INTO nodes VALUES (?, ?, ?)", rows)
+                    rows = []
+                    if cancelled is not None and cancelled.is_set():
+                        raise DumpCancelled()
+                    if progress is not None:
+                        progress(dumpPosition(f), total)
+        finally:
+            f.close()
+        db.executemany("INSERT INTO nodes VALUES (?, ?, ?)", rows)
+        return meta.get("tag"), meta.get("container")
+
+    def element(self, path, depth):
+        '''
+        Returns an XML element of a node of the given path tuple with its
+        descendants up to the given depth, -1 stands for all descendants.
+        Returns None if there is no such node.
+        '''
+        row = self._db.execute("SELECT count, data FROM nodes WHERE path=?",
+                               (_key(path),)).fetchone()
+        if row is None:
+            return None
+        count, data = row
+        element = etree.fromstring(data)
+        if depth == 0 or not count:
+            return element
+        container = element
+        for tag in self._container:
+            sub = container.find(tag)
+            if sub is None:
+                sub = etree.SubElement(container, tag)
+            container = sub
+        for idx in xrange(count):
+            child = self.element(path + (idx,), depth - 1)
+            if child is not None:
+                container.append(child)
+        return element
+
+    def close(self):
+        '''
+        Closes the store.
+        '''
+        self._db.close()
+
+
+class DumpResponse(object):
+    '''
+    A response to a request served from a dump store.
+    '''
+    def __init__(self, id, status, accessible):
+        self.id = id
+        self.status = status
+        self.accessible = accessible
+
+
+class DumpDevice(DeviceObject):
+    '''
+    A class of off-line devices that read accessibles from a dump store
+    only when they are requested.
+    '''
+    def __init__(self, name, store):
+        self.name = name
+        self.address = (store.source, None)
+        self.client = self
+        self.messages = Queue()
+        self._store = store
+        self._responses = {}
+        self._ids = itertools.count(protocol.DEFAULT_MSG_ID + 1)
+        DeviceObject.__init__(self)
+
+    def _connectDevice(self):
+        return True
+
+    def _disconnectDevice(self):
+        self._responses.clear()
+        self._store.close()
+        return True
+
+    def __str__(self):
+        return self.name
+
+    def getAccessible(self, path, depth, **kwargs):
+        '''
+        Returns an accessible of the given path with its descendants up to
+        the given depth or None if there is no such accessible.
+        '''
+        element = self._store.element(path.tuple, depth)
+        if element is None:
+            return None
+        return accessible.Accessible.unmarshal(element)
+
+    def requestAccessible(self, path, depth, **kwargs):
+        '''
+        Serves a request for an accessible of the given path and returns
+        an ID of its response.
+        '''
+        id = self._ids.next()
+        acc = self.getAccessible(path, depth)
+        if acc is None:
+            self._responses[id] = DumpResponse(id, False,
+                                               accessible.Accessible(path))
+        else:
+            self._responses[id] = DumpResponse(id, True, acc)
+        # responses are delivered asynchronously like the ones of devices
+        self.messages.notEmpty.emit(id)
+        return id
+
+    def getResponse(self, id):
+        '''
+        Returns a response of the given ID.
+        '''
+        return self._responses.pop(id, None)
+
+
+class DumpLoader(QtCore.QObject):
+    '''
+    Prepares a dump file for opening in a worker thread. Large dumps are
+    converted to their stores and compressed dumps are decompressed to
+    temporary files.
+    '''
+    progress = QtCore.Signal(object, object)
+    loaded = QtCore.Signal()
+    failed = QtCore.Signal(str)
+    cancelled = QtCore.Signal()
+
+    # Number of progress steps reported during loading
+    _STEPS = 1000
+
+    def __init__(self, path, lazy):
+        QtCore.QObject.__init__(self)
+        self.path = path
+        self.lazy = lazy
+        self.storePath = None
+        self.tempPath = None
+        self._cancelled = threading.Event()
+        self._reported = -1
+
+    def _progress(self, value, maximum):
+        '''
+        Reports the loading progress if it changed noticeably.
+        '''
+        step = value * self._STEPS / max(1, maximum)
+        if step != self._reported:
+            self._reported = step
+            self.progress.emit(value, maximum)
+
+    def _run(self):
+        '''
+        Prepares the dump file and reports the result.
+        '''
+        try:
+            if self.lazy:
+                self.storePath = DumpStore.update(self.path, self._progress,
+                                                  self._cancelled)
+            elif isCompressed(self.path):
+                self.tempPath = decompressDump(self.path, self._progress,
+                                               self._cancelled)
+        except DumpCancelled:
+            log.info("Loading dump '%s' cancelled" % self.path)
+            self.cancelled.emit()
+        except Exception, ex:
+            log.exception(ex)
+            self.failed.emit(str(ex))
+        else:
+            self.loaded.emit()
+
+    def start(self):
+        '''
+        Starts loading the dump in a worker thread.
+        '''
+        thread = threading.Thread(target=self._run,
+                                  name="DumpLoader-%s" % self.path)
+        thread.daemon = True
+        thread.start()
+
+    #@QtCore.Slot()
+    def cancel(self):
+        '''
+        Cancels loading the dump.
+        '''
+        self._cancelled.set()
@@ -40,13 +40,18 @@ from PySide import QtCore
 from PySide import QtGui
 
 from tadek.core import log
+from tadek.core import settings
 
 import icons
 import dialogs
 from view import View
 from device import DeviceTab
 from search import SearchDialog
-from devices import OfflineDevice
+from devices import OfflineDevice, ReplayDevice, CAPTURE_EXTENSION
+from devices import capturedDevices
+from warmup import WarmupCache
+from dump import isCompressed
+from dumpstore import DumpStore, DumpDevice, DumpLoader
 from exploredialogs import MouseDialog, KeyboardDialog
 from utils import window, viewName, LastValues, ClosableTabBar
 
@@ -59,6 +64,25 @@ class Explore(View):
     _ICON_FILE = ":/explore/icons/system-search.png"
 
     _CONFIG_SECTION_MENU = "menu"
+    _DUMP_FILTERS = ("Dump files (*.xml *.xml.gz);;XML files (*.xml);;"
+                     "Compressed XML files (*.xml.gz);;"
+                     "Traffic captures (*%s);;All files (*)"
+                     % CAPTURE_EXTENSION)
+
+    section = settings.get(viewName(), "dump", force=True)
+    # Dumps of this size or larger are converted to indexed stores
+    # in a worker thread and opened from them, smaller ones are parsed
+    # at once
+    _lazySize = section.get("lazy_size", default=1048576)
+    section = settings.get(viewName(), "warmup", force=True)
+    # Recent dumps are prepared for opening in the background if enabled
+    _warmupEnabled = section.get("enabled", default="No")
+    _warmupSize = section.get("size", default=5)
+    _warmupInterval = section.get("interval", default=60000)
+    section = settings.get(viewName(), "replay", force=True)
+    # Factor of latencies of responses replayed from traffic captures
+    _replayScale = section.get("scale", default=1.0)
+    del section
 
     # Menus and Tool bar
     _menuFile = (
@@ -141,6 +165,13 @@ class Explore(View):
 
         self._tabs = {}
         self._offlineDevs = {}
+        self._tempDumps = {}
+        # Paths of traffic captures replayed by devices
+        self._replayDevs = {}
+        self._loaders = {}
+        # Accessible paths to show in tabs of dumps being opened
+        self._pendingPaths = {}
+        self._warmup = None
         self._readOnly = False
 
         self.search = SearchDialog(self)
@@ -178,7 +209,7 @@ class Explore(View):
         if port:
             tooltip = "%s:%d" % (address, port)
         else:
-            tooltip = address
+            tooltip = self._dumpPath(device) or address
         self._tabWidget.setTabToolTip(index, tooltip)
         self._tabWidget.setCurrentIndex(index)
         self._actionRefresh.triggered.connect(tab.refresh)
@@ -203,8 +234,32 @@ class Explore(View):
             return
         log.debug("Removing device tab: %s" % device)
         self._tabWidget.removeTab(self._tabWidget.indexOf(tab.tab))
+        self._replayDevs.pop(device, None)
         if tab.isOffline():
-            self._offlineDevs.pop(device.address[0])
+            self._offlineDevs.pop(self._dumpPath(device), None)
+            tempPath = self._tempDumps.pop(device, None)
+            if tempPath is not None:
+                try:
+                    os.remove(tempPath)
+                except OSError:
+                    log.warning("Could not remove file '%s'" % tempPath)
+
+    def _dumpPath(self, device):
+        '''
+        Returns a path to the dump file opened as the given off-line device.
+        '''
+        for path, dev in self._offlineDevs.iteritems():
+            if dev is device:
+                return path
+        return None
+
+    def _showPath(self, devTab, path):
+        '''
+        Selects an item of the given accessible path in the given device tab.
+        '''
+        if not devTab.showPath(path):
+            dialogs.runWarning("Item is no longer available.",
+                               "Item unavailable")
 
     def _setInfoActive(self, devTab):
         '''
@@ -222,28 +277,184 @@ class Explore(View):
             self._keyboard.setEnabled(True)
             self._readOnly = False
 
+    def _isLazy(self, size):
+        '''
+        Returns True if a dump of the given size should be read lazily
+        from an indexed store.
+        '''
+        lazySize = self._lazySize.getInt()
+        return lazySize > 0 and size >= lazySize
+
+    def _warmDump(self, path):
+        '''
+        Converts the given dump to its store, so it is opened lazily from
+        the store at once, and returns a path to the store. Called by
+        the warm-up cache in a worker thread.
+        '''
+        if path.endswith(CAPTURE_EXTENSION):
+            return None
+        return DumpStore.update(path)
+
     def _open(self, path):
         '''
         Opens a dump in a new tab and returns True on success or False
-        on failure.
+        on failure. Large and compressed dumps are prepared in a worker
+        thread first, so True means then that loading has started.
         '''
+        if path in self._loaders:
+            return False
+        if path.endswith(CAPTURE_EXTENSION):
+            return self._connectReplay(path)
         if path in self._offlineDevs:
             self._offlineDevs[path].disconnectDevice()
         try:
-            dev = OfflineDevice(os.path.split(path)[1], file=path)
+            size = os.path.getsize(path)
+        except OSError, ex:
+            dialogs.runError("Error occurred while loading dump:\n%s" % str(ex))
+            return False
+        if self._warmup is not None:
+            storePath = self._warmup.take(path)
+            if storePath is not None:
+                return self._connectDump(path, storePath)
+        lazy = self._isLazy(size)
+        if not lazy and not isCompressed(path):
+            return self._connectDump(path)
+        log.debug("Loading dump in background: '%s'" % path)
+        loader = DumpLoader(path, lazy)
+        dialog = QtGui.QProgressDialog(window())
+        dialog.setWindowTitle("Wait")
+        dialog.setLabelText("Loading dump: %s" % os.path.split(path)[1])
+        dialog.setRange(0, 0)
+        dialog.canceled.connect(loader.cancel)
+        loader.progress.connect(lambda value, maximum:
+                                self._loadingProgress(loader, value, maximum))
+        loader.loaded.connect(lambda: self._dumpLoaded(loader))
+        loader.failed.connect(lambda message:
+                              self._dumpLoadingFailed(loader, message))
+        loader.cancelled.connect(lambda: self._dumpLoadingCancelled(loader))
+        self._loaders[path] = (loader, dialog)
+        loader.start()
+        dialog.show()
+        return True
+
+    def _connectDump(self, path, storePath=None, tempPath=None):
+        '''
+        Connects an off-line device of the given dump, read from the given
+        store or temporary file if provided. Returns True on success
+        or False on failure.
+        '''
+        dev = None
+        try:
+            name = os.path.split(path)[1]
+            if storePath is not None:
+                dev = DumpDevice(name, DumpStore(storePath))
+            else:
+                dev = OfflineDevice(name, file=tempPath or path)
             dev.responseReceived.connect(lambda id:
                                          self._deviceResponseReceived(dev, id))
             dev.connected.connect(lambda: self._deviceConnected(dev))
             dev.disconnected.connect(lambda:
                                      self._deviceDisconnected(dev, False))
+            self._offlineDevs[path] = dev
+            if tempPath is not None:
+                self._tempDumps[dev] = tempPath
             log.debug("Connecting off-line device: %s" % dev.name)
             dev.connectDevice()
-            self._offlineDevs[path] = dev
             return True
         except Exception, ex:
+            if dev is not None and self._offlineDevs.get(path) is dev:
+                self._offlineDevs.pop(path)
+            if tempPath is not None:
+                self._tempDumps.pop(dev, None)
+                os.remove(tempPath)
+            self._pendingPaths.pop(path, None)
             dialogs.runError("Error occurred while loading dump:\n%s" % str(ex))
             return False
 
+    def _connectReplay(self, path):
+        '''
+        Connects devices replaying traffic captured to the given file,
+        one for each captured device. Returns True on success or False
+        on failure.
+        '''
+        for dev, replayed in self._replayDevs.items():
+            if replayed == path:
+                dev.disconnectDevice()
+        try:
+            scale = float(self._replayScale.get())
+            devs = [ReplayDevice(path, name, scale)
+                    for name in capturedDevices(path)]
+        except Exception, ex:
+            dialogs.runError("Error occurred while loading traffic capture:"
+                             "\n%s" % str(ex))
+            return False
+        if not devs:
+            dialogs.runWarning("No traffic is captured in '%s'"
+                               % os.path.split(path)[1])
+            return False
+        for dev in devs:
+            self._connectReplayDevice(dev, path)
+        return True
+
+    def _connectReplayDevice(self, dev, path):
+        '''
+        Connects the given device replaying traffic captured to the file
+        of the given path.
+        '''
+        dev.responseReceived.connect(lambda id:
+                                     self._deviceResponseReceived(dev, id))
+        dev.connected.connect(lambda: self._deviceConnected(dev))
+        dev.disconnected.connect(lambda: self._deviceDisconnected(dev, False))
+        self._replayDevs[dev] = path
+        log.debug("Connecting replay device: %s" % dev.name)
+        dev.connectDevice()
+
+    def _loadingProgress(self, loader, value, maximum):
+        '''
+        Displays progress of loading a dump by the given loader.
+        '''
+        if loader.path not in self._loaders:
+            return
+        dialog = self._loaders[loader.path][1]
+        # values are scaled to kilobytes to fit in the progress bar range
+        dialog.setRange(0, max(1, maximum / 1024))
+        dialog.setValue(value / 1024)
+        dialog.setLabelText("Loading dump: %s\n%.1f of %.1f MB"
+                            % (os.path.split(loader.path)[1],
+                               value / 1048576.0, maximum / 1048576.0))
+
+    def _finishLoading(self, loader):
+        '''
+        Closes the progress dialog of the given dump loader.
+        '''
+        loader, dialog = self._loaders.pop(loader.path, (loader, None))
+        if dialog is not None:
+            dialog.canceled.disconnect(loader.cancel)
+            dialog.close()
+            dialog.deleteLater()
+
+    def _dumpLoaded(self, loader):
+        '''
+        Opens a dump prepared by the given loader in a new tab.
+        '''
+        self._finishLoading(loader)
+        self._connectDump(loader.path, loader.storePath, loader.tempPath)
+
+    def _dumpLoadingFailed(self, loader, message):
+        '''
+        Reports an error of loading a dump by the given loader.
+        '''
+        self._finishLoading(loader)
+        self._pendingPaths.pop(loader.path, None)
+        dialogs.runError("Error occurred while loading dump:\n%s" % message)
+
+    def _dumpLoadingCancelled(self, loader):
+        '''
+        Cleans up after loading a dump by the given loader is cancelled.
+        '''
+        self._finishLoading(loader)
+        self._pendingPaths.pop(loader.path, None)
+
     def _deviceConnected(self, device):
         '''
         Creates a tab representing the connected device or activates an
@@ -256,18 +467,22 @@ class Explore(View):
             self._setInfoActive(tab)
         else:
             self._addDeviceTab(device)
+        path = self._dumpPath(device)
+        if path in self._pendingPaths:
+            self._showPath(self._tabs[device], self._pendingPaths.pop(path))
 
     def _deviceDisconnected(self, device, error):
         '''
         Removes a tab representing the disconnected device. The error parameter
         can be set to True to indicate that the device was disconnected due
-        to an error. 
+        to an error. Tabs of devices being reconnected are deactivated until
+        the devices are back.
         '''
         tab = self._tabs.get(device)
         if not tab:
             return
-        if error and not dialogs.runQuestion("Do you want to close '%s' tab?"
-                                              % (device.name)):
+        if error and (device.isReconnecting() or not dialogs.runQuestion(
+                      "Do you want to close '%s' tab?" % (device.name))):
             tab.setActive(False)
             if self._tabWidget.currentWidget() == tab.tab:
                 self._setInfoActive(tab)
@@ -298,6 +513,20 @@ class Explore(View):
         '''
         View.load(self)
         self.updateRecentFiles()
+        if self._warmup is None and self._warmupEnabled.getBool():
+            self._warmup = WarmupCache(self._warmDump, self._recentFiles.all,
+                                       self._warmupSize.getInt(),
+                                       self._warmupInterval.getInt())
+            self._warmup.start()
+
+    def unload(self):
+        '''
+        Unloads the view and stops warming up recent dumps.
+        '''
+        if self._warmup is not None:
+            self._warmup.stop()
+            self._warmup = None
+        View.unload(self)
 
     def display(self, accessible):
         '''
@@ -474,6 +703,45 @@ class Explore(View):
                 return devTab
         return None
 
+    def deviceTabs(self):
+        '''
+        Returns a list of all device tabs in the order of tabs.
+        '''
+        tabs = []
+        for index in xrange(self._tabWidget.count()):
+            devTab = self.deviceTabAtIndex(index)
+            if devTab is not None:
+                tabs.append(devTab)
+        return tabs
+
+    def showDeviceTab(self, devTab):
+        '''
+        Makes the given device tab the current one.
+        '''
+        self._tabWidget.setCurrentIndex(self._tabWidget.indexOf(devTab.tab))
+
+    def openDump(self, path, accessiblePath=None):
+        '''
+        Opens a dump in a new tab or makes its tab the current one if it is
+        open already, and selects an item of the given accessible path
+        if provided. Returns True on success or False on failure.
+        '''
+        tab = self._tabs.get(self._offlineDevs.get(path))
+        if tab is not None and tab.isActive():
+            self.showDeviceTab(tab)
+            if accessiblePath is not None:
+                self._showPath(tab, accessiblePath)
+            return True
+        if accessiblePath is not None:
+            self._pendingPaths[path] = accessiblePath
+        if path in self._loaders:
+            return True
+        if not self._open(path):
+            self._pendingPaths.pop(path, None)
+            return False
+        self.updateRecentFiles(path)
+        return True
+
     def accessibleText(self):
         '''
         Returns text of currently selected accessible.
@@ -554,7 +822,7 @@ class Explore(View):
         Shows a dialog to open a dump in a new tab.
         '''
         path = QtGui.QFileDialog.getOpenFileName(window(),
-                                filter="XML files (*.xml);;All files (*)")[0]
+                                filter=self._DUMP_FILTERS)[0]
         if not path:
             return
         log.debug("Opening dump file: '%s'" % path)
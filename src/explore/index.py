@@ -0,0 +1,236 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import re
+
+from tadek.core import accessible
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokens(name):
+    '''
+    Splits the given name of an accessible into case folded tokens.
+    '''
+    return _TOKEN_RE.findall(name.upper()) if name else []
+
+
+class IndexEntry(object):
+    '''
+    Class of accessible data stored in the index.
+    '''
+    __slots__ = ("path", "index", "name", "role", "count", "states", "text")
+
+    def __init__(self, acc):
+        self.path = acc.path
+        self.index = acc.index
+        self.name = acc.name
+        self.role = acc.role
+        self.count = acc.count
+        self.states = acc.states
+        self.text = acc.text
+
+    def children(self):
+        '''
+        Entries do not store children, use AccessibleIndex.get() instead.
+        '''
+        return []
+
+
+class AccessibleIndex(object):
+    '''
+    An inverted index of accessibles loaded from a device. It maps name
+    tokens, roles and states of accessibles to their paths and is updated
+    incrementally as accessibles are loaded, refreshed or removed.
+    '''
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# Private methods:
+    def _index(self, key, entry):
+        '''
+        Adds the given entry to the inverted mappings.
+        '''
+        for token in tokens(entry.name):
+            self._tokens.setdefault(token, set()).add(key)
+        if entry.role:
+            self._roles.setdefault(entry.role.upper(), set()).add(key)
+        if entry.states is None:
+            self._stateless.add(key)
+        for state in entry.states or ():
+            self._states.setdefault(state.upper(), set()).add(key)
+
+    def _unindex(self, key, entry):
+        '''
+        Removes the given entry from the inverted mappings.
+        '''
+        def discard(mapping, value):
+            keys = mapping.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del mapping[value]
+
+        for token in tokens(entry.name):
+            discard(self._tokens, token)
+        if entry.role:
+            discard(self._roles, entry.role.upper())
+        self._stateless.discard(key)
+        for state in entry.states or ():
+            discard(self._states, state.upper())
+
+    def _lookup(self, mapping, value, exact):
+        '''
+        Returns a set of keys of the given value in the given mapping. If
+        exact is False, keys of all values containing the value are returned.
+        '''
+        if exact:
+            return mapping.get(value, set())
+        keys = set()
+        for other in mapping:
+            if value in other:
+                keys |= mapping[other]
+        return keys
+
+    def _candidates(self, check):
+        '''
+        Returns a set of keys of entries that can match the given search
+        criteria or None if the criteria do not narrow the entries.
+        '''
+        sets = []
+        if check.role and "role" not in check.expressions:
+            sets.append(self._lookup(self._roles, check.role.upper(),
+                                     check.exact))
+        if check.state and "state" not in check.expressions:
+            sets.append(self._lookup(self._states, check.state.upper(),
+                                     check.exact))
+        if check.name and "name" not in check.expressions:
+            for token in tokens(check.name):
+                sets.append(self._lookup(self._tokens, token, check.exact))
+        if not sets:
+            return None
+        sets.sort(key=len)
+        keys = set(sets[0])
+        for other in sets[1:]:
+            keys &= other
+        return keys
+
+# Public methods:
+    def clear(self):
+        '''
+        Removes all entries from the index.
+        '''
+        self._entries = {}
+        self._children = {}
+        self._tokens = {}
+        self._roles = {}
+        self._states = {}
+        # Keys of entries of accessibles loaded without states
+        self._stateless = set()
+
+    def add(self, acc):
+        '''
+        Adds the given accessible to the index or updates its entry. States
+        and text already stored are kept if the accessible was loaded without
+        them.
+        '''
+        key = acc.path.tuple
+        if not key:
+            return
+        entry = IndexEntry(acc)
+        old = self._entries.get(key)
+        if old is not None:
+            if entry.states is None:
+                entry.states = old.states
+            if entry.text is None:
+                entry.text = old.text
+            self._unindex(key, old)
+        self._entries[key] = entry
+        self._children.setdefault(key[:-1], set()).add(key)
+        self._index(key, entry)
+
+    def remove(self, path):
+        '''
+        Removes an entry of the given path and entries of all its descendants.
+        '''
+        key = path.tuple
+        siblings = self._children.get(key[:-1])
+        if siblings is not None:
+            siblings.discard(key)
+        keys = [key]
+        while keys:
+            key = keys.pop()
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._unindex(key, entry)
+            keys.extend(self._children.pop(key, ()))
+
+    def get(self, path):
+        '''
+        Returns an entry of the given path or None.
+        '''
+        return self._entries.get(path.tuple)
+
+    def search(self, check, path=None, deep=True, unknown=None):
+        '''
+        Returns paths of entries below the given path that match the given
+        search criteria in the tree order. If deep is False, only children
+        of the path are searched. If the criteria include a state, paths
+        of entries loaded without states are appended to the given unknown
+        list, as the index cannot tell if they match.
+        '''
+        prefix = path.tuple if path is not None else ()
+        n = len(prefix)
+
+        def below(key):
+            if len(key) <= n or key[:n] != prefix:
+                return False
+            return deep or len(key) == n + 1
+
+        keys = self._candidates(check)
+        if keys is None:
+            keys = self._entries.iterkeys()
+        results = []
+        for key in keys:
+            if below(key) and check(self._entries[key]):
+                results.append(key)
+        results.sort()
+        if unknown is not None and check.state:
+            unknown.extend(accessible.Path(*key)
+                           for key in sorted(filter(below, self._stateless)))
+        return [accessible.Path(*key) for key in results]
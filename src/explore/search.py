@@ -34,18 +34,54 @@
 ##                                                                            ##
 ################################################################################
 
+import os
 import re
-import string
+import operator
 
 from PySide import QtCore
+from PySide import QtGui
 
 from tadek.core import log
 from tadek.core import config
 from tadek.core import constants
+from tadek.core import accessible
 from tadek.core.utils import decode
 
 import utils
-from dialogs import runWarning, runInformation
+from dialogs import runWarning, runError, runInformation
+from corpus import Corpus, CorpusIndexer
+
+_CRITERIA_KEYS = ("name", "role", "state", "text")
+_LABEL_RE = re.compile(r"^\s*[\"']?(\w+)[\"']?\s*[=:]\s*(?![uUrR]*[\"'])")
+_CRITERION_RE = re.compile(r"(?<!\w)[\"']?(%s)[\"']?\s*[=:]\s*[uUrR]*"
+                           r"([\"'])(.*?)(?<!\\)\2" % '|'.join(_CRITERIA_KEYS))
+
+
+def parseCriteria(text):
+    '''
+    Parses named search criteria provided one per line, e.g. as pasted
+    from a test module:
+        okButton = Locator(name="OK", role="PUSH_BUTTON")
+    and returns a list of pairs of a label and a dictionary of criteria.
+    Lines without any criteria are skipped and lines without a label are
+    labeled with their numbers.
+    '''
+    result = []
+    for number, line in enumerate(text.splitlines()):
+        criteria = dict.fromkeys(_CRITERIA_KEYS, '')
+        found = False
+        for key, quote, value in _CRITERION_RE.findall(line):
+            criteria[key] = value.strip()
+            found = True
+        if not found:
+            continue
+        match = _LABEL_RE.match(line)
+        if match:
+            label = match.group(1)
+        else:
+            label = "#%d" % (number + 1)
+        result.append((label, criteria))
+    return result
 
 
 class SearchDialog(QtCore.QObject):
@@ -71,7 +107,10 @@ class SearchDialog(QtCore.QObject):
         self.buttonClose.clicked.connect(self.dialog.close)
         self.buttonSearch.clicked.connect(self._startSearching)
         self.buttonNext.clicked.connect(self._nextSearching)
+        self.buttonFindAll.clicked.connect(self._startSearchingAll)
         self.buttonStop.clicked.connect(self._stopSearching)
+        self.buttonCorpusBrowse.clicked.connect(self._browseCorpus)
+        self.buttonCorpusIndex.clicked.connect(self._indexCorpus)
         self.dialog.finished.connect(self._onClose)
 
         self.comboBoxName.editTextChanged.connect(self._setName)
@@ -84,6 +123,10 @@ class SearchDialog(QtCore.QObject):
 
         self.checkBoxExactMatch.toggled.connect(self._setExactMatch)
         self.checkBoxCaseSensitive.toggled.connect(self._setCaseSensitiveMatch)
+        self.checkBoxIndex.toggled.connect(self._setIndexSearch)
+        self.checkBoxVerify.toggled.connect(self._setVerify)
+        self.checkBoxAllDevices.toggled.connect(self._setAllDevices)
+        self.treeWidgetResults.itemActivated.connect(self._showResult)
 
         self._view = view
         self._name = ''
@@ -91,10 +134,20 @@ class SearchDialog(QtCore.QObject):
         self._state = ''
         self._text = ''
         self._searching = False
+        self._searchingAll = False
         self._manualUpdate = False
 
         self._explorerDev = None
         self._foundAccessibles = []
+        # Device tabs searched for all matches with their signal handlers
+        self._searchedDevs = {}
+        # Result items and paths of accessibles found in device tabs
+        # or dump files
+        self._results = {}
+        self._resultCount = 0
+        # Indexer of the dump corpus with its progress dialog
+        self._indexer = None
+        self._indexDialog = None
 
         self.buttonNext.setVisible(False)
         self.buttonStop.setEnabled(False)
@@ -193,6 +246,126 @@ class SearchDialog(QtCore.QObject):
         self._caseSensitiveMatch = checked
         self._saveState()
 
+    #@QtCore.Slot(bool)
+    def _setIndexSearch(self, checked):
+        '''
+        Sets searching in the index of loaded items instead of the device.
+        '''
+        self._stopSearching()
+        self._indexSearch = checked
+        self.checkBoxVerify.setEnabled(checked)
+        self._saveState()
+
+    #@QtCore.Slot(bool)
+    def _setVerify(self, checked):
+        '''
+        Sets verification of items found in the index on the device.
+        '''
+        self._stopSearching()
+        self._verify = checked
+        self._saveState()
+
+    #@QtCore.Slot(bool)
+    def _setAllDevices(self, checked):
+        '''
+        Sets searching for all matches on all device tabs.
+        '''
+        self._stopSearching()
+        self._allDevices = checked
+        self._saveState()
+
+    #@QtCore.Slot()
+    def _browseCorpus(self):
+        '''
+        Shows a dialog to choose a directory of the dump corpus.
+        '''
+        path = QtGui.QFileDialog.getExistingDirectory(self.dialog,
+                                    dir=self.lineEditCorpus.text())
+        if not path:
+            return
+        self.lineEditCorpus.setText(path)
+        self._saveState()
+
+    def _corpus(self):
+        '''
+        Returns the dump corpus of the provided directory or None if there
+        is no such directory.
+        '''
+        directory = decode(self.lineEditCorpus.text()).strip()
+        if not directory or not os.path.isdir(directory):
+            runInformation("No directory of dumps is provided.",
+                           "Corpus unavailable")
+            return None
+        return Corpus(directory)
+
+    #@QtCore.Slot()
+    def _indexCorpus(self):
+        '''
+        Starts indexing dumps of the corpus in the background.
+        '''
+        if self._indexer is not None:
+            return
+        corpus = self._corpus()
+        if corpus is None:
+            return
+        self._saveState()
+        self._indexer = CorpusIndexer(corpus)
+        self._indexDialog = QtGui.QProgressDialog(self.dialog)
+        self._indexDialog.setWindowTitle("Wait")
+        self._indexDialog.setLabelText("Indexing dumps: %s"
+                                       % corpus.directory)
+        self._indexDialog.setRange(0, 0)
+        self._indexDialog.canceled.connect(self._indexer.cancel)
+        self._indexer.progress.connect(self._corpusProgress)
+        self._indexer.indexed.connect(self._corpusIndexed)
+        self._indexer.failed.connect(self._corpusFailed)
+        self._indexer.cancelled.connect(self._finishIndexing)
+        self.buttonCorpusIndex.setEnabled(False)
+        self._indexer.start()
+        self._indexDialog.show()
+
+    #@QtCore.Slot(int, int)
+    def _corpusProgress(self, done, count):
+        '''
+        Displays progress of indexing the corpus.
+        '''
+        if self._indexDialog is None:
+            return
+        self._indexDialog.setRange(0, count)
+        self._indexDialog.setValue(done)
+        self._indexDialog.setLabelText("Indexing dumps: %s\n%d of %d"
+                                       % (self._indexer.corpus.directory,
+                                          done, count))
+
+    #@QtCore.Slot()
+    def _finishIndexing(self):
+        '''
+        Closes the progress dialog of indexing the corpus.
+        '''
+        if self._indexDialog is not None:
+            self._indexDialog.canceled.disconnect(self._indexer.cancel)
+            self._indexDialog.close()
+            self._indexDialog.deleteLater()
+        self._indexer = None
+        self._indexDialog = None
+        self.buttonCorpusIndex.setEnabled(True)
+
+    #@QtCore.Slot(int)
+    def _corpusIndexed(self, count):
+        '''
+        Reports the number of indexed dumps of the corpus.
+        '''
+        self._finishIndexing()
+        runInformation("%d dumps are indexed." % count, "Indexing finished")
+
+    #@QtCore.Slot(str)
+    def _corpusFailed(self, message):
+        '''
+        Reports an error of indexing the corpus.
+        '''
+        self._finishIndexing()
+        runError("Error occurred while indexing dumps:\n%s" % message)
+
     #@QtCore.Slot()
     def _onClose(self):
         '''
@@ -206,7 +379,13 @@ class SearchDialog(QtCore.QObject):
         Stops the searching process and resets buttons.
         '''
         self.searchingStoppedUpdateState()  
-        if self._searching:
+        if not self._searching:
+            return
+        if self._searchingAll:
+            for explorerDev in self._searchedDevs.keys():
+                explorerDev.stopSearching()
+                self._disconnectDevice(explorerDev)
+        else:
             self._explorerDev.stopSearching()
             self._explorerDev.startItemChanged.disconnect(
                 self._startItemChanged)
@@ -214,123 +393,112 @@ class SearchDialog(QtCore.QObject):
             self._explorerDev.itemNotFound.disconnect(
                 self.itemNotFoundUpdateState)
             self._explorerDev.searchingStopped.disconnect(self._stopSearching)
-            self._searching = False
+        self._searching = False
+
+    def _disconnectDevice(self, explorerDev):
+        '''
+        Disconnects signals of the given device tab searched for all matches.
+        '''
+        onMatch, onFinish = self._searchedDevs.pop(explorerDev)
+        explorerDev.matchFound.disconnect(onMatch)
+        explorerDev.searchingFinished.disconnect(onFinish)
+        explorerDev.searchingStopped.disconnect(onFinish)
 
     class Check(object):
         '''
         Tests whether the given accessible matches the current search criteria.
         '''
+        # Costs of matching accessible attributes and of matching methods,
+        # used to test the cheapest criteria first
+        _ATTR_COSTS = {
+            "role": 0,
+            "name": 1,
+            "state": 2,
+            "text": 3,
+        }
+        _EQUAL_COST = 0
+        _FIND_COST = 1
+        _REGEXP_COST = 2
+
         def __init__(self, criteria):
             '''
             Initializes the criteria for searching which should be provided
-            as a dictionary with keys: name, role, text, type
+            as a dictionary with keys: name, role, state, text, matchType and
+            caseSensitiveMatch. The criteria are compiled once into a single
+            predicate, empty criteria are skipped.
             '''
             self.name = criteria['name'] or ''
             self.role = criteria['role'] or ''
             self.state = criteria['state'] or ''
             self.text = criteria['text'] or ''
             self._matchType = criteria['matchType']
-            self._caseSensitiveMatch = criteria['caseSensitiveMatch']
-            if self._matchType == SearchDialog._EXACT_MATCH:
-                if not self._caseSensitiveMatch:
-                    self.name = self.name.upper()
-                    self.text = self.text.upper()
-                    self.role = self.role.upper()
-                    self.state = self.state.upper()
-                self._matchName = lambda s: not self.name or s == self.name
-                self._matchRole = lambda s: not self.role or s == self.role
-                self._matchState = lambda s: not self.state or self.state in s
-                self._matchText = lambda s: not self.text or s == self.text
+            self.caseSensitive = criteria['caseSensitiveMatch']
+            self.exact = self._matchType == SearchDialog._EXACT_MATCH
+            # Names of criteria matched using regular expressions
+            self.expressions = set()
+            tests = []
+            for attr in ("role", "name", "state", "text"):
+                if getattr(self, attr):
+                    tests.append(self._compileTest(attr))
+            tests.sort(key=lambda test: test[0])
+            tests = tuple(test for cost, test in tests)
+            if not tests:
+                self._match = lambda acc: True
+            elif len(tests) == 1:
+                self._match = tests[0]
             else:
-                flags = re.DOTALL
-                if not self._caseSensitiveMatch:
-                    flags |= re.IGNORECASE
-                # name
-                if self.name and self.name[0] == '&':
-                    self.name = self.name[1:]
-                    compiledCriteriaName = self._compileExpression(
-                        self.name+'\Z', flags, 'name')
-                    self._matchName = lambda s: compiledCriteriaName.match(s)
-                else:
-                    if not self._caseSensitiveMatch:
-                        self.name = self.name.upper()
-                    self._matchName = lambda s: (not self.name or
-                        s.find(self.name)>=0)
-                # role
-                if self.role and self.role[0] == '&':
-                    self.role = self.role[1:]
-                    compiledCriteriaRole = self._compileExpression(
-                        self.role+'\Z', flags, 'role')
-                    self._matchRole = lambda s: compiledCriteriaRole.match(s)
-                else:
-                    if not self._caseSensitiveMatch:
-                        self.role = self.role.upper()
-                    self._matchRole = lambda s: (not self.role or
-                        s.find(self.role)>=0)
-                # state
-                if self.state and self.state[0] == '&':
-                    self.state = self.state[1:]
-                    compiledCriteriaState = self._compileExpression(
-                        self.state+'\Z', flags, 'state')
-                    
-                    def matchState(s):
-                        for state in s:
-                            if compiledCriteriaState.match(state):
-                                return True
-                        return False
-                    
-                    self._matchState = matchState
-                else:
-                    if not self._caseSensitiveMatch:
-                        self.state = self.state.upper()
-                    
-                    def matchState(s):
-                        if not self.state:
-                            return True
-                        for state in s:
-                            if state.find(self.state)>=0:
-                                return True
-                        return False
-                    
-                    self._matchState = matchState
-                # text
-                if self.text and self.text[0] == '&':
-                    self.text = self.text[1:]
-                    compiledCriteriaText = self._compileExpression(
-                        self.text+'\Z', flags, 'text')
-                    self._matchText = lambda s: compiledCriteriaText.match(s)
-                else:
-                    if not self._caseSensitiveMatch:
-                        self.text = self.text.upper()
-                    self._matchText = lambda s: (not self.text or
-                        s.find(self.text)>=0)
-
-        def __call__(self, itemData):
+                def match(acc):
+                    for test in tests:
+                        if not test(acc):
+                            return False
+                    return True
+                self._match = match
+
+        def __call__(self, acc):
+            '''
+            Compares the name, role, states and text of the given accessible
+            with the criteria.
+            '''
+            return self._match(acc)
+
+        def _compileTest(self, attr):
             '''
-            Compares the data in provided dictionary with the criteria.
+            Compiles a test of the given accessible attribute and returns it
+            together with its cost.
             '''
-            itemName = itemData['name'] or ''
-            itemRole = itemData['role'] or ''
-            itemStates = (itemData['states'] if itemData['states'] is not None
-                         else [])
-            itemText = itemData['text'] or ''
-
-            if not self._caseSensitiveMatch:
-                if self._matchType == SearchDialog._EXACT_MATCH:
-                    itemName = itemName.upper()
-                    itemRole = itemRole.upper()
-                    itemStates = map(string.upper, itemStates)
-                    itemText = itemText.upper()
-                else:
-                    if itemName and itemName[0] != '&':
-                        itemName = itemName.upper()
-                    if itemText and itemText[0] != '&':
-                        itemText = itemText.upper()
-
-            return (self._matchName(itemName) and
-                self._matchRole(itemRole) and
-                self._matchState(itemStates) and
-                self._matchText(itemText))
+            value = getattr(self, attr)
+            fold = not self.caseSensitive
+            if self.exact:
+                if fold:
+                    value = value.upper()
+                cost = self._EQUAL_COST
+                test = lambda s: s == value
+            elif value[0] == '&':
+                value = value[1:]
+                setattr(self, attr, value)
+                self.expressions.add(attr)
+                flags = re.DOTALL
+                if fold:
+                    flags |= re.IGNORECASE
+                    # Case folding is done by the regular expression itself
+                    fold = False
+                cost = self._REGEXP_COST
+                test = self._compileExpression(value+'\Z', flags, attr).match
+            else:
+                if fold:
+                    value = value.upper()
+                cost = self._FIND_COST
+                test = lambda s: value in s
+            cost = cost * len(self._ATTR_COSTS) + self._ATTR_COSTS[attr]
+            if attr == "state":
+                if fold:
+                    return cost, lambda acc: any(test(s.upper())
+                                                 for s in acc.states or ())
+                return cost, lambda acc: any(test(s) for s in acc.states or ())
+            get = operator.attrgetter(attr)
+            if fold:
+                return cost, lambda acc: test((get(acc) or '').upper())
+            return cost, lambda acc: test(get(acc) or '')
 
         def _compileExpression(self, pattern, flags, toLog):
             '''
@@ -356,22 +524,8 @@ class SearchDialog(QtCore.QObject):
         self.buttonSearch.setVisible(False)
         self.buttonStop.setEnabled(True)
 
-        explorerDev = self._view.deviceTabAtIndex()
+        explorerDev = self._searchedDevice()
         if explorerDev is None:
-            runWarning("No device is connected.", "Search unavailable")
-            self.searchingStoppedUpdateState()
-            return
-
-        currentPath = explorerDev.selectedItemPath()
-        if currentPath:
-            if not explorerDev.itemExists(currentPath):
-                self.searchingStoppedUpdateState()
-                return
-        else:
-            runInformation("No item is selected.", "Search unavailable")
-            self.searchingStoppedUpdateState()
-            log.warning("Search cannot be performed since no reference item"
-                " is selected")
             return
 
         self._explorerDev = explorerDev
@@ -380,6 +534,7 @@ class SearchDialog(QtCore.QObject):
         self._explorerDev.itemNotFound.connect(self.itemNotFoundUpdateState)
         self._explorerDev.searchingStopped.connect(self._stopSearching)
         self._searching = True
+        self._searchingAll = False
 
         criteria = {
             'name': self._name,
@@ -393,7 +548,11 @@ class SearchDialog(QtCore.QObject):
         if self._method == self._DEEP_METHOD:
             deep = True
         try:
-            explorerDev.find(self.Check(criteria), deep)
+            if self._indexSearch:
+                explorerDev.findIndexed(self.Check(criteria), deep,
+                                        self._verify)
+            else:
+                explorerDev.find(self.Check(criteria), deep)
             self._lastNames.add(self._name)
             if self._role:
                 self._lastRoles.add(self._role)
@@ -406,6 +565,212 @@ class SearchDialog(QtCore.QObject):
         except:
             self._stopSearching()
 
+    def _searchedDevice(self):
+        '''
+        Returns the current device tab if it has a reference item selected
+        or None otherwise.
+        '''
+        explorerDev = self._view.deviceTabAtIndex()
+        if explorerDev is None:
+            runWarning("No device is connected.", "Search unavailable")
+            self.searchingStoppedUpdateState()
+            return None
+
+        currentPath = explorerDev.selectedItemPath()
+        if currentPath:
+            if not explorerDev.itemExists(currentPath):
+                self.searchingStoppedUpdateState()
+                return None
+        else:
+            runInformation("No item is selected.", "Search unavailable")
+            self.searchingStoppedUpdateState()
+            log.warning("Search cannot be performed since no reference item"
+                " is selected")
+            return None
+        return explorerDev
+
+    #@QtCore.Slot()
+    def _startSearchingAll(self):
+        '''
+        Starts the searching process of all items matching the current
+        criteria or the batch criteria on the current device tab or on all
+        device tabs.
+        '''
+        self._stopSearching()
+        if self.groupBoxBatch.isChecked():
+            batch = parseCriteria(
+                decode(self.plainTextEditBatch.toPlainText()))
+            if not batch:
+                runInformation("No criteria are provided.",
+                               "Search unavailable")
+                return
+        else:
+            criteria = {
+                'name': self._name,
+                'role': self._role,
+                'state': self._state,
+                'text': self._text
+            }
+            label = ", ".join("%s=%s" % (key, criteria[key])
+                              for key in _CRITERIA_KEYS if criteria[key])
+            batch = [(label or '*', criteria)]
+        try:
+            checks = []
+            for label, criteria in batch:
+                criteria['matchType'] = self._matchType
+                criteria['caseSensitiveMatch'] = self._caseSensitiveMatch
+                checks.append((label, self.Check(criteria)))
+        except:
+            return
+        if self.groupBoxCorpus.isChecked():
+            self._searchCorpus(checks)
+            return
+
+        self.buttonNext.setVisible(False)
+        self.buttonSearch.setEnabled(False)
+        self.buttonFindAll.setEnabled(False)
+        self.buttonStop.setEnabled(True)
+
+        if self._allDevices:
+            explorerDevs = [explorerDev
+                            for explorerDev in self._view.deviceTabs()
+                            if explorerDev.isActive()]
+            if not explorerDevs:
+                runWarning("No device is connected.", "Search unavailable")
+                self.searchingStoppedUpdateState()
+                return
+            # whole trees are searched as selections differ between devices
+            path = accessible.Path()
+        else:
+            explorerDev = self._searchedDevice()
+            if explorerDev is None:
+                return
+            explorerDevs = [explorerDev]
+            path = None
+
+        self.treeWidgetResults.clear()
+        self._results = {}
+        self._resultCount = 0
+        for explorerDev in explorerDevs:
+            item = QtGui.QTreeWidgetItem(self.treeWidgetResults)
+            item.setFirstColumnSpanned(True)
+            self._results[explorerDev] = (item, [])
+            self._updateResultsTitle(explorerDev)
+            onMatch = (lambda label, acc, dev=explorerDev:
+                       self._addResult(dev, label, acc))
+            onFinish = lambda dev=explorerDev: self._deviceSearched(dev)
+            explorerDev.matchFound.connect(onMatch)
+            explorerDev.searchingFinished.connect(onFinish)
+            explorerDev.searchingStopped.connect(onFinish)
+            self._searchedDevs[explorerDev] = (onMatch, onFinish)
+        self._searching = True
+        self._searchingAll = True
+        deep = self._method == self._DEEP_METHOD
+        # Each device tab keeps its own requests in flight, so all devices
+        # are searched concurrently
+        for explorerDev in explorerDevs:
+            if explorerDev in self._searchedDevs:
+                explorerDev.findAll(checks, deep, self._indexSearch, path)
+
+    def _searchCorpus(self, checks):
+        '''
+        Finds all items matching the given checks in the indexed dumps
+        of the corpus.
+        '''
+        corpus = self._corpus()
+        if corpus is None:
+            return
+        if not corpus.isIndexed():
+            runInformation("Dumps of the directory are not indexed.",
+                           "Corpus unavailable")
+            return
+        self._saveState()
+        self.treeWidgetResults.clear()
+        self._results = {}
+        self._resultCount = 0
+        for label, check in checks:
+            for node in corpus.find(check):
+                if node.source not in self._results:
+                    item = QtGui.QTreeWidgetItem(self.treeWidgetResults)
+                    item.setFirstColumnSpanned(True)
+                    item.setToolTip(0, node.source)
+                    self._results[node.source] = (item, [])
+                self._addResult(node.source, label, node)
+        self.groupBoxResults.setTitle("Results (%d)" % self._resultCount)
+        for i in xrange(self.treeWidgetResults.columnCount()):
+            self.treeWidgetResults.resizeColumnToContents(i)
+        if not self._resultCount:
+            runInformation("No items found.", "Search finished")
+
+    def _addResult(self, explorerDev, label, acc):
+        '''
+        Adds the given accessible matching criteria of the given label
+        to the results of the given device tab or dump file.
+        '''
+        group, paths = self._results[explorerDev]
+        QtGui.QTreeWidgetItem(group, [label, str(acc.path), acc.name or '',
+                                      acc.role or ''])
+        if not paths:
+            group.setExpanded(True)
+        paths.append(acc.path)
+        self._resultCount += 1
+        self._updateResultsTitle(explorerDev)
+
+    def _updateResultsTitle(self, explorerDev):
+        '''
+        Updates titles of the results box and of results of the given device
+        tab or dump file with numbers of results.
+        '''
+        group, paths = self._results[explorerDev]
+        if isinstance(explorerDev, basestring):
+            name = os.path.split(explorerDev)[1]
+        else:
+            name = explorerDev.device.name
+        group.setText(0, "%s (%d)" % (name, len(paths)))
+        self.groupBoxResults.setTitle("Results (%d)" % self._resultCount)
+
+    def _deviceSearched(self, explorerDev):
+        '''
+        Handles the end of searching the given device tab and updates
+        the dialog after all device tabs are searched.
+        '''
+        self._disconnectDevice(explorerDev)
+        if self._searchedDevs:
+            return
+        self._searching = False
+        self.searchingStoppedUpdateState()
+        for i in xrange(self.treeWidgetResults.columnCount()):
+            self.treeWidgetResults.resizeColumnToContents(i)
+        if not self._resultCount:
+            runInformation("No items found.", "Search finished")
+
+    #@QtCore.Slot(QtGui.QTreeWidgetItem, int)
+    def _showResult(self, item, column):
+        '''
+        Selects the accessible of the given result item in its device tab.
+        '''
+        group = item.parent()
+        if group is None:
+            return
+        for explorerDev, (devGroup, paths) in self._results.iteritems():
+            if devGroup is group:
+                break
+        else:
+            return
+        if self._searching and not self._searchingAll:
+            self._stopSearching()
+        if isinstance(explorerDev, basestring):
+            # results of the corpus are shown in tabs of their dumps
+            self._view.openDump(explorerDev, paths[group.indexOfChild(item)])
+            return
+        if (explorerDev not in self._view.deviceTabs()
+            or not explorerDev.isActive()):
+            runWarning("Device is disconnected.", "Item unavailable")
+            return
+        self._view.showDeviceTab(explorerDev)
+        if not explorerDev.showPath(paths[group.indexOfChild(item)]):
+            runWarning("Item is no longer available.", "Item unavailable")
+
     #@QtCore.Slot()
     def _nextSearching(self):
         '''
@@ -438,6 +803,7 @@ class SearchDialog(QtCore.QObject):
         self.buttonSearch.setVisible(True)
         self.buttonSearch.setEnabled(True)
         self.buttonSearch.setDefault(True)
+        self.buttonFindAll.setEnabled(True)
         self.buttonStop.setVisible(True)
         self.buttonStop.setEnabled(False)
         runInformation("No items found.", "Search finished")
@@ -452,6 +818,7 @@ class SearchDialog(QtCore.QObject):
         self.buttonSearch.setVisible(True)
         self.buttonSearch.setEnabled(True)
         self.buttonSearch.setDefault(True)
+        self.buttonFindAll.setEnabled(True)
         self.buttonStop.setVisible(True)
         self.buttonStop.setEnabled(False)
 
@@ -507,6 +874,14 @@ class SearchDialog(QtCore.QObject):
                    "case_sensitive", self._caseSensitiveMatch)
         config.set(self._CONFIG_NAME, self._CONFIG_SECTION_OPTIONS,
                    "method", self._method)
+        config.set(self._CONFIG_NAME, self._CONFIG_SECTION_OPTIONS,
+                   "index", self._indexSearch)
+        config.set(self._CONFIG_NAME, self._CONFIG_SECTION_OPTIONS,
+                   "verify", self._verify)
+        config.set(self._CONFIG_NAME, self._CONFIG_SECTION_OPTIONS,
+                   "all_devices", self._allDevices)
+        config.set(self._CONFIG_NAME, self._CONFIG_SECTION_OPTIONS,
+                   "corpus", decode(self.lineEditCorpus.text()).strip())
         log.info("Search dialog state was saved to configuration")
 
     def _loadState(self):
@@ -522,6 +897,17 @@ class SearchDialog(QtCore.QObject):
         self._method = config.getInt(self._CONFIG_NAME,
                                      self._CONFIG_SECTION_OPTIONS,
                                      "method", self._DEEP_METHOD)
+        self._indexSearch = config.getBool(self._CONFIG_NAME,
+                                           self._CONFIG_SECTION_OPTIONS,
+                                           "index", False)
+        self._verify = config.getBool(self._CONFIG_NAME,
+                                      self._CONFIG_SECTION_OPTIONS,
+                                      "verify", False)
+        self._allDevices = config.getBool(self._CONFIG_NAME,
+                                          self._CONFIG_SECTION_OPTIONS,
+                                          "all_devices", False)
+        corpus = config.get(self._CONFIG_NAME, self._CONFIG_SECTION_OPTIONS,
+                            "corpus")
 
         if self._matchType == self._EXACT_MATCH:
             self.checkBoxExactMatch.setChecked(True)
@@ -529,6 +915,11 @@ class SearchDialog(QtCore.QObject):
             self.checkBoxExactMatch.setChecked(False)
 
         self.checkBoxCaseSensitive.setChecked(self._caseSensitiveMatch)
+        self.checkBoxIndex.setChecked(self._indexSearch)
+        self.checkBoxVerify.setChecked(self._verify)
+        self.checkBoxVerify.setEnabled(self._indexSearch)
+        self.checkBoxAllDevices.setChecked(self._allDevices)
+        self.lineEditCorpus.setText(corpus or '')
         
         if self._method == self._DEEP_METHOD:
             self.radioButtonDeep.setChecked(True)
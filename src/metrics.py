@@ -0,0 +1,451 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import time
+import json
+import bisect
+import tempfile
+
+from PySide import QtCore, QtGui
+
+import dialogs
+import utils
+from tadek.core import log
+
+# Upper bounds of buckets of round-trip times in milliseconds
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000,
+           30000, 60000)
+
+
+class Histogram(object):
+    '''
+    A histogram of round-trip times with fixed buckets.
+    '''
+    def __init__(self):
+        # The last bucket holds times exceeding all bounds
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        '''
+        Adds the given time in milliseconds.
+        '''
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        '''
+        Returns the mean time or None if there are no times.
+        '''
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def percentile(self, percent):
+        '''
+        Returns an upper estimate of the given percentile of times or None
+        if there are no times.
+        '''
+        if not self.count:
+            return None
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen and seen >= rank:
+                if i < len(BUCKETS):
+                    return min(BUCKETS[i], self.max)
+                break
+        return self.max
+
+
+class RequestStats(object):
+    '''
+    Statistics of requests of one type sent to one device.
+    '''
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.inFlight = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes = 0
+        self.times = Histogram()
+
+    def errorRate(self):
+        '''
+        Returns the ratio of failed requests to received responses.
+        '''
+        return float(self.errors) / self.received if self.received else 0.0
+
+    def timeoutRate(self):
+        '''
+        Returns the ratio of timed out requests to sent requests.
+        '''
+        return float(self.timeouts) / self.sent if self.sent else 0.0
+
+    def dict(self):
+        '''
+        Returns the statistics as a dictionary.
+        '''
+        return {
+            "sent": self.sent,
+            "received": self.received,
+            "in_flight": self.inFlight,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "error_rate": self.errorRate(),
+            "timeout_rate": self.timeoutRate(),
+            "bytes": self.bytes,
+            "min": self.times.min,
+            "mean": self.times.mean(),
+            "p50": self.times.percentile(50),
+            "p90": self.times.percentile(90),
+            "p99": self.times.percentile(99),
+            "max": self.times.max,
+            "buckets": dict(zip([str(bound) for bound in BUCKETS] + ["inf"],
+                                self.times.counts))
+        }
+
+
+class DeviceMetrics(QtCore.QObject):
+    '''
+    Collects metrics of requests sent to devices by device names and types
+    of requests, and dumps them to a file periodically.
+    '''
+    def __init__(self, timeout, countBytes=False):
+        '''
+        Initializes the metrics with a time in milliseconds after which
+        unanswered requests are counted as timed out, and a flag telling
+        whether sizes of responses are counted.
+        '''
+        QtCore.QObject.__init__(self)
+        self._timeout = timeout
+        self._countBytes = countBytes
+        # Statistics by device names and types of requests
+        self._stats = {}
+        # Types and sending times of requests awaiting responses, and types
+        # of requests whose responses are not read yet, by device names
+        # and request IDs
+        self._pending = {}
+        self._unread = {}
+        self._dumpPath = None
+        self._expireTimer = QtCore.QTimer(self)
+        self._expireTimer.setInterval(min(timeout, 1000))
+        self._expireTimer.timeout.connect(self.expire)
+        self._dumpTimer = QtCore.QTimer(self)
+        self._dumpTimer.timeout.connect(self._dump)
+
+# Private methods:
+    def _get(self, name, request):
+        '''
+        Returns statistics of the given device and type of requests.
+        '''
+        stats = self._stats.setdefault(name, {})
+        if request not in stats:
+            stats[request] = RequestStats()
+        return stats[request]
+
+# Slots:
+    #@QtCore.Slot()
+    def _dump(self):
+        '''
+        Dumps the metrics to the configured file.
+        '''
+        try:
+            self.dump(self._dumpPath)
+        except EnvironmentError, err:
+            log.warning("Dumping metrics to '%s' failed: %s"
+                        % (self._dumpPath, err))
+
+# Public methods:
+    def requestSent(self, dev, id, request):
+        '''
+        Records sending a request of the given ID and type to the device.
+        '''
+        stats = self._get(dev.name, request)
+        stats.sent += 1
+        stats.inFlight += 1
+        self._pending[(dev.name, id)] = (request, time.time())
+        if not self._expireTimer.isActive():
+            self._expireTimer.start()
+
+    def responseReceived(self, dev, id):
+        '''
+        Records receiving a response of the given ID from the device.
+        '''
+        key = (dev.name, id)
+        entry = self._pending.pop(key, None)
+        if entry is None:
+            return
+        request, sent = entry
+        stats = self._get(dev.name, request)
+        stats.inFlight -= 1
+        stats.received += 1
+        stats.times.add((time.time() - sent) * 1000)
+        self._unread[key] = request
+
+    def responseRead(self, dev, id, response):
+        '''
+        Records the status and the size of the response of the given ID
+        read from the device.
+        '''
+        request = self._unread.pop((dev.name, id), None)
+        if request is None:
+            return
+        stats = self._get(dev.name, request)
+        if not getattr(response, "status", True):
+            stats.errors += 1
+        if self._countBytes:
+            try:
+                stats.bytes += len(response.marshal())
+            except Exception, err:
+                log.debug("Cannot count size of response: %s" % err)
+
+    #@QtCore.Slot()
+    def expire(self):
+        '''
+        Counts requests awaiting responses longer than the timeout
+        as timed out.
+        '''
+        deadline = time.time() - self._timeout / 1000.0
+        for key, (request, sent) in self._pending.items():
+            if sent < deadline:
+                del self._pending[key]
+                stats = self._get(key[0], request)
+                stats.inFlight -= 1
+                stats.timeouts += 1
+        if not self._pending:
+            self._expireTimer.stop()
+
+    def forget(self, dev):
+        '''
+        Drops requests of the given device awaiting responses, e.g. when
+        the device is disconnected.
+        '''
+        for key in self._pending.keys():
+            if key[0] == dev.name:
+                request, sent = self._pending.pop(key)
+                self._get(dev.name, request).inFlight -= 1
+        for key in self._unread.keys():
+            if key[0] == dev.name:
+                del self._unread[key]
+
+    def stats(self, name=None):
+        '''
+        Returns a dictionary of statistics dictionaries by device names
+        and types of requests, or by types of requests of the given device.
+        '''
+        if name is not None:
+            return dict((request, stats.dict()) for request, stats
+                        in self._stats.get(name, {}).iteritems())
+        return dict((name, self.stats(name)) for name in self._stats)
+
+    def reset(self):
+        '''
+        Clears all collected statistics.
+        '''
+        self._stats.clear()
+        for name, id in self._pending:
+            self._get(name, self._pending[(name, id)][0]).inFlight += 1
+
+    def dump(self, path):
+        '''
+        Writes the metrics to a JSON file of the given path atomically.
+        '''
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, tmp = tempfile.mkstemp(prefix=".metrics", dir=directory)
+        try:
+            f = os.fdopen(fd, "w")
+            try:
+                json.dump({"time": time.time(), "timeout": self._timeout,
+                           "devices": self.stats()}, f, indent=1,
+                          sort_keys=True)
+            finally:
+                f.close()
+            os.rename(tmp, path)
+        except:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def startDumping(self, path, interval):
+        '''
+        Starts dumping the metrics to the given file every interval
+        in milliseconds.
+        '''
+        self._dumpPath = path
+        self._dumpTimer.start(interval)
+
+    def stopDumping(self):
+        '''
+        Stops dumping the metrics periodically.
+        '''
+        self._dumpTimer.stop()
+
+
+class MetricsDialog(QtCore.QObject):
+    '''
+    A device statistics dialog class.
+    '''
+    _DIALOG_UI = "metrics_dialog.ui"
+    _REFRESH_INTERVAL = 1000
+    _FILTERS = "JSON files (*.json);;All files (*)"
+    # Keys of statistics displayed in columns following the name column
+    _COLUMNS = ("sent", "in_flight", "errors", "timeouts", "mean", "p50",
+                "p90", "p99", "max", "bytes")
+
+    def __init__(self, metrics):
+        QtCore.QObject.__init__(self)
+        elements = utils.loadUi(self._DIALOG_UI, parent=utils.window())
+        self.dialog = elements["Dialog"]
+        self._tree = elements["treeWidgetMetrics"]
+        self._metrics = metrics
+        elements["buttonClose"].clicked.connect(self.dialog.close)
+        elements["buttonReset"].clicked.connect(self._reset)
+        elements["buttonDump"].clicked.connect(self._save)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(self._REFRESH_INTERVAL)
+        self._timer.timeout.connect(self._refresh)
+        self.dialog.finished.connect(self._timer.stop)
+
+# Private methods:
+    def _setItem(self, item, name, stats):
+        '''
+        Displays the given statistics in the item.
+        '''
+        item.setText(0, name)
+        for column, key in enumerate(self._COLUMNS):
+            value = stats.get(key)
+            if value is None:
+                text = ''
+            elif isinstance(value, float):
+                text = "%.1f" % value
+            else:
+                text = str(value)
+            if key == "errors" and value:
+                text = "%s (%.1f%%)" % (text, stats["error_rate"] * 100)
+            elif key == "timeouts" and value:
+                text = "%s (%.1f%%)" % (text, stats["timeout_rate"] * 100)
+            item.setText(column + 1, text)
+            item.setTextAlignment(column + 1, QtCore.Qt.AlignRight)
+
+# Slots:
+    #@QtCore.Slot()
+    def _refresh(self):
+        '''
+        Displays current statistics of devices and their requests.
+        '''
+        stats = self._metrics.stats()
+        items = {}
+        for i in xrange(self._tree.topLevelItemCount()):
+            item = self._tree.topLevelItem(i)
+            items[item.text(0)] = item
+        for name in items.keys():
+            if name not in stats:
+                self._tree.takeTopLevelItem(
+                    self._tree.indexOfTopLevelItem(items.pop(name)))
+        self._tree.setSortingEnabled(False)
+        for name, requests in stats.iteritems():
+            item = items.get(name)
+            if item is None:
+                item = QtGui.QTreeWidgetItem(self._tree)
+            # Totals of all requests of the device
+            total = {}
+            for key in ("sent", "in_flight", "errors", "timeouts", "bytes"):
+                total[key] = sum(request[key]
+                                 for request in requests.itervalues())
+            received = sum(request["received"]
+                           for request in requests.itervalues())
+            total["error_rate"] = (float(total["errors"]) / received
+                                   if received else 0.0)
+            total["timeout_rate"] = (float(total["timeouts"]) / total["sent"]
+                                     if total["sent"] else 0.0)
+            self._setItem(item, name, total)
+            children = {}
+            for i in xrange(item.childCount()):
+                children[item.child(i).text(0)] = item.child(i)
+            for request, values in requests.iteritems():
+                child = children.get(request)
+                if child is None:
+                    child = QtGui.QTreeWidgetItem(item)
+                self._setItem(child, request, values)
+        self._tree.setSortingEnabled(True)
+        for column in xrange(self._tree.columnCount()):
+            self._tree.resizeColumnToContents(column)
+
+    #@QtCore.Slot()
+    def _reset(self):
+        '''
+        Clears collected statistics.
+        '''
+        self._metrics.reset()
+        self._tree.clear()
+        self._refresh()
+
+    #@QtCore.Slot()
+    def _save(self):
+        '''
+        Saves current statistics to a chosen file.
+        '''
+        path = dialogs.runSaveFile(self._FILTERS, "metrics.json")
+        if path is None:
+            return
+        try:
+            self._metrics.dump(path)
+        except EnvironmentError, err:
+            dialogs.runError("Saving statistics to '%s' failed:\n%s"
+                             % (path, err))
+
+# Public methods:
+    def run(self):
+        '''
+        Shows the dialog and refreshes it periodically while it is visible.
+        '''
+        self._refresh()
+        self._timer.start()
+        self.dialog.show()
@@ -41,6 +41,7 @@ from PySide import QtGui
 
 from tadek.core import log
 from tadek.core import config
+from tadek.core import settings
 from tadek.core import utils
 from tadek.engine.testresult import TestStepResult
 from tadek.engine import channels
@@ -48,6 +49,7 @@ from tadek.engine import channels
 import icons
 import dialogs
 from view import View
+from warmup import WarmupCache
 from resulttab import ResultTab
 from consolechannel import ConsoleChannelHelper, ConsoleChannel
 from resultchannel import ResultChannelHelper, ResultChannel
@@ -65,6 +67,13 @@ class Result(View):
     _CONFIG_SECTION_MENU = "menu"
     _CONFIG_SECTION_CONSOLE = "console"
 
+    section = settings.get(viewName(), "warmup", force=True)
+    # Recent result files are read in the background if enabled
+    _warmupEnabled = section.get("enabled", default="No")
+    _warmupSize = section.get("size", default=5)
+    _warmupInterval = section.get("interval", default=60000)
+    del section
+
     # Menus and Tool bar
     _menuFile = (
         "actionOpen",
@@ -106,6 +115,7 @@ class Result(View):
         self._menuRecentFiles = self._menuFile[1]
         self._actionClearMenu.triggered.connect(self._recentFiles.clear)
         self._actionClearMenu.triggered.connect(self._updateRecentFiles)
+        self._warmup = None
 
         # Widgets
         self._treeWidget = self._elements["treeWidgetInfo"]
@@ -154,6 +164,29 @@ class Result(View):
         channels.add(ResultChannel, "_ui_result",
                      result=self._resultChannelHelper)
 
+# Private methods:
+    def _readableChannel(self, path):
+        '''
+        Returns a channel reading result files of the given path extension
+        or None if there is no such channel.
+        '''
+        ext = os.path.splitext(path)[1]
+        for c in channels.get():
+            if (isinstance(c, channels.TestResultFileChannel) and
+                c.fileExt() == ext):
+                return c
+        return None
+
+    def _warmResult(self, path):
+        '''
+        Reads a result file of the given path. Called by the warm-up cache
+        in a worker thread.
+        '''
+        channel = self._readableChannel(path)
+        if channel is None:
+            return None
+        return channel.read(path)
+
 # Slots:
     #@QtCore.Slot()
     def _openDialog(self):
@@ -193,20 +226,19 @@ class Result(View):
         log.debug("Opening recent result file")
 
         path = self.sender().data()
-        ext = os.path.splitext(path)[1]
-        channel = None
-        for c in channels.get():
-            if (isinstance(c, channels.TestResultFileChannel) and
-                c.fileExt() == ext):
-                channel = c
-                break
-        if not channel:
-            dialogs.runWarning("There are no readable channels accepting "
-                               "'%s' files" % ext)
-            return
+        result = None
+        if self._warmup is not None:
+            result = self._warmup.take(path)
+        if result is None:
+            channel = self._readableChannel(path)
+            if not channel:
+                dialogs.runWarning("There are no readable channels accepting "
+                                   "'%s' files" % os.path.splitext(path)[1])
+                return
         try:
-            self.addTab(channel.read(path), os.path.split(path)[1],
-                        tooltip=path)
+            if result is None:
+                result = channel.read(path)
+            self.addTab(result, os.path.split(path)[1], tooltip=path)
         except Exception, ex:
             dialogs.runError("Error occurred while loading result file:\n%s"
                              % str(ex))
@@ -316,6 +348,20 @@ class Result(View):
         '''
         View.load(self)
         self._updateRecentFiles()
+        if self._warmup is None and self._warmupEnabled.getBool():
+            self._warmup = WarmupCache(self._warmResult, self._recentFiles.all,
+                                       self._warmupSize.getInt(),
+                                       self._warmupInterval.getInt())
+            self._warmup.start()
+
+    def unload(self):
+        '''
+        Unloads the view and stops warming up recent results.
+        '''
+        if self._warmup is not None:
+            self._warmup.stop()
+            self._warmup = None
+        View.unload(self)
 
     def addTab(self, result, title, tooltip=None, select=False,
                closable=True):
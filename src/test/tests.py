@@ -35,6 +35,11 @@
 ################################################################################
 
 import os
+import copy
+import array
+import cPickle
+import tempfile
+import threading
 
 from PySide import QtCore
 from PySide import QtGui
@@ -46,19 +51,778 @@ from tadek.core import location
 from tadek.engine.loader import TestLoader
 from tadek.engine.testdefs import TestSuite, TestCase
 
-from utils import window, viewName
+from utils import window, viewName, cachePath
 from dialogs import runWarning, runQuestion
 from testdialogs import LoadingErrorDialog
 
 
-class TestItem(QtGui.QTreeWidgetItem):
+class TestNode(object):
     '''
-    Class of test tree items.
+    A plain node of a tree of discovered tests.
     '''
+    __slots__ = ("name", "testName", "kind", "children")
 
-    def __init__(self, *args, **kwargs):
-        self.testName = kwargs.pop("testName", None) 
-        QtGui.QTreeWidgetItem.__init__(self, *args, **kwargs)
+    def __init__(self, name, testName, kind):
+        self.name = name
+        self.testName = testName
+        self.kind = kind
+        self.children = []
+
+
+def _suiteNode(name, suite, parentName):
+    '''
+    Returns a node of the given test suite or test case.
+    '''
+    if name is None:
+        name = suite.__class__.__name__
+    node = TestNode(name, ".".join((parentName, name)), None)
+    if isinstance(suite, TestSuite):
+        node.kind = "suite"
+        for name, childSuite in suite:
+            node.children.append(_suiteNode(name, childSuite, node.testName))
+    elif isinstance(suite, TestCase):
+        node.kind = "case"
+    else:
+        raise TypeError()
+    return node
+
+
+def _treeNodes(tree, parent):
+    '''
+    Appends nodes of a tree loaded by TestLoader to children of the given
+    node. Returns False if the tree represents an empty module.
+    '''
+    for key in sorted(tree):
+        value = tree[key]
+        if key is None and isinstance(value, list):
+            if not value and len(tree) == 1:
+                return False
+            for suite in value:
+                parent.children.append(_suiteNode(None, suite,
+                                                  parent.testName))
+            if value:
+                r = value[-1].result()
+                if os.path.split(r.path)[1] != r.id.split(".")[-2]:
+                    parent.kind = "module"
+        elif isinstance(value, dict):
+            node = TestNode(key, ".".join((parent.testName, key))
+                                 if parent.testName is not None else key,
+                            "directory")
+            if _treeNodes(value, node):
+                parent.children.append(node)
+    return True
+
+
+def _locationStamp(path, paths=None):
+    '''
+    Returns a tuple of paths, modification times and sizes of Python files
+    in the given location. Paths of the files and of directories are also
+    appended to the given paths list.
+    '''
+    stamp = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        if paths is not None:
+            paths.append(root)
+        for name in sorted(files):
+            if not name.endswith(".py"):
+                continue
+            filePath = os.path.join(root, name)
+            try:
+                stat = os.stat(filePath)
+            except OSError:
+                continue
+            stamp.append((filePath, stat.st_mtime, stat.st_size))
+            if paths is not None:
+                paths.append(filePath)
+    return tuple(stamp)
+
+
+class DiscoveryCache(object):
+    '''
+    A persistent cache of tests discovered in sets of enabled locations,
+    valid as long as stamps of files in the locations do not change.
+    '''
+    # Maximum number of cached sets of locations
+    _SIZE = 16
+
+    def __init__(self, path):
+        self._path = path
+        # Triples of locations, their stamps and nodes, the recent last
+        self._entries = None
+
+    def _load(self):
+        '''
+        Reads the cache file if it is not read yet.
+        '''
+        if self._entries is not None:
+            return
+        self._entries = []
+        if not os.path.exists(self._path):
+            return
+        try:
+            f = open(self._path, "rb")
+            try:
+                self._entries = cPickle.load(f)
+            finally:
+                f.close()
+        except Exception, ex:
+            log.warning("Cannot read test discovery cache '%s': %s"
+                        % (self._path, ex))
+
+    def _save(self):
+        '''
+        Writes the cache file atomically.
+        '''
+        directory = os.path.dirname(self._path)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            fd, tmp = tempfile.mkstemp(prefix=".tests", dir=directory)
+            f = os.fdopen(fd, "wb")
+            try:
+                cPickle.dump(self._entries, f, cPickle.HIGHEST_PROTOCOL)
+            finally:
+                f.close()
+            os.rename(tmp, self._path)
+        except EnvironmentError, ex:
+            log.warning("Cannot write test discovery cache '%s': %s"
+                        % (self._path, ex))
+
+# Public methods:
+    def get(self, locations, stamps):
+        '''
+        Returns cached nodes of tests of the given locations or None
+        if they are not cached or the stamps of the locations differ.
+        '''
+        self._load()
+        for entry in self._entries:
+            if entry[0] == locations:
+                return entry[2] if entry[1] == stamps else None
+        return None
+
+    def put(self, locations, stamps, nodes):
+        '''
+        Stores nodes of tests of the given locations with their stamps.
+        '''
+        self._load()
+        self._entries = [entry for entry in self._entries
+                         if entry[0] != locations][-(self._SIZE - 1):]
+        self._entries.append((locations, stamps, nodes))
+        self._save()
+
+
+class TestDiscovery(QtCore.QObject):
+    '''
+    Discovers tests of the given enabled locations in a worker thread
+    and emits the 'finished' signal with a list of top-level nodes
+    and a list of loading errors. Tests of locations whose files did not
+    change are taken from the given cache without importing them. Paths
+    of directories and files of the locations are stored in 'paths'
+    and 'cached' tells if the tests were taken from the cache.
+    '''
+    # Signals:
+    finished = QtCore.Signal(object, object)
+
+    def __init__(self, locations, cache=None):
+        QtCore.QObject.__init__(self)
+        self._locations = tuple(sorted(locations))
+        self._cache = cache
+        self.paths = []
+        self.cached = False
+
+    def _run(self):
+        '''
+        Loads the tree of tests and converts it to nodes.
+        '''
+        root = TestNode(None, None, None)
+        errors = []
+        try:
+            stamps = tuple(_locationStamp(path, self.paths)
+                           for path in self._locations)
+            if self._cache is not None:
+                nodes = self._cache.get(self._locations, stamps)
+                if nodes is not None:
+                    log.debug("Discovered tests taken from cache")
+                    self.cached = True
+                    self.finished.emit(nodes, errors)
+                    return
+            tree, errors = TestLoader().loadTree()
+            _treeNodes(tree, root)
+            if self._cache is not None and not errors:
+                self._cache.put(self._locations, stamps, root.children)
+        except Exception, ex:
+            log.exception(ex)
+        self.finished.emit(root.children, errors)
+
+    def start(self):
+        '''
+        Starts discovering tests in a worker thread.
+        '''
+        thread = threading.Thread(target=self._run, name="TestDiscovery")
+        thread.daemon = True
+        thread.start()
+
+
+class BitArray(object):
+    '''
+    A fixed-size array of bits.
+    '''
+    __slots__ = ("_bytes",)
+
+    def __init__(self, size):
+        self._bytes = bytearray((size + 7) >> 3)
+
+    def __getitem__(self, i):
+        return bool(self._bytes[i >> 3] & (1 << (i & 7)))
+
+    def __setitem__(self, i, value):
+        if value:
+            self._bytes[i >> 3] |= 1 << (i & 7)
+        else:
+            self._bytes[i >> 3] &= ~(1 << (i & 7)) & 0xff
+
+    def resize(self, size):
+        '''
+        Grows the array to the given size with cleared bits.
+        '''
+        self._bytes.extend(bytearray(((size + 7) >> 3) - len(self._bytes)))
+
+
+class TestModel(QtCore.QAbstractItemModel):
+    '''
+    A model of the tests tree. Nodes are stored in breadth-first order
+    in flat arrays, so children of a node are contiguous, and their check
+    states are stored in bit arrays along with numbers of checked and
+    partially checked children of each node. Children are reported to views
+    only after they are fetched. Refreshes append new nodes to the arrays
+    and keep children of changed nodes in separate lists, so IDs of nodes
+    and indexes held by views remain valid until removed nodes outnumber
+    the others and the arrays are compacted.
+    '''
+    # Role of full names of tests
+    TestNameRole = QtCore.Qt.UserRole
+
+    _KINDS = ("directory", "module", "suite", "case")
+    _KIND_IDS = dict((kind, i) for i, kind in enumerate(_KINDS))
+    _ICONS = {
+        "directory": QtGui.QIcon(":/test/icons/folder-grey.png"),
+        "module":    QtGui.QIcon(":/test/icons/text-x-python.png"),
+        "suite":     QtGui.QIcon(":/test/icons/source_moc.png"),
+        "case":      QtGui.QIcon(":/test/icons/inode-blockdevice.png")
+    }
+
+    def __init__(self, parent=None):
+        QtCore.QAbstractItemModel.__init__(self, parent)
+        self._clear(0)
+
+# Private methods:
+    def _clear(self, size):
+        '''
+        Allocates storage of the given number of nodes.
+        '''
+        self._names = []
+        self._kinds = bytearray()
+        self._parents = array.array('i')
+        self._first = array.array('i')
+        self._counts = array.array('i')
+        self._roots = 0
+        self._fetched = BitArray(size)
+        self._checked = BitArray(size)
+        self._partial = BitArray(size)
+        self._checkedChildren = array.array('i', [0]) * size
+        self._partialChildren = array.array('i', [0]) * size
+        # Lists of children of changed nodes, the roots under -1, and rows
+        # of nodes in the lists
+        self._lists = {}
+        self._rows = {}
+        # Number of removed nodes left in the arrays
+        self._dead = 0
+
+    def _row(self, id):
+        '''
+        Returns the row of the given node under its parent.
+        '''
+        row = self._rows.get(id)
+        if row is not None:
+            return row
+        parent = self._parents[id]
+        return id - self._first[parent] if parent >= 0 else id
+
+    def _index(self, id):
+        '''
+        Returns an index of the given node.
+        '''
+        return self.createIndex(self._row(id), 0, id)
+
+    def _children(self, id):
+        '''
+        Returns a sequence of children of the given node or of the roots
+        if the node is -1.
+        '''
+        children = self._lists.get(id)
+        if children is not None:
+            return children
+        if id < 0:
+            return xrange(self._roots)
+        return xrange(self._first[id], self._first[id] + self._counts[id])
+
+    def _child(self, id, row):
+        '''
+        Returns the child of the given row under the given node or the root
+        of the row if the node is -1.
+        '''
+        children = self._lists.get(id)
+        if children is not None:
+            return children[row]
+        return self._first[id] + row if id >= 0 else row
+
+    def _setChildren(self, id, children):
+        '''
+        Stores the given array of children of the given node.
+        '''
+        self._lists[id] = children
+        for row, child in enumerate(children):
+            self._rows[child] = row
+        if id < 0:
+            self._roots = len(children)
+        else:
+            self._counts[id] = len(children)
+
+    def _state(self, id):
+        '''
+        Returns the check state of the given node.
+        '''
+        if self._checked[id]:
+            return QtCore.Qt.Checked
+        if self._partial[id]:
+            return QtCore.Qt.PartiallyChecked
+        return QtCore.Qt.Unchecked
+
+    def _setState(self, id, checked, partial):
+        '''
+        Sets the check state of the given node and updates counters of its
+        parent. Returns True if the state changed.
+        '''
+        wasChecked, wasPartial = self._checked[id], self._partial[id]
+        if checked == wasChecked and partial == wasPartial:
+            return False
+        self._checked[id] = checked
+        self._partial[id] = partial
+        parent = self._parents[id]
+        if parent >= 0:
+            self._checkedChildren[parent] += checked - wasChecked
+            self._partialChildren[parent] += partial - wasPartial
+        return True
+
+    def _updateState(self, id):
+        '''
+        Updates the check state of the given node from counters of its
+        children. Returns True if the state changed.
+        '''
+        checked = self._checkedChildren[id]
+        if checked == self._counts[id]:
+            return self._setState(id, True, False)
+        return self._setState(id, False,
+                              bool(checked or self._partialChildren[id]))
+
+    def _setSubtree(self, id, checked):
+        '''
+        Sets the check state of the given node and its descendants.
+        Subtrees already in the state are skipped. Returns True if the state
+        of the node changed.
+        '''
+        if not self._setState(id, checked, False):
+            return False
+        nodes = [id]
+        while nodes:
+            id = nodes.pop()
+            count = self._counts[id]
+            if not count:
+                continue
+            self._checkedChildren[id] = count if checked else 0
+            self._partialChildren[id] = 0
+            for child in self._children(id):
+                if self._checked[child] != checked or self._partial[child]:
+                    self._checked[child] = checked
+                    self._partial[child] = False
+                    nodes.append(child)
+            if self._fetched[id]:
+                self.dataChanged.emit(self._index(self._child(id, 0)),
+                                      self._index(self._child(id,
+                                                              count - 1)))
+        return True
+
+    def _append(self, nodes, parent):
+        '''
+        Appends the given test nodes with their descendants to the arrays
+        in breadth-first order as children of the given node. Returns the ID
+        of the first appended node.
+        '''
+        start = len(self._names)
+        queue = list(nodes)
+        self._parents.extend([parent] * len(queue))
+        i = 0
+        while i < len(queue):
+            node = queue[i]
+            self._names.append(node.name)
+            self._kinds.append(self._KIND_IDS[node.kind])
+            self._first.append(start + len(queue))
+            self._counts.append(len(node.children))
+            self._parents.extend([start + i] * len(node.children))
+            queue.extend(node.children)
+            i += 1
+        size = len(self._names)
+        for bits in (self._fetched, self._checked, self._partial):
+            bits.resize(size)
+        grow = size - len(self._checkedChildren)
+        self._checkedChildren.extend([0] * grow)
+        self._partialChildren.extend([0] * grow)
+        return start
+
+    def _remove(self, id, child):
+        '''
+        Detaches the given child from the given node. The child and its
+        descendants are left in the arrays as removed nodes.
+        '''
+        if id >= 0:
+            self._checkedChildren[id] -= self._checked[child]
+            self._partialChildren[id] -= self._partial[child]
+        self._rows.pop(child, None)
+        nodes = [child]
+        while nodes:
+            child = nodes.pop()
+            nodes.extend(self._children(child))
+            self._lists.pop(child, None)
+            self._dead += 1
+
+    def _patch(self, id, nodes):
+        '''
+        Removes and inserts rows under the given node, so its children
+        match the given test nodes. Children kept in the same order keep
+        their IDs and states, and new ones inherit the state of a checked
+        node. Returns pairs of kept children and children of their test
+        nodes.
+        '''
+        old = self._children(id)
+        positions = dict((node.name, i) for i, node in enumerate(nodes))
+        kept = []
+        last = -1
+        for child in old:
+            i = positions.get(self._names[child])
+            if i is not None and i > last:
+                kept.append((child, i))
+                last = i
+        notify = id < 0 or self._fetched[id]
+        parent = self._index(id) if id >= 0 else QtCore.QModelIndex()
+        if len(kept) != len(old) or len(kept) != len(nodes):
+            children = array.array('i', old)
+            keptIds = set(child for child, i in kept)
+            row = len(children)
+            while row > 0:
+                row -= 1
+                if children[row] in keptIds:
+                    continue
+                last = row
+                while row > 0 and children[row - 1] not in keptIds:
+                    row -= 1
+                if notify:
+                    self.beginRemoveRows(parent, row, last)
+                for child in children[row:last + 1]:
+                    self._remove(id, child)
+                del children[row:last + 1]
+                self._setChildren(id, children)
+                if notify:
+                    self.endRemoveRows()
+            keptRows = set(i for child, i in kept)
+            checked = id >= 0 and self._checked[id]
+            row = 0
+            while row < len(nodes):
+                if row in keptRows:
+                    row += 1
+                    continue
+                first = row
+                while row < len(nodes) and row not in keptRows:
+                    row += 1
+                start = self._append(nodes[first:row], id)
+                if checked:
+                    for child in xrange(start, len(self._names)):
+                        self._checked[child] = True
+                        self._checkedChildren[child] = self._counts[child]
+                    self._checkedChildren[id] += row - first
+                if notify:
+                    self.beginInsertRows(parent, first, row - 1)
+                children[first:first] = array.array('i',
+                                                    xrange(start,
+                                                           start + row - first))
+                self._setChildren(id, children)
+                if notify:
+                    self.endInsertRows()
+        for child, i in kept:
+            kind = self._KIND_IDS[nodes[i].kind]
+            if self._kinds[child] != kind:
+                self._kinds[child] = kind
+                if notify:
+                    index = self._index(child)
+                    self.dataChanged.emit(index, index)
+        return [(child, nodes[i].children) for child, i in kept]
+
+    def _compact(self):
+        '''
+        Drops removed nodes from the arrays and stores children of each node
+        contiguously again, updating indexes held by views.
+        '''
+        self.layoutAboutToBeChanged.emit()
+        order = list(self._children(-1))
+        i = 0
+        while i < len(order):
+            order.extend(self._children(order[i]))
+            i += 1
+        ids = dict((old, new) for new, old in enumerate(order))
+        size = len(order)
+        names = []
+        kinds = bytearray()
+        parents = array.array('i')
+        first = array.array('i')
+        counts = array.array('i')
+        fetched = BitArray(size)
+        checked = BitArray(size)
+        partial = BitArray(size)
+        position = len(self._children(-1))
+        for new, old in enumerate(order):
+            names.append(self._names[old])
+            kinds.append(self._kinds[old])
+            parents.append(ids.get(self._parents[old], -1))
+            first.append(position)
+            counts.append(self._counts[old])
+            position += self._counts[old]
+            fetched[new] = self._fetched[old]
+            checked[new] = self._checked[old]
+            partial[new] = self._partial[old]
+        self._checkedChildren = array.array('i', (self._checkedChildren[old]
+                                                  for old in order))
+        self._partialChildren = array.array('i', (self._partialChildren[old]
+                                                  for old in order))
+        self._names, self._kinds, self._parents = names, kinds, parents
+        self._first, self._counts = first, counts
+        self._fetched, self._checked, self._partial = fetched, checked, partial
+        self._lists = {}
+        self._rows = {}
+        self._dead = 0
+        indexes = self.persistentIndexList()
+        self.changePersistentIndexList(indexes,
+            [self._index(ids[index.internalId()])
+             if index.internalId() in ids else QtCore.QModelIndex()
+             for index in indexes])
+        self.layoutChanged.emit()
+
+# Public methods:
+    def setNodes(self, nodes):
+        '''
+        Updates contents of the model to the given test nodes. Only rows
+        of added and removed tests are inserted and removed, so remaining
+        tests stay checked and expanded in views. New tests inherit
+        the state of a checked parent.
+        '''
+        if not self._roots:
+            self.beginResetModel()
+            self._clear(0)
+            self._roots = len(nodes)
+            self._append(nodes, -1)
+            self.endResetModel()
+            return
+        patched = []
+        queue = [(-1, nodes)]
+        while queue:
+            id, nodes = queue.pop()
+            patched.append(id)
+            queue.extend(self._patch(id, nodes))
+        # States of changed nodes are updated from the bottom up
+        for id in reversed(patched):
+            if id < 0 or not self._counts[id] or not self._updateState(id):
+                continue
+            parent = self._parents[id]
+            if parent < 0 or self._fetched[parent]:
+                index = self._index(id)
+                self.dataChanged.emit(index, index)
+        if self._dead > len(self._names) - self._dead:
+            self._compact()
+
+    def fetchAll(self):
+        '''
+        Makes children of all nodes available to views at once.
+        '''
+        self.beginResetModel()
+        for id in xrange(len(self._names)):
+            self._fetched[id] = True
+        self.endResetModel()
+
+    def testName(self, id):
+        '''
+        Returns the full test name of the given node.
+        '''
+        names = []
+        while id >= 0:
+            names.append(self._names[id])
+            id = self._parents[id]
+        return ".".join(reversed(names))
+
+    def find(self, testName):
+        '''
+        Returns an index of the test of the given full name, fetching its
+        ancestors if needed, or an invalid index if there is no such test.
+        '''
+        nodes = self._children(-1)
+        parent = None
+        for name in testName.split("."):
+            for id in nodes:
+                if self._names[id] == name:
+                    break
+            else:
+                return QtCore.QModelIndex()
+            if parent is not None and not self._fetched[parent]:
+                self.fetchMore(self._index(parent))
+            parent = id
+            nodes = self._children(id)
+        return self._index(parent)
+
+    def checkedNames(self):
+        '''
+        Returns full names of checked tests without descendants of checked
+        tests. Only partially checked nodes are descended into and scanning
+        their children stops after the counted ones are found.
+        '''
+        names = []
+        nodes = list(reversed(self._children(-1)))
+        while nodes:
+            id = nodes.pop()
+            if self._checked[id]:
+                names.append(self.testName(id))
+            elif self._partial[id]:
+                left = self._checkedChildren[id] + self._partialChildren[id]
+                children = []
+                for child in self._children(id):
+                    if self._checked[child] or self._partial[child]:
+                        children.append(child)
+                        left -= 1
+                        if not left:
+                            break
+                nodes.extend(reversed(children))
+        return names
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        '''
+        Returns an index of the given row under the given parent.
+        '''
+        if column != 0 or row < 0 or row >= self.rowCount(parent):
+            return QtCore.QModelIndex()
+        id = parent.internalId() if parent.isValid() else -1
+        return self.createIndex(row, 0, self._child(id, row))
+
+    def parent(self, index):
+        '''
+        Returns an index of the parent of the given index.
+        '''
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        parent = self._parents[index.internalId()]
+        if parent < 0:
+            return QtCore.QModelIndex()
+        return self._index(parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        '''
+        Returns the number of fetched children of the given parent.
+        '''
+        if not parent.isValid():
+            return self._roots
+        id = parent.internalId()
+        return self._counts[id] if self._fetched[id] else 0
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        '''
+        Returns the number of columns.
+        '''
+        return 1
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        '''
+        Returns True if the given parent has children, fetched or not.
+        '''
+        if not parent.isValid():
+            return self._roots > 0
+        return self._counts[parent.internalId()] > 0
+
+    def canFetchMore(self, parent):
+        '''
+        Returns True if children of the given parent are not fetched yet.
+        '''
+        if not parent.isValid():
+            return False
+        id = parent.internalId()
+        return self._counts[id] > 0 and not self._fetched[id]
+
+    def fetchMore(self, parent):
+        '''
+        Makes children of the given parent available to views.
+        '''
+        if not self.canFetchMore(parent):
+            return
+        id = parent.internalId()
+        self.beginInsertRows(parent, 0, self._counts[id] - 1)
+        self._fetched[id] = True
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        '''
+        Returns the title of the column.
+        '''
+        if (orientation == QtCore.Qt.Horizontal
+            and role == QtCore.Qt.DisplayRole):
+            return "Test"
+        return None
+
+    def flags(self, index):
+        '''
+        Returns flags of the given item.
+        '''
+        return (QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsUserCheckable |
+                QtCore.Qt.ItemIsSelectable)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        '''
+        Returns data of the given role stored under the given index.
+        '''
+        if not index.isValid():
+            return None
+        id = index.internalId()
+        if role == QtCore.Qt.DisplayRole:
+            return self._names[id]
+        if role == QtCore.Qt.CheckStateRole:
+            return self._state(id)
+        if role == QtCore.Qt.DecorationRole:
+            return self._ICONS[self._KINDS[self._kinds[id]]]
+        if role == self.TestNameRole:
+            return self.testName(id)
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        '''
+        Checks or unchecks the given test with its descendants and updates
+        states of its ancestors.
+        '''
+        if not index.isValid() or role != QtCore.Qt.CheckStateRole:
+            return False
+        id = index.internalId()
+        if not self._setSubtree(id, value == QtCore.Qt.Checked):
+            return True
+        self.dataChanged.emit(index, index)
+        parent = self._parents[id]
+        while parent >= 0 and self._updateState(parent):
+            index = self._index(parent)
+            self.dataChanged.emit(index, index)
+            parent = self._parents[parent]
+        return True
 
 
 class Tests(QtCore.QObject):
@@ -67,18 +831,26 @@ class Tests(QtCore.QObject):
     '''
     _TESTCASES_DIR = "testcases"
 
+    # Signals:
+    loading = QtCore.Signal(bool)
+
     _CONFIG_NAME = viewName()
     _CONFIG_SECTION_LOCATIONS = "locations"
     _expandOnRefresh = settings.get(_CONFIG_NAME, "options",
                                     "expand_on_refresh", default="No",
                                     force=True)
-
-    _ICONS = {
-        "directory": QtGui.QIcon(":/test/icons/folder-grey.png"),
-        "module":    QtGui.QIcon(":/test/icons/text-x-python.png"),
-        "suite":     QtGui.QIcon(":/test/icons/source_moc.png"),
-        "case":      QtGui.QIcon(":/test/icons/inode-blockdevice.png")
-    }
+    # Discovered tests are cached between refreshes and sessions if enabled
+    _cacheEnabled = settings.get(_CONFIG_NAME, "discovery", "cache",
+                                 default="Yes", force=True)
+    _CACHE_FILE = cachePath("tests.cache")
+    # Enabled locations are refreshed automatically when their files change
+    _watchEnabled = settings.get(_CONFIG_NAME, "discovery", "watch",
+                                 default="Yes", force=True)
+    _watchDelay = settings.get(_CONFIG_NAME, "discovery", "watch_delay",
+                               default=500, force=True)
+    # Loaded tests are reused while their locations do not change if enabled
+    _reuseEnabled = settings.get(_CONFIG_NAME, "discovery", "reuse_loaded",
+                                 default="Yes", force=True)
 
     def __init__(self, locsTree, testsTree, modelsTree):
         '''
@@ -89,11 +861,31 @@ class Tests(QtCore.QObject):
         self._locsTree = locsTree
         self._testsTree = testsTree
         self._modelsTree = modelsTree
+        self._model = TestModel(self)
+        self._testsTree.setModel(self._model)
         self._locsTree.itemChanged.connect(self._updateLocations)
-        self._testsTree.itemChanged.connect(self._updateCheckboxes)
         self._loader = TestLoader()
         self._loaded = False
         self._locItems = {}
+        self._discovery = None
+        self._cache = (DiscoveryCache(self._CACHE_FILE)
+                       if self._cacheEnabled.getBool() else None)
+        self._discovering = False
+        self._refreshPending = False
+        # Names of the last loaded tests, stamps of their locations and
+        # an unused copy of the loaded tests
+        self._lastLoaded = None
+        # Errors of automatic refreshes are logged instead of displayed
+        self._quiet = True
+        self._watcher = None
+        if self._watchEnabled.getBool():
+            self._watcher = QtCore.QFileSystemWatcher(self)
+            self._watcher.fileChanged.connect(self._locationChanged)
+            self._watcher.directoryChanged.connect(self._locationChanged)
+            self._watchTimer = QtCore.QTimer(self)
+            self._watchTimer.setSingleShot(True)
+            self._watchTimer.setInterval(self._watchDelay.getInt())
+            self._watchTimer.timeout.connect(self._discover)
         self.loadState()
 
 # Private methods:
@@ -119,19 +911,55 @@ class Tests(QtCore.QObject):
         Manipulates expansion states of items in the tests tree. If selected is
         True (default), then only selected items are affected.
         '''
-        def expandWithChildren(item, state):
-            item.setExpanded(state)
-            for i in xrange(item.childCount()):
-                expandWithChildren(item.child(i), state)
+        def expandWithChildren(index, state):
+            self._testsTree.setExpanded(index, state)
+            if state:
+                self._model.fetchMore(index)
+            for row in xrange(self._model.rowCount(index)):
+                expandWithChildren(self._model.index(row, 0, index), state)
 
         if selected:
-            for item in self._testsTree.selectedItems():              
-                expandWithChildren(item, state)
+            for index in self._testsTree.selectionModel().selectedRows():
+                expandWithChildren(index, state)
+        elif state:
+            self._model.fetchAll()
+            self._testsTree.expandAll()
         else:
-            for i in xrange(self._testsTree.topLevelItemCount()): 
-                expandWithChildren(self._testsTree.topLevelItem(i), state)
+            self._testsTree.collapseAll()
         self._testsTree.resizeColumnToContents(0)
 
+    def _setTests(self, nodes):
+        '''
+        Fills the tests tree with the given nodes. Only rows of added
+        and removed tests change, so expanded items remain expanded and
+        checked items remain checked.
+        '''
+        self._model.setNodes(nodes)
+        self._testsTree.resizeColumnToContents(0)
+
+    def _watch(self, paths):
+        '''
+        Replaces paths watched for changes with the given ones.
+        '''
+        if self._watcher is None:
+            return
+        watched = self._watcher.files() + self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+        if paths:
+            self._watcher.addPaths(paths)
+
+    def _keepLoaded(self, names, stamps, tests):
+        '''
+        Keeps a copy of the given loaded tests for the next run of the same
+        tests, so state of the run does not leak into the next one.
+        '''
+        try:
+            self._lastLoaded = (names, stamps, copy.deepcopy(tests))
+        except Exception, ex:
+            log.debug("Cannot copy loaded test cases: %s" % ex)
+            self._lastLoaded = None
+
     def _updateModels(self):
         '''
         Refreshes the models tree.
@@ -185,22 +1013,24 @@ class Tests(QtCore.QObject):
     def getCheckedTests(self):
         '''
         Loads checked tests cases and returns them in a list on success
-        or None on failure.
+        or None on failure. Unused copies of tests loaded last time are
+        returned if the same tests are checked and files of the enabled
+        locations did not change.
         '''
-        def findCheckedNames(tests, item):
-            if item.checkState(0) == QtCore.Qt.Checked:
-                tests.append(item.testName)
-                return
-            elif item.checkState(0) == QtCore.Qt.PartiallyChecked:
-                for i in xrange(item.childCount()):
-                    findCheckedNames(tests, item.child(i))
-        
-        names = []
-        for i in xrange(self._testsTree.topLevelItemCount()):
-            findCheckedNames(names, self._testsTree.topLevelItem(i))
+        names = self._model.checkedNames()
         if not names:
             runWarning("Select some test cases first")
             return names
+        stamps = None
+        if self._reuseEnabled.getBool():
+            stamps = tuple(_locationStamp(path)
+                           for path in sorted(location.get(enabled=True)))
+            if (self._lastLoaded is not None
+                and self._lastLoaded[:2] == (names, stamps)):
+                log.debug("Reusing loaded test cases")
+                tests = self._lastLoaded[2]
+                self._keepLoaded(names, stamps, tests)
+                return tests
         tests, errors = self._loader.loadFromNames(*names)
         if errors:
             if self._loaded:
@@ -208,76 +1038,76 @@ class Tests(QtCore.QObject):
                                             "test cases", errors)
                 dialog.run()
                 return []
+        elif stamps is not None:
+            self._keepLoaded(names, stamps, tests)
 
         return tests
 
     #@QtCore.Slot()
     def refresh(self):
         '''
-        Clears and fills the tests tree and the models tree with contents from
-        currently enabled locations.
-        '''
-        def makeItem(parent):
-            item = TestItem(parent)
-            item.setFlags(QtCore.Qt.ItemIsEnabled |
-                          QtCore.Qt.ItemIsUserCheckable |
-                          QtCore.Qt.ItemIsSelectable)
-            item.setCheckState(0, QtCore.Qt.Unchecked)
-            return item
-
-        def buildSuite(name, suite, parent):
-            item = makeItem(parent)
-            item.setText(0,
-                         name if name is not None else suite.__class__.__name__)
-            item.testName = ".".join((item.parent().testName, item.text(0)))
-            if isinstance(suite, TestSuite):
-                item.setIcon(0, self._ICONS["suite"])
-                for name, childSuite in suite:
-                    buildSuite(name, childSuite, item)
-            elif isinstance(suite, TestCase):
-                item.setIcon(0, self._ICONS["case"])
-            else:
-                raise TypeError()
-
-        def buildTree(tree, parent):
-            for key in sorted(tree):
-                value = tree[key]
-                if key is None and isinstance(value, list):
-                    if not value and len(tree) == 1:
-                        if parent.parent() is not None:
-                            parent.parent().removeChild(parent)
-                        else:
-                            self._testsTree.takeTopLevelItem(
-                                self._testsTree.indexOfTopLevelItem(parent))
-                        continue
-                    suite = None
-                    for suite in value:
-                        buildSuite(None, suite, parent)
-                    if value:
-                        r = suite.result()
-                        if os.path.split(r.path)[1] != r.id.split(".")[-2]:
-                            parent.setIcon(0, self._ICONS["module"])
-                elif isinstance(value, dict):
-                    item = makeItem(parent)
-                    item.setText(0, key)
-                    item.setIcon(0, self._ICONS["directory"])
-                    item.testName = (".".join((item.parent().testName, key))
-                                      if item.parent() is not None else key)
-                    buildTree(value, item)
-
-        self._testsTree.clear()
-        tree, errors = self._loader.loadTree()
+        Starts filling the tests tree and the models tree with contents from
+        currently enabled locations. Tests are discovered in the background
+        and refreshes requested meanwhile are coalesced into one.
+        '''
+        self._quiet = False
+        self._discover()
+
+    #@QtCore.Slot()
+    def _discover(self):
+        '''
+        Starts discovering tests of enabled locations in the background.
+        '''
+        if self._discovering:
+            self._refreshPending = True
+            return
+        self._discovering = True
+        self._refreshPending = False
+        log.debug("Discovering tests in background")
+        self.loading.emit(True)
+        self._testsTree.setCursor(QtCore.Qt.BusyCursor)
+        self._discovery = TestDiscovery(location.get(enabled=True),
+                                        self._cache)
+        self._discovery.finished.connect(self._discovered,
+                                         type=QtCore.Qt.QueuedConnection)
+        self._discovery.start()
+
+    #@QtCore.Slot(object, object)
+    def _discovered(self, nodes, errors):
+        '''
+        Displays discovered tests, or discovers them again if locations
+        changed in the meantime.
+        '''
+        self._discovering = False
+        if self._refreshPending:
+            self._discover()
+            return
+        self._testsTree.unsetCursor()
+        self.loading.emit(False)
+        self._watch(self._discovery.paths)
+        quiet, self._quiet = self._quiet, True
         if errors:
-            if self._loaded:
+            if quiet:
+                log.warning("Errors occurred while loading test cases:\n%s"
+                            % "\n".join(error.traceback for error in errors))
+            elif self._loaded:
                 dialog = LoadingErrorDialog("Errors occurred while loading "
                                             "test cases", errors)
                 dialog.run()
-        buildTree(tree, self._testsTree)
-        self._testsTree.resizeColumnToContents(0)
+        self._setTests(nodes)
         if self._expandOnRefresh.getBool():
             self.expandAll()
         self._updateModels()
 
+    #@QtCore.Slot(str)
+    def _locationChanged(self, path):
+        '''
+        Schedules an automatic refresh after a watched path changed.
+        Changes following in quick succession are coalesced into one.
+        '''
+        log.debug("Test location changed: '%s'" % path)
+        self._watchTimer.start()
+
     #@QtCore.Slot()
     def expandSelected(self):
         '''
@@ -324,34 +1154,6 @@ class Tests(QtCore.QObject):
             location.disable(item.text(0))
         self.refresh()
 
-    #@QtCore.Slot(TestItem, int)
-    def _updateCheckboxes(self, item, column):
-        '''
-        Updates states of check boxes in the tests tree in three-state manner. 
-        '''
-        def updateChildren(item, state):
-            item.setCheckState(0, state)
-            for i in xrange(item.childCount()):
-                updateChildren(item.child(i), state)
-
-        if item is not self._testsTree.currentItem():
-            return
-        updateChildren(item, item.checkState(0))
-        parent = item.parent()
-        while parent is not None:
-            states = [parent.child(i).checkState(0)
-                      for i in xrange(parent.childCount())]
-            if (len(filter(lambda s: s == QtCore.Qt.Checked, states))
-                == len(states)):
-                state = QtCore.Qt.Checked
-            elif (len(filter(lambda s: s == QtCore.Qt.Unchecked, states))
-                  == len(states)):
-                state = QtCore.Qt.Unchecked
-            else:
-                state = QtCore.Qt.PartiallyChecked
-            parent.setCheckState(0, state)
-            parent = parent.parent()
-
 # Public methods:
     def saveState(self):
         '''
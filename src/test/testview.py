@@ -46,7 +46,7 @@ from tadek.engine.runner import TestRunner
 import icons
 from view import View
 from tests import Tests
-from devices import Device
+from devices import Device, HealthCheck
 from utils import viewName
 from dialogs import runWarning, runQuestion
 from testdialogs import ReportDialog
@@ -126,6 +126,12 @@ class TestDeviceList(QtCore.QObject):
         self._tree.resizeColumnToContents(0)
         self._tree.resizeColumnToContents(1)
 
+    def contains(self, device):
+        '''
+        Returns True if given device is on the list.
+        '''
+        return device.name in self._dict
+
     def getChecked(self):
         '''
         Returns a list of currently checked devices.
@@ -156,6 +162,13 @@ class Test(View):
     _checkOnConnect = settings.get(NAME, "options", "check_on_connect",
                                    default="Yes", force=True)
 
+    section = settings.get(NAME, "preflight", force=True)
+    # Checked devices are pinged before tests are started if enabled
+    _preflightEnabled = section.get("enabled", default="Yes")
+    _preflightDeadline = section.get("deadline", default=3000)
+    _preflightExclude = section.get("exclude", default="Yes")
+    del section
+
     # Menus and Tool bar
     _menuFile = (
         "actionAdd",
@@ -229,7 +242,7 @@ class Test(View):
         self._progress.stopped.connect(self._onStopped)
 
         self._tests = Tests(self._elements["treeWidgetLocations"],
-                            self._elements["treeWidgetTests"],
+                            self._elements["treeViewTests"],
                             self._elements["treeWidgetModels"])
 
         self._elements["actionAdd"].triggered.connect(self._tests.addLocation)
@@ -244,12 +257,76 @@ class Test(View):
         self._elements["actionCollapseAll"].triggered.connect(
                                                         self._tests.collapseAll)
         self._elements["actionRefresh"].triggered.connect(self._tests.refresh)
+        self._tests.loading.connect(self._testsLoading)
 
         # Initialize private test variables
         self._suiteRuns = 0
         self._todoSuites = 0
         self._testResult = None
         self._testRunner = None
+        self._healthCheck = None
+        # Devices being reconnected and whether tests were paused for them
+        self._reconnecting = set()
+        self._autoPaused = False
+
+# Private methods:
+    def _resumeReconnected(self):
+        '''
+        Resumes tests paused for reconnecting devices once none of them
+        is left.
+        '''
+        if not self._autoPaused or self._reconnecting:
+            return
+        self._autoPaused = False
+        if self._actionResume.isVisible():
+            self._resumeTests()
+
+    def _devicesChecked(self, devices, tests, latencies):
+        '''
+        Runs tests on the given devices after their health check. Devices
+        that did not answer are reported and excluded if configured so.
+        '''
+        self._healthCheck = None
+        statusBar = self._parent.getStatusBar()
+        statusBar.clearMessage()
+        for device in devices:
+            if latencies.get(device) is not None:
+                log.info("Latency of '%s' device: %.1f ms"
+                         % (device.name, latencies[device]))
+        dead = [device for device in devices
+                if device in latencies and latencies[device] is None]
+        if dead:
+            exclude = self._preflightExclude.getBool()
+            message = ("Devices not responding%s: %s"
+                       % (" (excluded)" if exclude else '',
+                          ", ".join(device.name for device in dead)))
+            log.warning(message)
+            statusBar.showMessage(message)
+            if exclude:
+                devices = [device for device in devices
+                           if device not in dead]
+        if not devices:
+            runWarning("None of the selected devices responds")
+            self._actionStart.setVisible(True)
+            return
+        self._runTests(devices, tests)
+
+    def _runTests(self, devices, tests):
+        '''
+        Starts execution of the given tests on the given devices.
+        '''
+        self._suiteRuns = 0
+        self._todoSuites = len(tests)
+        self._testResult = testresult.TestResult()
+        self._testRunner = TestRunner(devices, tests, self._testResult)
+        self._devices.deviceChecked.connect(self._testRunner.addDevice)
+        self._devices.deviceUnchecked.connect(self._testRunner.removeDevice)
+        self._devices.setWarning(True)
+
+        self._testRunner.start()
+
+        self._actionStop.setVisible(True)
+        self._actionPause.setVisible(True)
 
 # Public methods:
     def saveState(self):
@@ -270,22 +347,51 @@ class Test(View):
     #@QtCore.Slot(Device)
     def _deviceConnected(self, device):
         '''
-        Adds a device to list.
+        Adds a device to list, or resumes tests paused while the device was
+        being reconnected.
         '''
+        if device in self._reconnecting:
+            log.info("Device '%s' reconnected" % device.name)
+            self._reconnecting.discard(device)
+            self._resumeReconnected()
+            return
         self._devices.add(device, check=self._checkOnConnect.getBool())
 
     #@QtCore.Slot(Device)
     def _deviceDisconnected(self, device, error):
         '''
         Removes given device from list. The error parameter can be set to True
-        to indicate that the device was disconnected due to an error.
-        '''
+        to indicate that the device was disconnected due to an error. Running
+        tests are paused instead while the device is being reconnected.
+        '''
+        if (error and device.isReconnecting()
+            and self._devices.contains(device)):
+            self._reconnecting.add(device)
+            if self._actionPause.isVisible():
+                log.info("Pausing tests until '%s' device is reconnected"
+                         % device.name)
+                self._pauseTests()
+                self._autoPaused = True
+            return
+        self._reconnecting.discard(device)
         self._devices.remove(device)
+        self._resumeReconnected()
+
+    #@QtCore.Slot(bool)
+    def _testsLoading(self, loading):
+        '''
+        Shows a message in the status bar while tests are discovered.
+        '''
+        statusBar = self._parent.getStatusBar()
+        if loading:
+            statusBar.showMessage("Discovering tests...")
+        else:
+            statusBar.clearMessage()
 
     #@QtCore.Slot()
     def _startTests(self):
         '''
-        Starts execution of tests.
+        Checks health of the checked devices and starts execution of tests.
         '''
         log.debug("Starting tests")
         self._actionStart.setVisible(False)
@@ -302,19 +408,16 @@ class Test(View):
             runWarning("Selected test suites do not contain any test cases")
             self._actionStart.setVisible(True)
             return
-
-        self._suiteRuns = 0
-        self._todoSuites = len(tests)
-        self._testResult = testresult.TestResult()
-        self._testRunner = TestRunner(devices, tests, self._testResult)
-        self._devices.deviceChecked.connect(self._testRunner.addDevice)
-        self._devices.deviceUnchecked.connect(self._testRunner.removeDevice)
-        self._devices.setWarning(True)
-
-        self._testRunner.start()
-
-        self._actionStop.setVisible(True)
-        self._actionPause.setVisible(True)
+        if not self._preflightEnabled.getBool():
+            self._runTests(devices, tests)
+            return
+        log.debug("Checking health of devices before running tests")
+        self._parent.getStatusBar().showMessage("Checking devices...")
+        self._healthCheck = HealthCheck(devices,
+                                        self._preflightDeadline.getInt())
+        self._healthCheck.finished.connect(lambda latencies:
+                               self._devicesChecked(devices, tests, latencies))
+        self._healthCheck.start()
 
     #@QtCore.Slot()
     def _stopTests(self):
@@ -393,6 +496,7 @@ class Test(View):
         self._actionStop.setVisible(False)
         self._actionPause.setVisible(False)
         self._actionResume.setVisible(False)
+        self._autoPaused = False
 
         self._devices.deviceChecked.disconnect(self._testRunner.addDevice)
         self._devices.deviceUnchecked.disconnect(self._testRunner.removeDevice)
@@ -50,7 +50,8 @@ from tadek.engine.testexec import (STATUS_PASSED, STATUS_FAILED, STATUS_ERROR,
                                    STATUS_NO_RUN, STATUS_NOT_COMPLETED)
 
 __all__ = ["STATUS_COLORS", "STATUS_FONTS", "window", "viewName",
-           "importModule", "loadUi", "setWait", "resetWait", "LastValues"]
+           "importModule", "loadUi", "setWait", "resetWait", "LastValues",
+           "cachePath"]
 
 STATUS_COLORS = {
     STATUS_PASSED:          QtGui.QBrush(QtCore.Qt.darkGreen),
@@ -88,6 +89,13 @@ def viewName():
     '''
     return os.path.basename(os.path.dirname(inspect.stack(0)[1][1]))
 
+def cachePath(*names):
+    '''
+    Returns a path of the given names in the cache directory of the user
+    interface.
+    '''
+    return os.path.join(os.path.expanduser("~"), ".cache", "tadek-ui", *names)
+
 def importModule(module):
     '''
     Imports a module of the given name.
@@ -0,0 +1,216 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import Queue
+import threading
+
+from PySide import QtCore
+
+from tadek.core import log
+
+
+def _stamp(path):
+    '''
+    Returns a pair of a size and a modification time of the given file
+    or None if there is no such file.
+    '''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+class WarmupCache(QtCore.QObject):
+    '''
+    A bounded cache of files loaded in advance in a worker thread, keyed
+    by their paths and modification times. Files are warmed up at start
+    and then periodically until the cache is stopped.
+    '''
+    def __init__(self, load, paths, size, interval, release=None):
+        '''
+        Initializes the cache with a function loading a file of the given
+        path in the worker thread, a function returning paths of files
+        to warm up, the maximum number of cached files, an interval of
+        warm-ups in milliseconds and an optional function releasing
+        loaded values that are not taken.
+        '''
+        QtCore.QObject.__init__(self)
+        self._load = load
+        self._paths = paths
+        self._size = size
+        self._release = release
+        # Cached values with stamps of their files by paths
+        self._entries = {}
+        # Paths of files to keep in the cache and to be loaded
+        self._wanted = []
+        self._queued = set()
+        self._queue = Queue.Queue()
+        self._lock = threading.RLock()
+        self._thread = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.warm)
+
+# Private methods:
+    def _discard(self, value):
+        '''
+        Releases the given loaded value.
+        '''
+        if value is not None and self._release is not None:
+            try:
+                self._release(value)
+            except Exception, ex:
+                log.warning("Could not release warmed up file: %s" % ex)
+
+    def _run(self):
+        '''
+        Loads queued files in the worker thread.
+        '''
+        while True:
+            path = self._queue.get()
+            if path is None:
+                self._queue.task_done()
+                return
+            stamp = _stamp(path)
+            value = None
+            if stamp is not None:
+                log.debug("Warming up file '%s'" % path)
+                try:
+                    value = self._load(path)
+                except Exception, ex:
+                    log.warning("Could not warm up file '%s': %s"
+                                % (path, ex))
+            self._lock.acquire()
+            try:
+                self._queued.discard(path)
+                # files modified while loaded are loaded again later
+                if path in self._wanted and stamp == _stamp(path):
+                    old = self._entries.pop(path, None)
+                    self._entries[path] = (stamp, value)
+                    value = old and old[1]
+            finally:
+                self._lock.release()
+            self._discard(value)
+            self._queue.task_done()
+
+# Slots:
+    #@QtCore.Slot()
+    def warm(self):
+        '''
+        Queues files that are not cached or were modified since loaded
+        and drops files that are no longer wanted.
+        '''
+        self._lock.acquire()
+        try:
+            self._wanted = self._paths()[:self._size]
+            released = [self._entries.pop(path)[1]
+                        for path in self._entries.keys()
+                        if path not in self._wanted]
+            for path in self._wanted:
+                entry = self._entries.get(path)
+                if entry is not None and entry[0] == _stamp(path):
+                    continue
+                if path not in self._queued:
+                    self._queued.add(path)
+                    self._queue.put(path)
+        finally:
+            self._lock.release()
+        for value in released:
+            self._discard(value)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run,
+                                            name="WarmupCache")
+            self._thread.daemon = True
+            self._thread.start()
+
+# Public methods:
+    def start(self):
+        '''
+        Warms up files at once and starts periodic warm-ups.
+        '''
+        self.warm()
+        self._timer.start()
+
+    def stop(self):
+        '''
+        Stops periodic warm-ups and the worker thread, and releases all
+        cached values. A value being loaded is released when it is loaded.
+        '''
+        self._timer.stop()
+        self._lock.acquire()
+        try:
+            self._wanted = []
+            values = [value for stamp, value in self._entries.itervalues()]
+            self._entries.clear()
+            self._queued.clear()
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except Queue.Empty:
+                    break
+                self._queue.task_done()
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread = None
+        finally:
+            self._lock.release()
+        for value in values:
+            self._discard(value)
+
+    def take(self, path):
+        '''
+        Returns a value loaded from the file of the given path, or returns
+        None if the file is not cached, was modified since loaded or its
+        value was already taken. A taken file is not loaded again until it
+        is modified.
+        '''
+        self._lock.acquire()
+        try:
+            entry = self._entries.get(path)
+            if entry is None or entry[1] is None:
+                return None
+            stamp, value = entry
+            if stamp == _stamp(path):
+                self._entries[path] = (stamp, None)
+                log.debug("Using warmed up file '%s'" % path)
+                return value
+            del self._entries[path]
+        finally:
+            self._lock.release()
+        self._discard(value)
+        return None
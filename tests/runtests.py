@@ -51,7 +51,15 @@ from tadek.core import config
 
 TEST_MODULES = (
     "consolechannel",
+    "corpus",
     "devices",
+    "dump",
+    "dumpstore",
+    "index",
+    "metrics",
+    "search",
+    "testmodel",
+    "warmup",
 )
 
 _PROGRAM_NAME = 'unittest'
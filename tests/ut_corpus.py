@@ -0,0 +1,200 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+import os
+import sys
+import inspect
+import shutil
+import tempfile
+import unittest
+from xml.etree import cElementTree as etree
+
+from tadek.core.config import DATA_DIR
+sys.path.insert(0, os.path.join(DATA_DIR, "ui"))
+from explore import corpus
+from explore.dump import DumpWriter
+
+__all__ = ["CorpusTest"]
+
+
+class FakeAccessible(object):
+    def __init__(self, index, count=0, depth=0):
+        self.index = index
+        self.name = u"item %d.%d" % (depth, index)
+        self.role = u"PUSH_BUTTON" if index else u"PANEL"
+        self.states = [u"VISIBLE"]
+        self.text = None
+        self.count = count
+        self._children = [FakeAccessible(i, count - 1, depth + 1)
+                          for i in xrange(count)]
+
+    def children(self):
+        return self._children
+
+    def marshal(self):
+        element = etree.Element("accessible", index=str(self.index))
+        etree.SubElement(element, "name").text = self.name
+        etree.SubElement(element, "role").text = self.role
+        children = etree.SubElement(element, "children")
+        for child in self._children:
+            children.append(child.marshal())
+        return element
+
+    @classmethod
+    def unmarshal(cls, element):
+        acc = cls(int(element.get("index")))
+        acc.name = element.findtext("name")
+        acc.role = element.findtext("role")
+        return acc
+
+
+class FakeCheck(object):
+    exact = False
+    caseSensitive = True
+    name = role = state = text = ''
+
+    def __init__(self, **criteria):
+        self.__dict__.update(criteria)
+        self.expressions = set()
+
+    def __call__(self, acc):
+        for attr in ("name", "role"):
+            value = getattr(self, attr)
+            if not self.caseSensitive:
+                if value.upper() not in getattr(acc, attr).upper():
+                    return False
+            elif value not in getattr(acc, attr):
+                return False
+        return True
+
+
+# A worker process reading dumps with fake accessibles
+_WORKER = '''
+import sys
+import types
+from xml.etree import cElementTree as etree
+sys.path.insert(0, %r)
+import dumpindexer
+%s
+dumpindexer.accessible = types.ModuleType("accessible")
+dumpindexer.accessible.Accessible = FakeAccessible
+dumpindexer.main()
+'''
+
+
+class CorpusTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cacheDir = tempfile.mkdtemp()
+        self._cacheDir = corpus._CACHE_DIR
+        self._worker = corpus._WORKER
+        corpus._CACHE_DIR = self.cacheDir
+        worker = os.path.join(self.cacheDir, "worker.py")
+        f = open(worker, "w")
+        try:
+            f.write(_WORKER % (os.path.dirname(self._worker[-1]),
+                               inspect.getsource(FakeAccessible)))
+        finally:
+            f.close()
+        corpus._WORKER = [sys.executable, worker]
+        self.write("a.xml", FakeAccessible(0, 2))
+        self.write("b.xml.gz", FakeAccessible(0, 3))
+        self.corpus = corpus.Corpus(self.directory)
+
+    def tearDown(self):
+        corpus._CACHE_DIR = self._cacheDir
+        corpus._WORKER = self._worker
+        shutil.rmtree(self.directory)
+        shutil.rmtree(self.cacheDir)
+
+    def write(self, name, acc):
+        writer = DumpWriter(os.path.join(self.directory, name))
+        writer.writeTree(acc)
+        writer.close()
+
+    def find(self, **criteria):
+        return [(os.path.split(node.source)[1], node.path.tuple)
+                for node in self.corpus.find(FakeCheck(**criteria))]
+
+    def testNotIndexed(self):
+        self.failIf(self.corpus.isIndexed())
+        self.failUnlessEqual(self.find(name=u"item"), [])
+
+    def testFind(self):
+        self.failUnlessEqual(self.corpus.update(processes=2), 2)
+        self.failUnlessEqual(self.find(name=u"item 1.1"),
+                             [("a.xml", (1,)), ("b.xml.gz", (1,))])
+        self.failUnlessEqual(self.find(role=u"PUSH_BUTTON", name=u"item 2"),
+                             [("b.xml.gz", (0, 1)), ("b.xml.gz", (1, 1)),
+                              ("b.xml.gz", (2, 1))])
+
+    def testRoot(self):
+        self.corpus.update(processes=1)
+        self.failUnlessEqual(self.find(name=u"item 0.0"),
+                             [("a.xml", ()), ("b.xml.gz", ())])
+
+    def testCaseInsensitive(self):
+        self.corpus.update(processes=1)
+        self.failUnlessEqual(self.find(name=u"ITEM 1.0", caseSensitive=False),
+                             [("a.xml", (0,)), ("b.xml.gz", (0,))])
+
+    def testUpdate(self):
+        self.corpus.update(processes=1)
+        os.remove(os.path.join(self.directory, "a.xml"))
+        self.write("c.xml", FakeAccessible(0, 1))
+        self.failUnlessEqual(self.corpus.update(processes=1), 2)
+        self.failUnlessEqual(self.find(name=u"item 1.0"),
+                             [("b.xml.gz", (0,)), ("c.xml", (0,))])
+
+    def testWords(self):
+        self.corpus.update(processes=2)
+        self.failUnlessEqual(self.find(name=u"item 1.1", exact=True,
+                                       role=u"PUSH_BUTTON", state=u"VISIBLE"),
+                             [("a.xml", (1,)), ("b.xml.gz", (1,))])
+        self.failUnlessEqual(self.find(name=u"tem 3", state=u"HIDDEN"), [])
+
+    def testBroken(self):
+        f = open(os.path.join(self.directory, "c.xml"), "w")
+        try:
+            f.write("<accessible")
+        finally:
+            f.close()
+        self.failUnlessEqual(self.corpus.update(processes=2), 2)
+        self.failUnlessEqual(self.find(name=u"item 0.0"),
+                             [("a.xml", ()), ("b.xml.gz", ())])
+
+
+if __name__ == "__main__":
+    unittest.main()
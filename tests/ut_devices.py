@@ -36,17 +36,22 @@
 import os
 import sys
 import time
+import shutil
+import tempfile
 import socket
 import unittest
 from PySide import QtCore, QtGui
 
-from devices import Device, Queue
+from devices import Device, DeviceConnector, DeviceModel, Queue
+from devices import DeviceFilterModel, TrafficCapture, ReplayDevice
+from devices import capturedDevices, LoopbackDevice, HealthCheck
 from tadek.core import config
 sys.path.insert(0, os.path.join(config.DATA_DIR, "ui"))
 from tadek.core.queue import QueueItem
 from tadek.connection import protocol, server
 
-__all__ = ["QueueTest", "DeviceTest"]
+__all__ = ["QueueTest", "DeviceTest", "DeviceModelTest",
+           "ReplayDeviceTest", "LoopbackDeviceTest"]
 
 
 class QueueWatcher(QtCore.QObject):
@@ -168,6 +173,18 @@ class DeviceTest(unittest.TestCase):
         self._dev.connectDevice()
         self.failUnless(dw.connected)
 
+    def testConnectingInBackground(self):
+        dw = DeviceWatcher(self._dev)
+        connector = DeviceConnector(2)
+        connector.connectDevice(self._dev)
+        self.failUnless(connector.isConnecting(self._dev))
+        timeout = time.time() + 5
+        while connector.isConnecting() and time.time() < timeout:
+            QtGui.qApp.processEvents()
+            time.sleep(0.01)
+        self.failIf(connector.isConnecting())
+        self.failUnless(dw.connected)
+
     def testDisconnecting(self):
         dw = DeviceWatcher(self._dev)
         self._dev.connectDevice()
@@ -190,6 +207,211 @@ class DeviceTest(unittest.TestCase):
         QtGui.qApp.processEvents()
         self.failUnless(dw.received)
 
+    def testHealthCheck(self):
+        self._dev.connectDevice()
+        loopback = LoopbackDevice("loopback", object())
+        results = []
+        check = HealthCheck([self._dev, loopback], 100)
+        check.finished.connect(results.append)
+        check.start()
+        timeout = time.time() + 5
+        while not results and time.time() < timeout:
+            QtGui.qApp.processEvents()
+            time.sleep(0.01)
+        # the test daemon does not answer requests
+        self.failUnlessEqual(results, [{self._dev: None, loopback: 0.0}])
+
+    def testReconnecting(self):
+        dw = DeviceWatcher(self._dev)
+        delays = []
+        self._dev.reconnecting.connect(delays.append)
+        self._dev.connectDevice()
+        self._dev.connectionLost(Exception("lost"))
+        self.failIf(dw.connected)
+        self.failUnless(self._dev.isReconnecting())
+        for i in xrange(3):
+            self._dev.connectFailed.emit(Exception("failed"))
+        self.failUnlessEqual(len(delays), 4)
+        for i, delay in enumerate(delays):
+            base = self._dev._RECONNECT_DELAY * 2 ** i
+            self.failUnless(base * 0.5 <= delay <= base * 1.5)
+        self._dev.connectDevice()
+        self.failUnless(dw.connected)
+        self.failIf(self._dev.isReconnecting())
+
+    def testKeepaliveBusy(self):
+        dw = DeviceWatcher(self._dev)
+        self._dev.connectDevice()
+        timeout = self._dev._KEEPALIVE_TIMEOUT / 1000.0
+        # an unanswered probe while other messages keep arriving
+        self._dev._probes[-1] = time.time() - 2 * timeout
+        self._dev._lastReceived = time.time()
+        self._dev._probe()
+        self.failUnless(dw.connected)
+        self.failIf(self._dev.isReconnecting())
+        # nothing received since the probe was sent
+        self._dev._lastReceived = time.time() - 3 * timeout
+        self._dev._probe()
+        self.failIf(dw.connected)
+        self.failUnless(self._dev.isReconnecting())
+        self._dev.stopReconnecting()
+
+
+class DeviceModelTest(unittest.TestCase):
+    if not QtGui.qApp:
+        _app = QtGui.QApplication([])
+
+    def setUp(self):
+        self._devs = [Device(name, "127.0.0.1", port) for name, port
+                      in (("beta", 2), ("Alpha", 10), ("gamma", 1))]
+        self._model = DeviceModel()
+        self._model.addDevices(self._devs)
+        self._proxy = DeviceFilterModel()
+        self._proxy.setSourceModel(self._model)
+
+    def _names(self):
+        return [self._proxy.index(row, 0).data()
+                for row in xrange(self._proxy.rowCount())]
+
+    def testAddingAndRemoving(self):
+        self.failUnlessEqual(self._model.rowCount(), 3)
+        self._model.removeDevice(self._devs[0])
+        self.failUnlessEqual(self._model.rowCount(), 2)
+        self.failIf(self._model.hasDevice(self._devs[0]))
+        self.failUnlessEqual(self._model.index(1, 0).data(), "gamma")
+
+    def testSorting(self):
+        self._proxy.sort(DeviceModel.NAME_COLUMN)
+        self.failUnlessEqual(self._names(), ["Alpha", "beta", "gamma"])
+        self._proxy.sort(DeviceModel.ADDRESS_COLUMN)
+        self.failUnlessEqual(self._names(), ["gamma", "beta", "Alpha"])
+
+    def testFiltering(self):
+        self._proxy.setFilterText("A")
+        self.failUnlessEqual(sorted(self._names()), ["Alpha", "beta", "gamma"])
+        self._proxy.setFilterText("alp")
+        self.failUnlessEqual(self._names(), ["Alpha"])
+        self._proxy.setFilterText(":1")
+        self.failUnlessEqual(sorted(self._names()), ["Alpha", "gamma"])
+        self._proxy.setFilterText('')
+        self.failUnlessEqual(self._proxy.rowCount(), 3)
+
+
+class CapturedResponse(object):
+    def __init__(self, id, status, output):
+        self.id = id
+        self.status = status
+        self.output = output
+
+
+class CapturedDevice(object):
+    name = "captured"
+
+
+class ReplayDeviceTest(unittest.TestCase):
+    if not QtGui.qApp:
+        _app = QtGui.QApplication([])
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = os.path.join(self._directory, "traffic.tdc")
+        dev = CapturedDevice()
+        capture = TrafficCapture(self._path)
+        for id, output in ((1, "first"), (2, "second")):
+            capture.request(dev, id, "requestSystemExec", ("ls",), {})
+            capture.received(dev, id)
+            capture.response(dev, id, CapturedResponse(id, True, output))
+        capture.close()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _replay(self, dev, *args):
+        ids = []
+        dev.responseReceived.connect(ids.append)
+        id = dev.requestDevice("requestSystemExec", *args)
+        timeout = time.time() + 5
+        while not ids and time.time() < timeout:
+            QtGui.qApp.processEvents()
+            time.sleep(0.01)
+        self.failUnlessEqual(ids, [id])
+        return dev.getResponse(id)
+
+    def testReplaying(self):
+        self.failUnlessEqual(capturedDevices(self._path), ["captured"])
+        dev = ReplayDevice(self._path, "captured", scale=0)
+        dev.connectDevice()
+        outputs = [self._replay(dev, "ls").output for i in xrange(3)]
+        self.failUnlessEqual(outputs, ["first", "second", "second"])
+        response = self._replay(dev, "pwd")
+        self.failIf(response.status)
+
+    def testUnclosedCapture(self):
+        path = os.path.join(self._directory, "unclosed.tdc")
+        capture = TrafficCapture(path)
+        capture.request(CapturedDevice(), 1, "requestSystemExec", ("ls",), {})
+        capture._flushed = 0
+        capture.received(CapturedDevice(), 1)
+        self.failUnlessEqual(capturedDevices(path), ["captured"])
+        capture.close()
+
+
+class LoopbackHandler(object):
+    def __init__(self):
+        self.commands = []
+
+    def requestSystemExec(self, command):
+        self.commands.append(command)
+        if command == "fail":
+            raise ValueError(command)
+        return CapturedResponse(None, True, command.upper())
+
+
+class LoopbackDeviceTest(unittest.TestCase):
+    if not QtGui.qApp:
+        _app = QtGui.QApplication([])
+
+    def setUp(self):
+        self._handler = LoopbackHandler()
+        self._dev = LoopbackDevice("loopback", self._handler)
+        self._watcher = DeviceWatcher(self._dev)
+        self._received = []
+        self._dev.responseReceived.connect(self._received.append)
+        self._dev.connectDevice()
+
+    def testRequests(self):
+        self.failUnless(self._watcher.connected)
+        ids = [self._dev.requestDevice("requestSystemExec", command)
+               for command in ("ls", "pwd")]
+        self.failUnless(self._watcher.sent)
+        self.failUnlessEqual(self._handler.commands, ["ls", "pwd"])
+        QtGui.qApp.processEvents()
+        self.failUnlessEqual(self._received, ids)
+        response = self._dev.getResponse(ids[1])
+        self.failUnlessEqual((response.id, response.output), (ids[1], "PWD"))
+        self.failUnlessEqual(self._dev.getResponse(ids[1]), None)
+
+    def testFailingHandler(self):
+        id = self._dev.requestDevice("requestSystemExec", "fail")
+        QtGui.qApp.processEvents()
+        self.failUnlessEqual(self._received, [id])
+        self.failIf(self._dev.getResponse(id).status)
+
+    def testRefusedInBackground(self):
+        dev = LoopbackDevice("refused", self._handler)
+        dev._connectDevice = lambda: False
+        errors = []
+        dev.connectFailed.connect(errors.append)
+        connector = DeviceConnector(1)
+        connector.connectDevice(dev)
+        timeout = time.time() + 5
+        while connector.isConnecting() and time.time() < timeout:
+            QtGui.qApp.processEvents()
+            time.sleep(0.01)
+        self.failIf(connector.isConnecting())
+        self.failIf(dev.isConnected())
+        self.failUnlessEqual(len(errors), 1)
+
 
 if __name__ == "__main__":
     unittest.main()
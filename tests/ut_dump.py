@@ -0,0 +1,230 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+import os
+import sys
+import copy
+import tempfile
+import unittest
+import threading
+from xml.etree import cElementTree as etree
+
+from tadek.core import accessible
+from tadek.core.config import DATA_DIR
+sys.path.insert(0, os.path.join(DATA_DIR, "ui"))
+from explore.dump import (DumpWriter, ChunkedDump, DumpCancelled, openDump,
+                          decompressDump)
+
+__all__ = ["DumpWriterTest", "ChunkedDumpTest", "DecompressDumpTest"]
+
+
+class FakeAccessible(object):
+    container = "children"
+
+    def __init__(self, index, count=0, depth=0):
+        self.index = index
+        self.name = u"item %d.%d" % (depth, index)
+        self.count = count
+        self._children = [self.__class__(i, count - 1, depth + 1)
+                          for i in xrange(count)]
+
+    def children(self):
+        return self._children
+
+    def marshal(self):
+        element = etree.Element("accessible", index=str(self.index))
+        etree.SubElement(element, "name").text = self.name
+        parent = element
+        if self.container:
+            parent = etree.SubElement(element, self.container)
+        for child in self.children():
+            parent.append(child.marshal())
+        return element
+
+
+class FlatAccessible(FakeAccessible):
+    container = None
+
+
+class CountingAccessible(FakeAccessible):
+    # Numbers of children in marshalled subtrees
+    marshalled = []
+
+    def marshal(self):
+        self.marshalled.append(len(self.children()))
+        return FakeAccessible.marshal(self)
+
+
+class DumpWriterTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".xml")
+        os.close(fd)
+
+    def tearDown(self):
+        for path in (self.path, self.path + ".gz"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def write(self, acc, path):
+        writer = DumpWriter(path)
+        writer.writeTree(acc)
+        writer.close()
+        f = openDump(path)
+        try:
+            return etree.tostring(etree.parse(f).getroot())
+        finally:
+            f.close()
+
+    def testContainer(self):
+        acc = FakeAccessible(0, 4)
+        self.failUnlessEqual(self.write(acc, self.path),
+                             etree.tostring(acc.marshal()))
+
+    def testFlat(self):
+        acc = FlatAccessible(0, 3)
+        self.failUnlessEqual(self.write(acc, self.path),
+                             etree.tostring(acc.marshal()))
+
+    def testLeaf(self):
+        acc = FakeAccessible(0)
+        self.failUnlessEqual(self.write(acc, self.path),
+                             etree.tostring(acc.marshal()))
+
+    def testNodeByNode(self):
+        acc = CountingAccessible(0, 4)
+        self.failUnlessEqual(self.write(acc, self.path),
+                             etree.tostring(FakeAccessible(0, 4).marshal()))
+        # only learning the placement of children marshals a child
+        self.failUnlessEqual(max(CountingAccessible.marshalled), 1)
+
+    def testCompressed(self):
+        acc = FakeAccessible(0, 3)
+        self.failUnlessEqual(self.write(acc, self.path + ".gz"),
+                             etree.tostring(acc.marshal()))
+        f = open(self.path + ".gz", "rb")
+        try:
+            self.failUnlessEqual(f.read(2), "\x1f\x8b")
+        finally:
+            f.close()
+
+
+class ChunkedDumpTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".xml")
+        os.close(fd)
+        self.root = FakeAccessible(0, 4)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def response(self, node):
+        acc = self.root
+        for idx in node.path.tuple:
+            acc = acc.children()[idx]
+        if not node.subtree:
+            # nodes above the split level come with their direct children
+            acc = copy.copy(acc)
+            acc._children = [copy.copy(child) for child in acc._children]
+            for child in acc._children:
+                child._children = []
+        return acc
+
+    def dump(self, window, split, order):
+        writer = DumpWriter(self.path)
+        dump = ChunkedDump(writer, accessible.Path(), split)
+        requested = []
+        while not dump.isDone():
+            while len(dump.pending) + dump.buffered < window:
+                node = dump.nextRequest()
+                if node is None:
+                    break
+                requested.append(node)
+            node = requested.pop(order)
+            dump.received(node, self.response(node))
+        writer.close()
+        self.failUnlessEqual(dump.fetched, 1 + 4 + 4*3 + 4*3*2 + 4*3*2)
+        self.failUnlessEqual(dump.estimate(), dump.fetched)
+        self.failUnlessEqual(etree.tostring(etree.parse(self.path).getroot()),
+                             etree.tostring(self.root.marshal()))
+
+    def testInOrder(self):
+        self.dump(3, 2, 0)
+
+    def testOutOfOrder(self):
+        self.dump(3, 2, -1)
+
+    def testSingleChunk(self):
+        self.dump(1, 0, 0)
+
+    def testSkeleton(self):
+        self.dump(8, 10, -1)
+
+
+class DecompressDumpTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".xml.gz")
+        os.close(fd)
+        writer = DumpWriter(self.path)
+        writer.writeTree(FakeAccessible(0, 4))
+        writer.close()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testProgress(self):
+        calls = []
+        tempPath = decompressDump(self.path,
+                                  lambda *args: calls.append(args))
+        try:
+            f = openDump(self.path)
+            try:
+                self.failUnlessEqual(open(tempPath, "rb").read(), f.read())
+            finally:
+                f.close()
+        finally:
+            os.remove(tempPath)
+        size = os.path.getsize(self.path)
+        self.failUnless(calls)
+        self.failUnlessEqual(calls[-1], (size, size))
+
+    def testCancelled(self):
+        cancelled = threading.Event()
+        cancelled.set()
+        self.failUnlessRaises(DumpCancelled, decompressDump, self.path,
+                              cancelled=cancelled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from xml.etree import cElementTree as etree
+
+from tadek.core.config import DATA_DIR
+sys.path.insert(0, os.path.join(DATA_DIR, "ui"))
+from explore.dump import DumpWriter
+from explore import dumpstore
+from explore.dumpstore import DumpStore, pathDigest
+
+__all__ = ["DumpStoreTest"]
+
+
+class FakeAccessible(object):
+    def __init__(self, index, count=0, depth=0):
+        self.index = index
+        self.name = u"item %d.%d" % (depth, index)
+        self.count = count
+        self._children = [FakeAccessible(i, count - 1, depth + 1)
+                          for i in xrange(count)]
+
+    def children(self):
+        return self._children
+
+    def marshal(self, depth=-1):
+        element = etree.Element("accessible", index=str(self.index))
+        etree.SubElement(element, "name").text = self.name
+        children = etree.SubElement(element, "children")
+        if depth:
+            for child in self._children:
+                children.append(child.marshal(depth - 1))
+        return element
+
+
+class DumpStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeAccessible(0, 3)
+        fd, self.source = tempfile.mkstemp(suffix=".xml.gz")
+        os.close(fd)
+        writer = DumpWriter(self.source)
+        writer.writeTree(self.root)
+        writer.close()
+        self.path = self.source + ".db"
+        DumpStore.convert(self.source, self.path)
+        self.store = DumpStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        os.remove(self.source)
+        os.remove(self.path)
+
+    def assertElement(self, path, depth):
+        acc = self.root
+        for idx in path:
+            acc = acc.children()[idx]
+        self.failUnlessEqual(etree.tostring(self.store.element(path, depth)),
+                             etree.tostring(acc.marshal(depth)))
+
+    def testRoot(self):
+        self.assertElement((), 0)
+        self.assertElement((), 1)
+        self.assertElement((), -1)
+
+    def testNodes(self):
+        self.assertElement((1,), 0)
+        self.assertElement((2, 1), 1)
+        self.assertElement((0, 1, 0), -1)
+
+    def testMissing(self):
+        self.failUnless(self.store.element((3,), 0) is None)
+        self.failUnless(self.store.element((0, 0, 0, 0), 0) is None)
+
+    def testSource(self):
+        self.failUnlessEqual(self.store.source, os.path.abspath(self.source))
+
+    def testUnicodeDigest(self):
+        self.failUnlessEqual(pathDigest(u"/tmp/za\u017c.xml"),
+                             pathDigest(u"/tmp/za\u017c.xml".encode("utf-8")))
+
+    def testClean(self):
+        cacheDir = dumpstore._CACHE_DIR
+        dumpstore._CACHE_DIR = tempfile.mkdtemp()
+        try:
+            stale = os.path.join(dumpstore._CACHE_DIR, "stale.db")
+            kept = os.path.join(dumpstore._CACHE_DIR, "kept.db")
+            shutil.copy(self.path, kept)
+            shutil.copy(self.path, stale)
+            os.remove(self.source)
+            DumpStore.clean(kept)
+            self.failUnless(os.path.exists(kept))
+            self.failIf(os.path.exists(stale))
+        finally:
+            shutil.rmtree(dumpstore._CACHE_DIR)
+            dumpstore._CACHE_DIR = cacheDir
+            open(self.source, "w").close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+import os
+import sys
+import unittest
+
+from tadek.core import accessible
+from tadek.core.config import DATA_DIR
+sys.path.insert(0, os.path.join(DATA_DIR, "ui"))
+from explore.index import AccessibleIndex
+from explore.search import SearchDialog
+
+__all__ = ["AccessibleIndexTest"]
+
+
+class FakeAccessible(object):
+    def __init__(self, path, name=None, role=None, count=0, states=None,
+                 text=None):
+        self.path = accessible.Path(*path)
+        self.index = path[-1]
+        self.name = name
+        self.role = role
+        self.count = count
+        self.states = states
+        self.text = text
+
+
+def check(**criteria):
+    params = {
+        "name": '',
+        "role": '',
+        "state": '',
+        "text": '',
+        "matchType": SearchDialog._PARTIAL_MATCH,
+        "caseSensitiveMatch": False
+    }
+    params.update(criteria)
+    return SearchDialog.Check(params)
+
+
+class AccessibleIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = AccessibleIndex()
+        for acc in (
+            FakeAccessible((0,), u"gedit", u"APPLICATION", 2),
+            FakeAccessible((0, 0), u"Untitled Document", u"FRAME", 1,
+                           [u"ACTIVE"]),
+            FakeAccessible((0, 0, 0), u"Save As", u"PUSH_BUTTON", 0,
+                           [u"ENABLED"]),
+            FakeAccessible((0, 1), u"Open File", u"DIALOG", 1),
+            FakeAccessible((0, 1, 0), u"Open", u"PUSH_BUTTON", 0,
+                           [u"ENABLED", u"FOCUSED"]),
+        ):
+            self.index.add(acc)
+
+    def paths(self, *args, **kwargs):
+        return [path.tuple for path in self.index.search(*args, **kwargs)]
+
+    def testLength(self):
+        self.failUnlessEqual(len(self.index), 5)
+
+    def testSearchRole(self):
+        self.failUnlessEqual(self.paths(check(role=u"button")),
+                             [(0, 0, 0), (0, 1, 0)])
+        exact = SearchDialog._EXACT_MATCH
+        self.failUnlessEqual(self.paths(check(role=u"frame", matchType=exact)),
+                             [(0, 0)])
+
+    def testSearchName(self):
+        self.failUnlessEqual(self.paths(check(name=u"open")),
+                             [(0, 1), (0, 1, 0)])
+        self.failUnlessEqual(self.paths(check(name=u"ave a")), [(0, 0, 0)])
+        self.failUnlessEqual(self.paths(check(name=u"&Open\s.*")), [(0, 1)])
+
+    def testSearchStates(self):
+        self.failUnlessEqual(self.paths(check(state=u"focused")), [(0, 1, 0)])
+        self.failUnlessEqual(self.paths(check(role=u"button",
+                                              state=u"enabled")),
+                             [(0, 0, 0), (0, 1, 0)])
+
+    def testSearchUnknownStates(self):
+        unknown = []
+        self.failUnlessEqual(self.paths(check(state=u"enabled"),
+                                        unknown=unknown),
+                             [(0, 0, 0), (0, 1, 0)])
+        self.failUnlessEqual([path.tuple for path in unknown], [(0,), (0, 1)])
+        unknown = []
+        self.paths(check(name=u"open"), unknown=unknown)
+        self.failIf(unknown)
+
+    def testSearchScope(self):
+        path = accessible.Path(0, 1)
+        self.failUnlessEqual(self.paths(check(role=u"button"), path),
+                             [(0, 1, 0)])
+        path = accessible.Path(0)
+        self.failUnlessEqual(self.paths(check(role=u"button"), path,
+                                        deep=False), [])
+
+    def testUpdate(self):
+        self.index.add(FakeAccessible((0, 1, 0), u"Cancel", u"PUSH_BUTTON"))
+        self.failIf(self.paths(check(name=u"open", role=u"button")))
+        # states loaded earlier are kept
+        self.failUnlessEqual(self.paths(check(name=u"cancel",
+                                              state=u"focused")), [(0, 1, 0)])
+
+    def testRemove(self):
+        self.index.remove(accessible.Path(0, 1))
+        self.failUnlessEqual(len(self.index), 3)
+        self.failIf(self.paths(check(name=u"open")))
+        self.failUnless(self.index.get(accessible.Path(0, 1, 0)) is None)
+
+    def testClear(self):
+        self.index.clear()
+        self.failUnlessEqual(len(self.index), 0)
+        self.failIf(self.paths(check()))
+
+
+if __name__ == "__main__":
+    unittest.main()
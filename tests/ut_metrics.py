@@ -0,0 +1,139 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+
+from tadek.core.config import DATA_DIR
+sys.path.insert(0, os.path.join(DATA_DIR, "ui"))
+from metrics import Histogram, DeviceMetrics
+
+__all__ = ["HistogramTest", "DeviceMetricsTest"]
+
+
+class FakeDevice(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeResponse(object):
+    def __init__(self, status, data=''):
+        self.status = status
+        self._data = data
+
+    def marshal(self):
+        return self._data
+
+
+class HistogramTest(unittest.TestCase):
+    def testEmpty(self):
+        histogram = Histogram()
+        self.failUnlessEqual(histogram.mean(), None)
+        self.failUnlessEqual(histogram.percentile(50), None)
+
+    def testPercentiles(self):
+        histogram = Histogram()
+        for value in [3] * 90 + [150] * 9 + [70000]:
+            histogram.add(value)
+        self.failUnlessEqual(histogram.count, 100)
+        self.failUnlessEqual(histogram.min, 3)
+        self.failUnlessEqual(histogram.max, 70000)
+        self.failUnlessEqual(histogram.percentile(50), 5)
+        self.failUnlessEqual(histogram.percentile(90), 5)
+        self.failUnlessEqual(histogram.percentile(99), 200)
+        self.failUnlessEqual(histogram.percentile(100), 70000)
+
+
+class DeviceMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = DeviceMetrics(1000, countBytes=True)
+        self.dev = FakeDevice("dev")
+
+    def testRoundTrip(self):
+        self.metrics.requestSent(self.dev, 1, "requestAccessible")
+        self.metrics.requestSent(self.dev, 2, "requestAccessible")
+        self.failUnlessEqual(self.metrics.stats("dev")["requestAccessible"]
+                             ["in_flight"], 2)
+        self.metrics.responseReceived(self.dev, 1)
+        self.metrics.responseRead(self.dev, 1, FakeResponse(False, "abc"))
+        stats = self.metrics.stats()["dev"]["requestAccessible"]
+        self.failUnlessEqual(stats["sent"], 2)
+        self.failUnlessEqual(stats["received"], 1)
+        self.failUnlessEqual(stats["in_flight"], 1)
+        self.failUnlessEqual(stats["errors"], 1)
+        self.failUnlessEqual(stats["error_rate"], 1.0)
+        self.failUnlessEqual(stats["bytes"], 3)
+        self.failIfEqual(stats["mean"], None)
+
+    def testTimeout(self):
+        self.metrics.requestSent(self.dev, 1, "requestSystemExec")
+        self.metrics._pending[("dev", 1)] = ("requestSystemExec",
+                                             time.time() - 2)
+        self.metrics.expire()
+        stats = self.metrics.stats("dev")["requestSystemExec"]
+        self.failUnlessEqual(stats["timeouts"], 1)
+        self.failUnlessEqual(stats["in_flight"], 0)
+        self.failUnlessEqual(stats["timeout_rate"], 1.0)
+        # a late response is ignored
+        self.metrics.responseReceived(self.dev, 1)
+        self.failUnlessEqual(self.metrics.stats("dev")["requestSystemExec"]
+                             ["received"], 0)
+
+    def testDump(self):
+        directory = tempfile.mkdtemp()
+        try:
+            self.metrics.requestSent(self.dev, 1, "requestAccessible")
+            path = os.path.join(directory, "metrics.json")
+            self.metrics.dump(path)
+            f = open(path)
+            try:
+                data = json.load(f)
+            finally:
+                f.close()
+            self.failUnlessEqual(
+                data["devices"]["dev"]["requestAccessible"]["sent"], 1)
+            self.failUnlessEqual(os.listdir(directory), ["metrics.json"])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
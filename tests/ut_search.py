@@ -0,0 +1,139 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+import os
+import sys
+import unittest
+
+from tadek.core.config import DATA_DIR
+sys.path.insert(0, os.path.join(DATA_DIR, "ui"))
+from explore.search import SearchDialog, parseCriteria
+
+__all__ = ["CheckTest", "ParseCriteriaTest"]
+
+
+class FakeAccessible(object):
+    def __init__(self, name=None, role=None, states=None, text=None):
+        self.name = name
+        self.role = role
+        self.states = states
+        self.text = text
+
+
+def check(**criteria):
+    params = {
+        "name": '',
+        "role": '',
+        "state": '',
+        "text": '',
+        "matchType": SearchDialog._PARTIAL_MATCH,
+        "caseSensitiveMatch": False
+    }
+    params.update(criteria)
+    return SearchDialog.Check(params)
+
+
+class CheckTest(unittest.TestCase):
+    _acc = FakeAccessible(u"Ok Button", u"PUSH_BUTTON",
+                          [u"ENABLED", u"FOCUSED"], u"Hello world")
+
+    def testEmptyCriteria(self):
+        self.failUnless(check()(self._acc))
+        self.failUnless(check()(FakeAccessible()))
+
+    def testPartialMatch(self):
+        self.failUnless(check(name=u"ok b")(self._acc))
+        self.failUnless(check(role=u"push")(self._acc))
+        self.failUnless(check(state=u"focus")(self._acc))
+        self.failUnless(check(text=u"WORLD")(self._acc))
+        self.failIf(check(name=u"cancel")(self._acc))
+
+    def testCaseSensitiveMatch(self):
+        self.failIf(check(role=u"push", caseSensitiveMatch=True)(self._acc))
+        self.failUnless(check(role=u"PUSH", caseSensitiveMatch=True)(self._acc))
+
+    def testExactMatch(self):
+        exact = SearchDialog._EXACT_MATCH
+        self.failUnless(check(role=u"push_button", matchType=exact)(self._acc))
+        self.failUnless(check(state=u"enabled", matchType=exact)(self._acc))
+        self.failIf(check(name=u"ok", matchType=exact)(self._acc))
+        self.failIf(check(state=u"enable", matchType=exact)(self._acc))
+
+    def testRegularExpression(self):
+        self.failUnless(check(name=u"&ok.*")(self._acc))
+        self.failIf(check(name=u"&ok")(self._acc))
+        self.failUnless(check(state=u"&foc.*")(self._acc))
+        self.failUnless(check(text=u"&hello\s+\w+")(self._acc))
+
+    def testAllCriteria(self):
+        self.failUnless(check(name=u"button", role=u"push", state=u"enabled",
+                              text=u"&hello.*")(self._acc))
+        self.failIf(check(name=u"button", role=u"label", state=u"enabled",
+                          text=u"&hello.*")(self._acc))
+
+    def testMissingAttributes(self):
+        self.failIf(check(text=u"hello")(FakeAccessible(role=u"LABEL")))
+        self.failIf(check(state=u"enabled")(FakeAccessible(role=u"LABEL")))
+
+
+class ParseCriteriaTest(unittest.TestCase):
+    def testLocators(self):
+        result = parseCriteria(u"""
+okButton = Locator(name="OK", role='PUSH_BUTTON')
+    textField = Locator(role=u"TEXT", state="FOCUSED", text="a, b")
+""")
+        self.failUnlessEqual([label for label, criteria in result],
+                             ["okButton", "textField"])
+        self.failUnlessEqual(result[0][1], {"name": u"OK",
+                                            "role": u"PUSH_BUTTON",
+                                            "state": '', "text": ''})
+        self.failUnlessEqual(result[1][1]["state"], u"FOCUSED")
+        self.failUnlessEqual(result[1][1]["text"], u"a, b")
+
+    def testDictionaries(self):
+        result = parseCriteria(u"'menu': {'role': 'MENU', 'name': 'File'}")
+        self.failUnlessEqual(result[0][0], "menu")
+        self.failUnlessEqual(result[0][1]["role"], u"MENU")
+        self.failUnlessEqual(result[0][1]["name"], u"File")
+
+    def testUnlabeled(self):
+        result = parseCriteria(u"# comment\nname='Open', role='DIALOG'")
+        self.failUnlessEqual(result, [("#2", {"name": u"Open",
+                                              "role": u"DIALOG",
+                                              "state": '', "text": ''})])
+
+
+if __name__ == "__main__":
+    unittest.main()
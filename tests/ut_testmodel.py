@@ -0,0 +1,133 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import unittest
+from PySide import QtCore, QtGui
+
+from test.tests import TestModel, TestNode
+
+__all__ = ["TestModelTest"]
+
+
+def _node(name, kind, *children):
+    node = TestNode(name, None, kind)
+    node.children = list(children)
+    return node
+
+
+def _tree():
+    return [_node("a", "directory",
+                  _node("m", "module",
+                        _node("S", "suite", _node("c1", "case"),
+                                            _node("c2", "case")),
+                        _node("T", "suite"))),
+            _node("b", "directory",
+                  _node("x", "module", _node("U", "suite")))]
+
+
+class TestModelTest(unittest.TestCase):
+    if not QtGui.qApp:
+        _app = QtGui.QApplication([])
+
+    def setUp(self):
+        self._model = TestModel()
+        self._model.setNodes(_tree())
+
+    def _check(self, name, state=QtCore.Qt.Checked):
+        self._model.setData(self._model.find(name), state,
+                            QtCore.Qt.CheckStateRole)
+
+    def _state(self, name):
+        return self._model.find(name).data(QtCore.Qt.CheckStateRole)
+
+    def testFetching(self):
+        index = self._model.index(0, 0)
+        self.failUnlessEqual(index.data(), "a")
+        self.failUnless(self._model.hasChildren(index))
+        self.failUnlessEqual(self._model.rowCount(index), 0)
+        self._model.fetchMore(index)
+        self.failUnlessEqual(self._model.rowCount(index), 1)
+        index = self._model.find("a.m.S.c2")
+        self.failUnlessEqual(index.data(TestModel.TestNameRole), "a.m.S.c2")
+        self.failUnlessEqual(self._model.parent(index).data(), "S")
+        self.failIf(self._model.find("a.m.X").isValid())
+
+    def testChecking(self):
+        self._check("a.m.S.c1")
+        self.failUnlessEqual(self._state("a.m.S"),
+                             QtCore.Qt.PartiallyChecked)
+        self.failUnlessEqual(self._state("a"), QtCore.Qt.PartiallyChecked)
+        self.failUnlessEqual(self._model.checkedNames(), ["a.m.S.c1"])
+        self._check("a.m.S.c2")
+        self._check("b")
+        self.failUnlessEqual(self._state("b.x.U"), QtCore.Qt.Checked)
+        self.failUnlessEqual(self._model.checkedNames(), ["a.m.S", "b"])
+        self._check("a.m.S", QtCore.Qt.Unchecked)
+        self.failUnlessEqual(self._state("a"), QtCore.Qt.Unchecked)
+        self.failUnlessEqual(self._model.checkedNames(), ["b"])
+
+    def testRefreshing(self):
+        self._check("a.m.S")
+        self._check("b")
+        tree = _tree()
+        tree[0].children[0].children[0].children.append(_node("c3", "case"))
+        tree[1].children[0].children.append(_node("V", "suite"))
+        tree[0].children[0].children.append(_node("W", "suite"))
+        self._model.setNodes(tree)
+        self.failUnlessEqual(self._model.checkedNames(), ["a.m.S", "b"])
+        self.failUnlessEqual(self._state("a.m.S.c3"), QtCore.Qt.Checked)
+        self.failUnlessEqual(self._state("a.m.W"), QtCore.Qt.Unchecked)
+
+    def testPatching(self):
+        self._check("a.m.S.c1")
+        suite = QtCore.QPersistentModelIndex(self._model.find("a.m.S"))
+        removed = QtCore.QPersistentModelIndex(self._model.find("a.m.T"))
+        for i in xrange(3):
+            tree = _tree()
+            module = tree[0].children[0]
+            module.children.insert(0, _node("R%d" % i, "suite"))
+            del module.children[-1]
+            self._model.setNodes(tree)
+            self.failUnless(suite.isValid())
+            self.failUnlessEqual(suite.data(TestModel.TestNameRole), "a.m.S")
+            self.failUnlessEqual(suite.row(), 1)
+            self.failIf(removed.isValid())
+        self.failUnlessEqual(self._model.checkedNames(), ["a.m.S.c1"])
+        self.failUnlessEqual(self._model.rowCount(self._model.find("a.m")), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011 Comarch S.A.                                            ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from tadek.core.config import DATA_DIR
+sys.path.insert(0, os.path.join(DATA_DIR, "ui"))
+from warmup import WarmupCache
+
+__all__ = ["WarmupCacheTest"]
+
+
+class WarmupCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+        for name in ("a", "b", "c"):
+            path = os.path.join(self.directory, name)
+            self.write(path, name)
+            self.paths.append(path)
+        self.loaded = []
+        self.released = []
+        self.cache = WarmupCache(self.load, lambda: self.paths, 2, 1000,
+                                 self.released.append)
+
+    def tearDown(self):
+        self.cache.stop()
+        shutil.rmtree(self.directory)
+
+    def write(self, path, data):
+        f = open(path, "w")
+        try:
+            f.write(data)
+        finally:
+            f.close()
+
+    def load(self, path):
+        self.loaded.append(path)
+        f = open(path)
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def warm(self):
+        self.cache.warm()
+        self.cache._queue.join()
+
+    def testTake(self):
+        self.warm()
+        self.failUnlessEqual(self.loaded, self.paths[:2])
+        self.failUnlessEqual(self.cache.take(self.paths[0]), "a")
+        self.failUnlessEqual(self.cache.take(self.paths[0]), None)
+        self.failUnlessEqual(self.cache.take(self.paths[2]), None)
+
+    def testTaken(self):
+        self.warm()
+        self.failUnlessEqual(self.cache.take(self.paths[0]), "a")
+        self.warm()
+        self.failUnlessEqual(self.loaded, self.paths[:2])
+        self.failUnlessEqual(self.cache.take(self.paths[0]), None)
+        self.write(self.paths[0], "modified a")
+        self.warm()
+        self.failUnlessEqual(self.cache.take(self.paths[0]), "modified a")
+
+    def testCached(self):
+        self.warm()
+        self.warm()
+        self.failUnlessEqual(self.loaded, self.paths[:2])
+
+    def testModified(self):
+        self.warm()
+        self.write(self.paths[1], "modified b")
+        self.failUnlessEqual(self.cache.take(self.paths[1]), None)
+        self.failUnlessEqual(self.released, ["b"])
+        self.warm()
+        self.failUnlessEqual(self.cache.take(self.paths[1]), "modified b")
+
+    def testBounded(self):
+        self.warm()
+        self.paths.reverse()
+        self.warm()
+        self.failUnlessEqual(self.released, ["a"])
+        self.failUnlessEqual(self.cache.take(self.paths[0]), "c")
+        self.failUnlessEqual(self.cache.take(self.paths[1]), "b")
+
+
+    def testStop(self):
+        self.warm()
+        thread = self.cache._thread
+        self.cache.stop()
+        thread.join(5)
+        self.failIf(thread.isAlive())
+        self.failUnlessEqual(sorted(self.released), ["a", "b"])
+        self.failUnlessEqual(self.cache.take(self.paths[0]), None)
+
+if __name__ == "__main__":
+    unittest.main()